@@ -3,12 +3,24 @@ import os
 import sys
 
 # external modules
-import csv
+from collections.abc import Mapping
+import math
+import numpy as np
 from pathlib import Path
 import pickle
 
 # project modules
 import config
+from DecisionTree import OPTIONS
+from table_export import table_of_records, write_table
+
+# Sectors and carriers of the heat demand array (see Bookkeeper)
+SECTORS = ['residences', 'utility']
+CARRIERS = [
+    'E', 'H', 'geothermal', 'TEO', 'HT', 'MT', 'LT', 'undefined', 'backup',
+    'undecided', 'useful_heat', 'heat_reduction'
+]
+CARRIER_INDEX = {carrier: index for index, carrier in enumerate(CARRIERS)}
 
 
 class Bookkeeper:
@@ -16,12 +28,13 @@ class Bookkeeper:
     Class to hold functions for testing and bookkeeping
     """
 
-    def __init__(self):
+    def __init__(self, neighbourhood_codes=(), regions=None):
         """
-        A dictionary is initialised to store the total heat demand per heating
-        option and heat source. In addition to 'all_residences' and
-        'all_utility', a key can be added for each neighbourhood to store a
-        similar heat demand dictionary.
+        An array is initialised to store the heat demand per neighbourhood,
+        sector ('residences', 'utility') and carrier. The codes of the
+        neighbourhoods can be given beforehand, other neighbourhoods are added
+        when their first heat demand is added. The totals of the total region
+        are reductions of the array.
 
         'E': final demand electricity (GJ)
         'H': final demand renewable gas (GJ)
@@ -34,39 +47,160 @@ class Bookkeeper:
         'undecided': present demand (GJ)
         'useful_heat': useful demand heat for space heating and hot water (GJ)
         'heat_reduction': heat reduction by insulation (GJ)
+
+        The heat_demand attribute is a (read-only) dictionary view of the
+        array: 'all_residences' and 'all_utility' hold the totals, and each
+        neighbourhood code holds a similar dictionary per sector.
+
+        The regions map the neighbourhood codes to a region per grouping (e.g.
+        {'municipality': {'BU001': 'GM001', ...}}, see regions). The heat
+        demand per region, sector and carrier is summed from the heat demand
+        of its neighbourhoods (see region_totals).
         """
 
-        self.heat_demand = {
-            'all_residences': {
-                'E': 0.,
-                'H': 0.,
-                'geothermal': 0.,
-                'TEO': 0.,
-                'HT': 0.,
-                'MT': 0.,
-                'LT': 0.,
-                'undefined': 0.,
-                'backup': 0.,
-                'undecided': 0.,
-                'useful_heat': 0.,
-                'heat_reduction': 0.
-            },
-            'all_utility': {
-                'E': 0.,
-                'H': 0.,
-                'geothermal': 0.,
-                'TEO': 0.,
-                'HT': 0.,
-                'MT': 0.,
-                'LT': 0.,
-                'undefined': 0.,
-                'backup': 0.,
-                'undecided': 0.,
-                'useful_heat': 0.,
-                'heat_reduction': 0.
-            }
+        self.neighbourhood_codes = list(neighbourhood_codes)
+        self.neighbourhood_index = {
+            code: row for row, code in enumerate(self.neighbourhood_codes)
+        }
+
+        capacity = max(len(self.neighbourhood_codes), 1)
+        self.demands = np.zeros((capacity, len(SECTORS), len(CARRIERS)))
+
+        # Carriers that have been added per neighbourhood, and the
+        # neighbourhoods in the order in which they have been added
+        self.added = np.zeros((capacity, len(CARRIERS)), dtype=np.bool_)
+        self.order_of_neighbourhoods = []
+
+        # Assigned heating option (index, -1 if not assigned yet), number of
+        # houses and m2 of utility per neighbourhood (see add_assignments)
+        self.assigned_options = np.full(capacity, -1, dtype=np.int64)
+        self.number_of_houses = np.zeros(capacity)
+        self.m2_of_utility = np.zeros(capacity)
+
+        # Totals of the total region (None) and of the regions per grouping
+        # (see totals and region_totals), until a demand is added
+        self.cached_totals = {}
+
+        # Region (index) of each neighbourhood per grouping
+        self.region_mappings = dict(regions or {})
+        self.regions = {grouping: [] for grouping in self.region_mappings}
+        self.region_index = {grouping: {} for grouping in self.region_mappings}
+        self.region_of = {
+            grouping: np.zeros(capacity, dtype=np.int64)
+            for grouping in self.region_mappings
         }
 
+        for row, code in enumerate(self.neighbourhood_codes):
+            self.add_to_regions(row, code)
+
+
+    @property
+    def heat_demand(self):
+        """
+        Dictionary view of the heat demands (see __init__)
+        """
+
+        return HeatDemandView(self)
+
+
+    def neighbourhood_row(self, code):
+        """
+        Returns the row of the neighbourhood in the demands array, the arrays
+        grow if the neighbourhood isn't known yet
+        """
+
+        if code in self.neighbourhood_index:
+            return self.neighbourhood_index[code]
+
+        row = len(self.neighbourhood_codes)
+        self.neighbourhood_codes.append(code)
+        self.neighbourhood_index[code] = row
+
+        # Double the capacity of the arrays if they are full
+        if row == len(self.demands):
+            self.demands = np.concatenate(
+                [self.demands, np.zeros_like(self.demands)])
+            self.added = np.concatenate(
+                [self.added, np.zeros_like(self.added)])
+            self.assigned_options = np.concatenate(
+                [self.assigned_options, np.full_like(self.assigned_options,
+                                                     -1)])
+            self.number_of_houses = np.concatenate(
+                [self.number_of_houses, np.zeros_like(self.number_of_houses)])
+            self.m2_of_utility = np.concatenate(
+                [self.m2_of_utility, np.zeros_like(self.m2_of_utility)])
+
+            for grouping, region_of in self.region_of.items():
+                self.region_of[grouping] = np.concatenate(
+                    [region_of, np.zeros_like(region_of)])
+
+        self.add_to_regions(row, code)
+
+        return row
+
+
+    def add_to_regions(self, row, code):
+        """
+        Set the region of the neighbourhood per grouping (neighbourhoods
+        without a region are in region 'unknown')
+        """
+
+        for grouping, mapping in self.region_mappings.items():
+            region = mapping.get(code, 'unknown')
+
+            if region not in self.region_index[grouping]:
+                self.region_index[grouping][region] = len(
+                    self.regions[grouping])
+                self.regions[grouping].append(region)
+
+            self.region_of[grouping][row] = self.region_index[grouping][region]
+
+
+    def row_of(self, neighbourhood, carriers):
+        """
+        Returns the row of the neighbourhood and marks the carriers as added
+        """
+
+        row = self.neighbourhood_row(neighbourhood.code)
+
+        if not self.added[row].any():
+            self.order_of_neighbourhoods.append(row)
+
+        self.added[row, carriers] = True
+
+        return row
+
+
+    def rows_of(self, neighbourhoods, carriers):
+        """
+        Batch version of row_of for a list of neighbourhoods
+        """
+
+        return np.array([self.row_of(neighbourhood, carriers)
+                         for neighbourhood in neighbourhoods], dtype=np.int64)
+
+
+    def add_demand(self, row, sector, carrier, value):
+        """
+        Add the demand of a sector and carrier to the row of a neighbourhood
+        """
+
+        self.demands[row, sector, carrier] += value
+        self.cached_totals = {}
+
+
+    def add_demands(self, rows, sector, carrier, values):
+        """
+        Batch version of add_demand for the rows of a list of neighbourhoods.
+        The demands are added in the order of the rows (np.add.at is
+        unbuffered), so a row may occur more than once.
+        """
+
+        values = np.asarray(values, dtype=float)
+
+        np.add.at(self.demands[:, sector, carrier], rows, values)
+        self.cached_totals = {}
+
 
     def add_final_demand_to_neighbourhood(self, neighbourhood, heat_type,
                                           final_heat_demand_residences,
@@ -75,24 +209,11 @@ class Bookkeeper:
         Add final heat demand for all residences and utility in the neighbourhood
         """
 
-        # Initialise neighbourhood object
-        if not neighbourhood.code in self.heat_demand.keys():
-            self.heat_demand[neighbourhood.code] = {
-                'residences': {},
-                'utility': {}
-            }
+        carrier = CARRIER_INDEX[heat_type]
+        row = self.row_of(neighbourhood, [carrier])
 
-        # Add heat demand
-        try:
-            self.heat_demand[neighbourhood.code]['residences'][
-                heat_type] += final_heat_demand_residences
-            self.heat_demand[neighbourhood.code]['utility'][
-                heat_type] += final_heat_demand_utility
-        except KeyError:
-            self.heat_demand[neighbourhood.code]['residences'][
-                heat_type] = final_heat_demand_residences
-            self.heat_demand[neighbourhood.code]['utility'][
-                heat_type] = final_heat_demand_utility
+        self.add_demand(row, 0, carrier, final_heat_demand_residences)
+        self.add_demand(row, 1, carrier, final_heat_demand_utility)
 
 
     def add_useful_demand_to_neighbourhood(self, neighbourhood,
@@ -104,32 +225,17 @@ class Bookkeeper:
         Add useful heat demand and heat reduction for all residences and utility in the neighbourhood
         """
 
-        # Initialise neighbourhood object if it doesn't exist yet
-        if not neighbourhood.code in self.heat_demand.keys():
-            self.heat_demand[neighbourhood.code] = {
-                'residences': {},
-                'utility': {}
-            }
+        useful_heat = CARRIER_INDEX['useful_heat']
+        heat_reduction = CARRIER_INDEX['heat_reduction']
+
+        row = self.row_of(neighbourhood, [useful_heat, heat_reduction])
 
-        # Add heat demand
-        try:
-            self.heat_demand[neighbourhood.code]['residences'][
-                'useful_heat'] += useful_heat_demand_residences
-            self.heat_demand[neighbourhood.code]['residences'][
-                'heat_reduction'] += heat_reduction_residences
-            self.heat_demand[neighbourhood.code]['utility'][
-                'useful_heat'] += useful_heat_demand_utility
-            self.heat_demand[neighbourhood.code]['utility'][
-                'heat_reduction'] += heat_reduction_utility
-        except KeyError:
-            self.heat_demand[neighbourhood.code]['residences'][
-                'useful_heat'] = useful_heat_demand_residences
-            self.heat_demand[neighbourhood.code]['residences'][
-                'heat_reduction'] = heat_reduction_residences
-            self.heat_demand[neighbourhood.code]['utility'][
-                'useful_heat'] = useful_heat_demand_utility
-            self.heat_demand[neighbourhood.code]['utility'][
-                'heat_reduction'] = heat_reduction_utility
+        for sector, carrier, value in [
+                (0, useful_heat, useful_heat_demand_residences),
+                (0, heat_reduction, heat_reduction_residences),
+                (1, useful_heat, useful_heat_demand_utility),
+                (1, heat_reduction, heat_reduction_utility)]:
+            self.add_demand(row, sector, carrier, value)
 
 
     def add_final_heat_demand(self, neighbourhood, heat_type,
@@ -147,14 +253,6 @@ class Bookkeeper:
         'backup': heat from a backup source (heating_option 'W_MTHT' , 'W_LT' or 'H')
         """
 
-        # Add final heat demand for all residences in the total region
-        self.heat_demand['all_residences'][
-            heat_type] += final_heat_demand_residences
-
-        # Add final heat demand for all utility in the total region
-        self.heat_demand['all_utility'][heat_type] += final_heat_demand_utility
-
-        # Add final heat demand for all residences and utilities in the neighbourhood
         self.add_final_demand_to_neighbourhood(neighbourhood, heat_type,
                                                final_heat_demand_residences,
                                                final_heat_demand_utility)
@@ -166,31 +264,110 @@ class Bookkeeper:
                                heat_reduction_residences,
                                heat_reduction_utility):
         """
-        Description
+        Add useful heat demand and heat reduction for all residences and utility in the neighbourhood
         """
 
-        # Add useful heat demand and reduction for all residences in the total region
-        self.heat_demand['all_residences'][
-            'useful_heat'] += useful_heat_demand_residences
-        self.heat_demand['all_residences'][
-            'heat_reduction'] += heat_reduction_residences
-
-        # Add useful heat demand and reduction for all utility in the total region
-        self.heat_demand['all_utility'][
-            'useful_heat'] += useful_heat_demand_utility
-        self.heat_demand['all_utility'][
-            'heat_reduction'] += heat_reduction_utility
-
-        # Add final heat demand for all residences and utilities in the neighbourhood
         self.add_useful_demand_to_neighbourhood(neighbourhood,
                                                 useful_heat_demand_residences,
                                                 useful_heat_demand_utility,
                                                 heat_reduction_residences,
                                                 heat_reduction_utility)
 
-        # TODO: Is this the best place to store the neighbourhood specific heat
-        # demand data? Or would it be better to store this in the Neighbourhood
-        # object itself?
+
+    def add_final_heat_demands(self, neighbourhoods, heat_type,
+                               final_heat_demands_residences,
+                               final_heat_demands_utility):
+        """
+        Batch version of add_final_heat_demand for a list of neighbourhoods
+        (see add_demands)
+        """
+
+        carrier = CARRIER_INDEX[heat_type]
+        rows = self.rows_of(neighbourhoods, [carrier])
+
+        self.add_demands(rows, 0, carrier, final_heat_demands_residences)
+        self.add_demands(rows, 1, carrier, final_heat_demands_utility)
+
+
+    def add_useful_heat_demands(self, neighbourhoods,
+                                useful_heat_demands_residences,
+                                useful_heat_demands_utility,
+                                heat_reductions_residences,
+                                heat_reductions_utility):
+        """
+        Batch version of add_useful_heat_demand for a list of neighbourhoods
+        """
+
+        useful_heat = CARRIER_INDEX['useful_heat']
+        heat_reduction = CARRIER_INDEX['heat_reduction']
+
+        rows = self.rows_of(neighbourhoods, [useful_heat, heat_reduction])
+
+        for sector, carrier, values in [
+                (0, useful_heat, useful_heat_demands_residences),
+                (0, heat_reduction, heat_reductions_residences),
+                (1, useful_heat, useful_heat_demands_utility),
+                (1, heat_reduction, heat_reductions_utility)]:
+            self.add_demands(rows, sector, carrier, values)
+
+
+    def add_assignments(self, neighbourhoods):
+        """
+        Keep the assigned heating options ('undecided' if none), the number of
+        houses and the m2 of utility of the neighbourhoods, to count them per
+        region (see regions.regional_assignment_rows)
+        """
+
+        for neighbourhood in neighbourhoods:
+            row = self.neighbourhood_row(neighbourhood.code)
+            option = neighbourhood.assigned_heating_option
+
+            self.assigned_options[row] = OPTIONS.index(
+                option if option in OPTIONS else 'undecided')
+            self.number_of_houses[row] = neighbourhood.number_of_houses()
+            self.m2_of_utility[row] = neighbourhood.m2_of_utility()
+
+
+    def totals(self):
+        """
+        Returns the heat demand of the total region per sector and carrier.
+        The totals are exactly rounded sums (math.fsum), so they do not depend
+        on the order of the neighbourhoods (e.g. when partial bookkeepers of
+        parallel runs are merged, see merge_bookkeepers). They are kept until
+        the next demand is added.
+        """
+
+        if None not in self.cached_totals:
+            self.cached_totals[None] = exact_sums(
+                self.demands[:len(self.neighbourhood_codes)])
+
+        return self.cached_totals[None].copy()
+
+
+    def region_totals(self, grouping):
+        """
+        Returns the regions of the grouping and their heat demand per sector
+        and carrier. As the totals, the demands of a region are exactly
+        rounded sums of the demands of its neighbourhoods, so they do not
+        depend on the order in which they have been added or merged.
+        """
+
+        if grouping not in self.cached_totals:
+            rows = len(self.neighbourhood_codes)
+            region_of = self.region_of[grouping][:rows]
+
+            # The rows of the neighbourhoods grouped per region
+            order = np.argsort(region_of, kind='stable')
+            bounds = np.searchsorted(region_of[order],
+                                     np.arange(len(self.regions[grouping]) + 1))
+            demands = self.demands[order]
+
+            self.cached_totals[grouping] = np.array([
+                exact_sums(demands[start:end])
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ]).reshape(-1, len(SECTORS), len(CARRIERS))
+
+        return self.regions[grouping], self.cached_totals[grouping].copy()
 
 
     def print_heat_demand(self):
@@ -218,69 +395,115 @@ class Bookkeeper:
              self.heat_demand['all_residences']['heat_reduction']) / 1.E6))
 
 
-    def export_heat_demand_to_csv(self, name_extension=""):
+    def export_heat_demand_to_csv(self, name_extension="", context=None):
         """
-        Export heat demand to CSV file
+        Export heat demand to a table in the output data directory (in the
+        output format of the scenario) of the run context, or the current one
         """
 
-        path = Path(
-            __file__).resolve().parents[1] / "output_data" / "{}".format(
-                config.current_project_name) / "{}".format(
-                config.current_project.current_scenario_name) / "demands.csv".format(name_extension)
-
-        # Define the columns variable
-        columns = [
-            'neighbourhood', 'type', 'E', 'H', 'geothermal', 'TEO', 'HT', 'MT', 'LT',
-            'undefined', 'backup', 'undecided', 'useful_heat', 'heat_reduction'
-        ]
-
-        # Write the neighbourhood objects to csv file rows
-        with open(path, 'w') as file:
-            writer = csv.DictWriter(file, fieldnames=columns)
-            writer.writeheader()
-            for object in self.heat_demand:
-                if object == 'all_residences':
-                    characteristics = {
-                        'neighbourhood': 'total',
-                        'type': 'residences'
-                    }
-                    writer.writerow({
-                        **characteristics,
-                        **self.heat_demand[object]
-                    })
-                elif object == 'all_utility':
-                    characteristics = {
-                        'neighbourhood': 'total',
-                        'type': 'utility'
-                    }
-                    writer.writerow({
-                        **characteristics,
-                        **self.heat_demand[object]
-                    })
-                else:
-                    for type in ['residences', 'utility']:
-                        characteristics = {
-                            'neighbourhood': object,
-                            'type': type
-                        }
-                        writer.writerow({
-                            **characteristics,
-                            **self.heat_demand[object][type]
-                        })
+        write_table(self.heat_demand_table(),
+                    "demands{}".format(name_extension), context=context)
 
         print("Sucessfully wrote heat demand to CSV file!")
 
 
-    def save_bookkeeper(self, name_extension=""):
+    def heat_demand_rows(self, missing=None):
         """
-        Save bookkeeper to pickle file
+        Returns the rows of the heat demand table: the totals and the
+        neighbourhoods (in the order in which they have been added), per
+        sector. Carriers that have not been added to a neighbourhood are
+        missing.
+        """
+
+        rows = []
+
+        for sector, totals in zip(SECTORS, self.totals().tolist()):
+            rows.append(['total', sector] + totals)
+
+        for row in self.order_of_neighbourhoods:
+            added = self.added[row].tolist()
+
+            for sector, demands in zip(SECTORS, self.demands[row].tolist()):
+                rows.append(
+                    [self.neighbourhood_codes[row], sector] +
+                    [demand if is_added else missing
+                     for demand, is_added in zip(demands, added)])
+
+        return rows
+
+
+    def heat_demand_table(self):
+        """
+        Returns the heat demand table (see heat_demand_rows)
+        """
+
+        columns = ['neighbourhood', 'type'] + CARRIERS
+
+        return table_of_records([dict(zip(columns, row))
+                                 for row in self.heat_demand_rows()], columns)
+
+
+    def export_regional_heat_demand_to_csv(self, region_names=None,
+                                           context=None):
+        """
+        Export the heat demand per region to a table per grouping
+        (regional_demands_<grouping>, in the output format of the scenario of
+        the run context, or the current one), with the names of the regions
+        if given per grouping
+        """
+
+        for grouping, table in self.regional_heat_demand_tables(
+                region_names).items():
+            write_table(table, f"regional_demands_{grouping}",
+                        context=context)
+
+        print("Sucessfully wrote regional heat demand to CSV files!")
+
+
+    def regional_heat_demand_rows(self, grouping, names=None):
+        """
+        Returns the rows of the heat demand table of the regions of the
+        grouping: the heat demand per region and sector, with the names of
+        the regions if given
+        """
+
+        names = names or {}
+        regions, demands = self.region_totals(grouping)
+
+        return [[region, names.get(region, region), sector] + sector_demands
+                for region, region_demands in zip(regions, demands.tolist())
+                for sector, sector_demands in zip(SECTORS, region_demands)]
+
+
+    def regional_heat_demand_tables(self, region_names=None):
+        """
+        Returns the heat demand table of the regions per grouping (see
+        regional_heat_demand_rows)
+        """
+
+        region_names = region_names or {}
+        tables = {}
+
+        for grouping in self.region_mappings:
+            columns = [grouping, 'name', 'type'] + CARRIERS
+            tables[grouping] = table_of_records([
+                dict(zip(columns, row)) for row in
+                self.regional_heat_demand_rows(grouping,
+                                               region_names.get(grouping))
+            ], columns)
+
+        return tables
+
+
+    def save_bookkeeper(self, name_extension="", context=None):
+        """
+        Save bookkeeper to pickle file (in the output data directory of the
+        run context, or the current one)
         """
 
         # Writing future heat demands to CSV file
-        path = Path(
-            __file__).resolve().parents[1] / "output_data" / "{}".format(
-                config.current_project_name) / "{}".format(
-                config.current_project.current_scenario_name) / "bookkeeper{}.pkl".format(name_extension)
+        path = config.context_of_run(context).output_directory() / (
+            "bookkeeper{}.pkl".format(name_extension))
 
         # Create file/folders if non-existent
         os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -309,3 +532,126 @@ class Bookkeeper:
             bookkeeper = pickle.load(input)
 
         return bookkeeper
+
+
+def exact_sums(demands):
+    """
+    Returns the exactly rounded sums (math.fsum) of the heat demands of
+    neighbourhoods (an array of their rows) per sector and carrier
+    """
+
+    columns = demands.reshape(len(demands), -1).T.tolist()
+
+    return np.array([math.fsum(column) for column in columns]).reshape(
+        len(SECTORS), len(CARRIERS))
+
+
+def merge_bookkeepers(bookkeepers, neighbourhood_codes=None, regions=None):
+    """
+    Returns a bookkeeper with the heat demands of the (partial) bookkeepers,
+    e.g. of the workers of a parallel run. The neighbourhoods are ordered as
+    in neighbourhood_codes if given, otherwise in order of the bookkeepers.
+
+    A neighbourhood that occurs in more than one bookkeeper gets the exactly
+    rounded sum (math.fsum) of its demands, so the result does not depend on
+    the order of the bookkeepers, and merging the merged bookkeepers of
+    disjoint sets of neighbourhoods gives the same result as merging all at
+    once. Since the totals and the regional demands are exactly rounded sums
+    as well, they are equal to those of a sequential run bit for bit. The
+    regions are those of the first bookkeeper if not given.
+    """
+
+    # Order of the neighbourhoods
+    if neighbourhood_codes is None:
+        neighbourhood_codes = dict.fromkeys(
+            bookkeeper.neighbourhood_codes[row] for bookkeeper in bookkeepers
+            for row in bookkeeper.order_of_neighbourhoods)
+
+    if regions is None and bookkeepers:
+        regions = bookkeepers[0].region_mappings
+
+    merged = Bookkeeper(neighbourhood_codes, regions)
+
+    # Demands of the neighbourhoods per bookkeeper (in the merged rows)
+    contributions = {}
+
+    for bookkeeper in bookkeepers:
+        for row in bookkeeper.order_of_neighbourhoods:
+            merged_row = merged.neighbourhood_row(
+                bookkeeper.neighbourhood_codes[row])
+            contributions.setdefault(merged_row, []).append(
+                bookkeeper.demands[row])
+            merged.added[merged_row] |= bookkeeper.added[row]
+
+        # The assignments of the neighbourhoods (of the last bookkeeper that
+        # has assigned them)
+        for row in np.flatnonzero(bookkeeper.assigned_options[
+                :len(bookkeeper.neighbourhood_codes)] >= 0).tolist():
+            merged_row = merged.neighbourhood_row(
+                bookkeeper.neighbourhood_codes[row])
+            merged.assigned_options[merged_row] = (
+                bookkeeper.assigned_options[row])
+            merged.number_of_houses[merged_row] = (
+                bookkeeper.number_of_houses[row])
+            merged.m2_of_utility[merged_row] = bookkeeper.m2_of_utility[row]
+
+    for merged_row, demands in contributions.items():
+        if len(demands) == 1:
+            merged.demands[merged_row] = demands[0]
+        else:
+            merged.demands[merged_row] = exact_sums(np.stack(demands))
+
+    merged.order_of_neighbourhoods = [
+        row for row in range(len(merged.neighbourhood_codes))
+        if merged.added[row].any()
+    ]
+
+    return merged
+
+
+class HeatDemandView(Mapping):
+    """
+    Class to describe the (read-only) nested dictionary view of the heat
+    demands of a bookkeeper, as the heat_demand dictionary used to be
+    """
+
+    def __init__(self, bookkeeper):
+        self.bookkeeper = bookkeeper
+
+
+    def __getitem__(self, key):
+        bookkeeper = self.bookkeeper
+
+        if key in ['all_residences', 'all_utility']:
+            totals = bookkeeper.totals()[SECTORS.index(key[len('all_'):])]
+
+            return dict(zip(CARRIERS, totals.tolist()))
+
+        row = bookkeeper.neighbourhood_index.get(key)
+
+        if row is None or not bookkeeper.added[row].any():
+            raise KeyError(key)
+
+        added = bookkeeper.added[row].tolist()
+
+        return {
+            sector: {
+                carrier: demand
+                for carrier, demand, is_added in zip(CARRIERS, demands, added)
+                if is_added
+            }
+            for sector, demands in zip(SECTORS,
+                                       bookkeeper.demands[row].tolist())
+        }
+
+
+    def __iter__(self):
+        yield 'all_residences'
+        yield 'all_utility'
+
+        for row in self.bookkeeper.order_of_neighbourhoods:
+            yield self.bookkeeper.neighbourhood_codes[row]
+
+
+    def __len__(self):
+        return 2 + len(self.bookkeeper.order_of_neighbourhoods)
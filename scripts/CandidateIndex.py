@@ -0,0 +1,53 @@
+# external modules
+import numpy as np
+
+# project modules
+from classify_neighbourhoods import sort_heat_sources_for_neighbourhood
+
+
+class CandidateIndex:
+    """
+    Class to describe the candidate heat sources (HT or LT) of the
+    neighbourhoods: the heat sources in range, sorted by distance. The index is
+    computed once and stored as compressed sparse rows: the candidates of
+    neighbourhood i are indices[indptr[i]:indptr[i + 1]], at distances
+    distances[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(self, neighbourhoods, heat_sources, heat_temperature):
+        self.heat_temperature = heat_temperature
+
+        self.source_codes = list(heat_sources.keys())
+        self.source_index = {
+            code: index for index, code in enumerate(self.source_codes)
+        }
+        self.neighbourhood_index = {
+            code: index for index, code in enumerate(neighbourhoods.keys())
+        }
+
+        indptr = [0]
+        indices = []
+        distances = []
+
+        for neighbourhood in neighbourhoods.values():
+            for candidate in sort_heat_sources_for_neighbourhood(
+                    neighbourhood, heat_sources, heat_temperature):
+                indices.append(self.source_index[candidate['source'].code])
+                distances.append(candidate['distance'])
+
+            indptr.append(len(indices))
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.distances = np.array(distances, dtype=float)
+
+
+    def number_of_candidates(self, neighbourhood):
+        """
+        Returns the number of candidate heat sources of the neighbourhood
+        """
+
+        index = self.neighbourhood_index[neighbourhood.code]
+
+        return int(self.indptr[index + 1] - self.indptr[index])
+
@@ -0,0 +1,57 @@
+# external modules
+import numpy as np
+
+# project modules
+from CandidateIndex import CandidateIndex
+from source_selection import (capacity_index, select_from_capacity_index,
+                              update_capacity)
+
+
+class CapacityIndex(CandidateIndex):
+    """
+    Class to describe the candidate heat sources of the neighbourhoods (see
+    CandidateIndex) together with their remaining heat in a capacity index
+    (see source_selection), which is shared by all neighbourhoods and updated
+    when heat is assigned.
+    """
+
+    def __init__(self, neighbourhoods, heat_sources, heat_temperature):
+        super().__init__(neighbourhoods, heat_sources, heat_temperature)
+
+        remaining_heat = np.array([
+            source.available_heat - source.used_heat
+            for source in heat_sources.values()
+        ], dtype=float)
+
+        self.tree, self.source_indptr, self.source_positions = capacity_index(
+            self.indices, len(self.source_codes), remaining_heat)
+
+
+    def select(self, neighbourhood, demand, strategy, max_distance):
+        """
+        Returns the code of and the distance to the candidate heat source of
+        the neighbourhood selected with the strategy (see select_candidate),
+        or None if there is none
+        """
+
+        index = self.neighbourhood_index[neighbourhood.code]
+        start = self.indptr[index]
+        position = select_from_capacity_index(
+            self.tree, start, self.indptr[index + 1], self.distances, demand,
+            strategy, max_distance)
+
+        if position < 0:
+            return None
+
+        return (self.source_codes[self.indices[start + position]],
+                float(self.distances[start + position]))
+
+
+    def update(self, heat_source):
+        """
+        Update the remaining heat of the heat source in the capacity index
+        """
+
+        update_capacity(self.tree, self.source_indptr, self.source_positions,
+                        self.source_index[heat_source.code],
+                        heat_source.available_heat - heat_source.used_heat)
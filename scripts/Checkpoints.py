@@ -0,0 +1,225 @@
+# system modules
+from collections import namedtuple
+import hashlib
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+# project modules
+from ResultCache import ResultCache
+import config
+
+# The state of an allocation (see main.allocate): the neighbourhoods (in the
+# order of allocate), the heat sources, the bookkeeper, the names of the
+# regions and the used renewable gas, with the progress of the decision trees
+# (see main.apply_decision_trees), or None if the allocation is complete
+AllocationState = namedtuple('AllocationState', [
+    'neighbourhoods', 'heat_sources', 'bookkeeper', 'region_names',
+    'used_renewable_gas', 'progress'
+])
+
+
+class Checkpoints:
+    """
+    Class to describe the checkpoints of a run of a scenario (in
+    output_data/<project>/.checkpoints/<scenario>), so a long run that is
+    interrupted can be resumed from its last checkpoint instead of starting
+    over:
+
+      - after each stage of loading the data (the stock, preferences and heat
+        sources, see load_data.initialise_neighbourhoods_and_heat_sources),
+      - during the allocation, every CHECKPOINT_INTERVAL seconds (the state
+        of the decision trees with the neighbourhoods, heat sources and
+        bookkeeper), and once the allocation is complete.
+
+    Each checkpoint is written atomically to disk, with the key of what it
+    depends on (as the stage cache and result cache, see StageCache and
+    ResultCache) and a digest of its content. A checkpoint is only resumed
+    from if both match, so a resumed run gives exactly the same results as a
+    run that was not interrupted. The checkpoints are removed when the run is
+    complete.
+    """
+
+    def __init__(self, path, interval, resume=False):
+        self.path = Path(path)
+        self.interval = interval
+        self.resume = resume
+        self.saved_at = time.monotonic()
+        self.run_key = None
+        self.allocation = None
+
+
+    @classmethod
+    def of_current_run(cls, resume=False, context=None):
+        """
+        Returns the checkpoints of the run of the scenario of the run context
+        (or the current one), or None if the CHECKPOINT_INTERVAL of the
+        project is not set (or 0). With resume, the run is resumed from its
+        checkpoints.
+        """
+
+        context = config.context_of_run(context)
+        interval = getattr(context.project, 'CHECKPOINT_INTERVAL', 0)
+
+        if not interval:
+            return None
+
+        return cls(Path(__file__).resolve().parents[1] / "output_data" /
+                   f"{context.project_name}" / ".checkpoints" /
+                   f"{context.scenario_name}", interval, resume)
+
+
+    def run(self, stage, key, compute):
+        """
+        Returns the output of the stage with the key from its checkpoint if
+        the run is resumed, or computes it and writes its checkpoint (see
+        StageCache.run)
+        """
+
+        if self.resume:
+            output = self.restore(stage, key)
+
+            if output is not None:
+                print(f'  - Resumed the {stage} from its checkpoint')
+
+                return output
+
+        output = compute()
+        self.save(stage, key, output)
+
+        return output
+
+
+    def track_allocation(self, neighbourhoods, heat_sources, bookkeeper,
+                         region_names):
+        """
+        Keep the objects of the allocation of the current scenario to save
+        their state in its checkpoints
+        """
+
+        self.allocation = (neighbourhoods, heat_sources, bookkeeper,
+                           region_names)
+
+
+    def due(self):
+        """
+        Returns whether the next checkpoint of the allocation is due
+        """
+
+        return time.monotonic() - self.saved_at >= self.interval
+
+
+    def save_allocation(self, progress=None):
+        """
+        Write the state of the allocation with the progress of the decision
+        trees (None once the allocation is complete) to its checkpoint
+        """
+
+        self.save('allocation', self.key_of_run(), AllocationState(
+            *self.allocation,
+            config.current_project.current_scenario['used_renewable_gas'],
+            progress))
+
+
+    def restore_allocation(self):
+        """
+        Returns the state of the allocation of the current scenario from its
+        checkpoint (see AllocationState) if the run is resumed, or None
+        """
+
+        if not self.resume:
+            return None
+
+        state = self.restore('allocation', self.key_of_run())
+
+        if state is not None:
+            config.current_project.current_scenario['used_renewable_gas'] = (
+                state.used_renewable_gas)
+
+            if state.progress is None:
+                print('\nResumed the complete allocation from its checkpoint')
+            else:
+                print('\nResumed the allocation from its checkpoint '
+                      '(iteration {}, neighbourhood {}/{})'.format(
+                          state.progress['iteration'] + 1,
+                          state.progress['position'],
+                          len(state.neighbourhoods)))
+
+        return state
+
+
+    def key_of_run(self):
+        """
+        Returns the key of the run of the current scenario (see
+        ResultCache.key_of_current_run), which the allocation depends on
+        """
+
+        if self.run_key is None:
+            self.run_key = ResultCache.key_of_current_run()
+
+        return self.run_key
+
+
+    def save(self, name, key, state):
+        """
+        Write a checkpoint atomically (and durably) to disk
+        """
+
+        payload = pickle.dumps((key, state), pickle.HIGHEST_PROTOCOL)
+
+        os.makedirs(self.path, exist_ok=True)
+        temporary = self.path / f".{name}.{os.getpid()}"
+
+        with open(temporary, 'wb') as output:
+            output.write(hashlib.sha256(payload).digest())
+            output.write(payload)
+            output.flush()
+            os.fsync(output.fileno())
+
+        os.replace(temporary, self.path / f"{name}.pkl")
+        self.saved_at = time.monotonic()
+
+
+    def restore(self, name, key):
+        """
+        Returns the state of a checkpoint, or None if it does not exist, is
+        incomplete or was written for another key
+        """
+
+        try:
+            with open(self.path / f"{name}.pkl", 'rb') as input:
+                digest = input.read(hashlib.sha256().digest_size)
+                payload = input.read()
+
+        except FileNotFoundError:
+            return None
+
+        if hashlib.sha256(payload).digest() != digest:
+            print(f'\nWARNING! The {name} checkpoint is corrupt, ignoring it.')
+            return None
+
+        checkpoint_key, state = pickle.loads(payload)
+
+        if checkpoint_key != key:
+            return None
+
+        return state
+
+
+    def remove(self, names=None):
+        """
+        Remove the checkpoints of the run (once it is complete), or the given
+        checkpoints
+        """
+
+        if names is None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+
+        for name in names:
+            try:
+                os.remove(self.path / f"{name}.pkl")
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,205 @@
+# external modules
+from collections import namedtuple
+import json
+import numpy as np
+
+# project modules
+import config
+from normalisation import normalised
+
+# Heating options, in the order of the preference vectors of the Matrix
+OPTIONS = ['W_MTHT', 'H', 'E', 'W_LT', 'undecided']
+OPTION_INDEX = {option: index for index, option in enumerate(OPTIONS)}
+
+# Supply routes: how the heating option of a neighbourhood is supplied
+ROUTES = [None, 'HT', 'LT', 'geothermal', 'TEO', 'undefined', 'gas',
+          'electricity', 'undecided']
+ROUTE_INDEX = {route: index for index, route in enumerate(ROUTES)}
+
+# Routes that claim heat from a residual heat source (HT or LT)
+HEAT_SOURCE_ROUTES = ['HT', 'LT']
+
+# Routes that claim renewable gas from the gas budget
+GAS_ROUTES = ['gas']
+
+# Routes that are available if the neighbourhood has the flag set
+ROUTE_FLAGS = {
+    'geothermal': 'geothermal_available',
+    'TEO': 'teo_available',
+    'undefined': 'force_heat_network'
+}
+
+# Heating options that are only possible if the neighbourhood has the flag set
+OPTION_FLAGS = {'W_LT': 'lt_elegible'}
+
+# The decision trees (see the README): per preferred heating option, the rules
+# that are tried in order the first time (first preference) and the second
+# time (second preference). Each rule is a (heating option, supply route) pair.
+DEFAULT_DECISION_TREES = {
+    'E': {
+        'first_time': [('W_LT', 'LT'), ('W_LT', 'TEO'), ('E', 'electricity')],
+        'second_time': [('E', 'electricity')]
+    },
+    'W_MTHT': {
+        'first_time': [('W_MTHT', 'HT'), ('W_MTHT', 'geothermal'),
+                       ('W_MTHT', 'LT'), ('W_MTHT', 'undefined')],
+        'second_time': [('W_MTHT', 'HT'), ('W_MTHT', 'geothermal'),
+                        ('W_MTHT', 'LT'), ('W_MTHT', 'undefined'),
+                        ('E', 'electricity')]
+    },
+    'H': {
+        'first_time': [('H', 'gas')],
+        'second_time': [('H', 'gas'), ('E', 'electricity')]
+    }
+}
+
+ITERATIONS = ['first_time', 'second_time']
+
+Rule = namedtuple('Rule', ['heating_option', 'route'])
+
+
+class DecisionTree:
+    """
+    Class to describe the decision trees of a project as a compiled rule table.
+
+    The rules are kept both as tuples of Rules per (preferred heating option,
+    iteration), which are walked by apply_decision_tree, and as flat arrays,
+    which are evaluated by the allocation kernel:
+
+    - rules[preference, iteration, i] is the (heating option, route) index
+      pair of rule i (padded with -1)
+    - number_of_rules[preference, iteration] is the number of rules
+    - requires_lt_elegibility[option] tells if the heating option is only
+      possible for LT eligible neighbourhoods
+    """
+
+    def __init__(self, decision_trees=None):
+        if decision_trees is None:
+            decision_trees = DEFAULT_DECISION_TREES
+
+        self.rule_table = {}
+
+        for preference, trees in decision_trees.items():
+            self.check_heating_option(preference)
+
+            for iteration, name in enumerate(ITERATIONS):
+                rules = tuple(Rule(*rule) for rule in trees.get(name, []))
+
+                for rule in rules:
+                    self.check_rule(rule)
+
+                self.rule_table[(preference, iteration)] = rules
+
+        self.compile()
+
+
+    @staticmethod
+    def check_heating_option(heating_option):
+        if heating_option not in OPTION_INDEX:
+            raise ValueError(
+                f"Unknown heating option '{heating_option}' in decision tree")
+
+
+    def check_rule(self, rule):
+        self.check_heating_option(rule.heating_option)
+
+        if rule.heating_option == 'undecided':
+            raise ValueError("Heating option 'undecided' can not be assigned "
+                             "by a decision tree")
+
+        if rule.route not in ROUTE_INDEX or rule.route is None:
+            raise ValueError(f"Unknown supply route '{rule.route}' in "
+                             "decision tree")
+
+
+    def compile(self):
+        """
+        Compile the rule table into the arrays of the allocation kernel
+        """
+
+        max_number_of_rules = max(
+            [len(rules) for rules in self.rule_table.values()] + [1])
+
+        self.rules = np.full((len(OPTIONS), len(ITERATIONS),
+                              max_number_of_rules, 2), -1, dtype=np.int64)
+        self.number_of_rules = np.zeros((len(OPTIONS), len(ITERATIONS)),
+                                        dtype=np.int64)
+        self.requires_lt_elegibility = np.array(
+            [option in OPTION_FLAGS for option in OPTIONS], dtype=np.bool_)
+
+        for (preference, iteration), rules in self.rule_table.items():
+            index = OPTION_INDEX[preference]
+            self.number_of_rules[index, iteration] = len(rules)
+
+            for position, rule in enumerate(rules):
+                self.rules[index, iteration, position] = (
+                    OPTION_INDEX[rule.heating_option], ROUTE_INDEX[rule.route])
+
+
+    def rules_for(self, neighbourhood, iteration):
+        """
+        Returns the rules of the decision tree of the neighbourhood's preferred
+        heating option in the iteration (0: first preference, 1: second
+        preference), without the heating options that are not possible for
+        the neighbourhood
+        """
+
+        preference = neighbourhood.heating_option_preference[iteration][0]
+
+        return [
+            rule for rule in self.rule_table.get((preference, iteration), ())
+            if is_possible(neighbourhood, rule.heating_option)
+        ]
+
+
+    def heating_options_for(self, neighbourhood):
+        """
+        Returns the heating options that the decision trees may assign to the
+        neighbourhood in either iteration
+        """
+
+        return set(rule.heating_option
+                   for iteration in range(len(ITERATIONS))
+                   for rule in self.rules_for(neighbourhood, iteration))
+
+
+def is_possible(neighbourhood, heating_option):
+    """
+    Checks if the heating option is possible for the neighbourhood
+    """
+
+    flag = OPTION_FLAGS.get(heating_option)
+
+    return flag is None or bool(getattr(neighbourhood, flag))
+
+
+def is_open(neighbourhood, route):
+    """
+    Checks if a supply route that does not depend on a scarce resource is
+    available for the neighbourhood
+    """
+
+    flag = ROUTE_FLAGS.get(route)
+
+    return flag is None or bool(getattr(neighbourhood, flag))
+
+
+# Compiled decision trees, by their (normalised) rule table
+compiled_decision_trees = {}
+
+
+def decision_tree_of_project():
+    """
+    Returns the compiled decision trees of the current project. The trees are
+    read from DECISION_TREES in the project config (if present) and are only
+    compiled once per rule table, so changed trees (e.g. overridden for a run,
+    or in a reloaded config file) are compiled again.
+    """
+
+    decision_trees = getattr(config.current_project, 'DECISION_TREES', None)
+    key = json.dumps(normalised(decision_trees), sort_keys=True)
+
+    if key not in compiled_decision_trees:
+        compiled_decision_trees[key] = DecisionTree(decision_trees)
+
+    return compiled_decision_trees[key]
@@ -0,0 +1,330 @@
+# external modules
+import heapq
+
+# project modules
+from classify_neighbourhoods import (add_electricity_demand_to_bookkeeper,
+                                     add_source_to_bookkeeper,
+                                     final_gas_demand,
+                                     final_residual_heat_demand,
+                                     future_heat_demands,
+                                     share_of_residual_heat_in_heat_network)
+import config
+from DecisionTree import GAS_ROUTES, HEAT_SOURCE_ROUTES, is_open
+
+
+class ExhaustionTracker:
+    """
+    Class to keep track of the scarce resources (the renewable gas budget and
+    the residual HT and LT sources) during an iteration of the decision trees.
+
+    For each resource the tracker keeps the demands of the neighbourhoods that
+    may still claim it in this iteration. A resource is exhausted once its
+    remaining budget does not exceed the smallest of these demands: from then
+    on, the decision trees can no longer grant it to any neighbourhood. The
+    demands of a resource are only determined once it is checked, i.e. when
+    one of the neighbourhoods that may claim it is processed.
+
+    Once nothing can be granted to a neighbourhood anymore, the outcome of its
+    decision tree is known beforehand (the fallback option). When all resources
+    are exhausted, the fallback is assigned to all remaining neighbourhoods at
+    once.
+
+    The remaining renewable gas of the scenario is passed in by the decision
+    trees (see classify_neighbourhoods.remaining_renewable_gas).
+    """
+
+    def __init__(self, heat_sources, bookkeeper, decision_tree):
+        self.heat_sources = heat_sources
+        self.bookkeeper = bookkeeper
+        self.decision_tree = decision_tree
+
+
+    def start_iteration(self, neighbourhoods, iteration):
+        """
+        Determine for all unassigned neighbourhoods which resources they may
+        claim in this iteration (0: first preference, 1: second preference).
+        How much of it they claim is determined per resource, once it is
+        checked.
+        """
+
+        self.iteration = iteration
+        self.candidates = {'gas': []}
+        self.resources = {}
+        self.requests = {}
+        self.floors = {}
+        self.processed = set()
+
+        for heat_temperature in ['HT', 'LT']:
+            for code in self.heat_sources[heat_temperature]:
+                self.candidates[(heat_temperature, code)] = []
+
+        for position, neighbourhood in enumerate(neighbourhoods.values()):
+            if neighbourhood.assigned_heating_option:
+                continue
+
+            resources = list(dict.fromkeys(
+                resource for resource, _, _ in self.rules_of(neighbourhood)))
+            self.resources[neighbourhood.code] = resources
+
+            for resource in resources:
+                self.candidates[resource].append((position, neighbourhood))
+
+        # Keep track of the resources that can still be granted. A resource
+        # that no neighbourhood may claim is exhausted, the others are checked
+        # once a neighbourhood that may claim them is processed.
+        self.live_resources = set(resource for resource, candidates in
+                                  self.candidates.items() if candidates)
+
+
+    def rules_of(self, neighbourhood):
+        """
+        Returns a list of (resource, heating_option, route) triples of the
+        rules of the decision tree of the neighbourhood that may claim a
+        resource in this iteration
+        """
+
+        rules = []
+
+        for heating_option, route in self.decision_tree.rules_for(
+                neighbourhood, self.iteration):
+            if route in GAS_ROUTES:
+                rules.append(('gas', heating_option, route))
+
+            elif route in HEAT_SOURCE_ROUTES:
+                available_heat_sources = {
+                    'HT': neighbourhood.ht_sources_available,
+                    'LT': neighbourhood.lt_sources_available
+                }[route]
+
+                rules += [((route, code), heating_option, route)
+                          for code in available_heat_sources]
+
+        return rules
+
+
+    def requests_of(self, neighbourhood):
+        """
+        Returns the smallest demand per resource that the decision tree of the
+        neighbourhood may request in this iteration
+        """
+
+        if neighbourhood.code in self.requests:
+            return self.requests[neighbourhood.code]
+
+        demands = {}
+        requests = {}
+
+        for resource, heating_option, route in self.rules_of(neighbourhood):
+            if heating_option not in demands:
+                demands[heating_option] = future_heat_demands(
+                    neighbourhood, heating_option, self.bookkeeper)
+
+            if route in GAS_ROUTES:
+                demand = final_gas_demand(demands[heating_option])
+            else:
+                demand = final_residual_heat_demand(
+                    demands[heating_option],
+                    share_of_residual_heat_in_heat_network(heating_option,
+                                                           route))
+
+            requests[resource] = min(demand, requests.get(resource, demand))
+
+        self.requests[neighbourhood.code] = requests
+
+        return requests
+
+
+    def floor(self, resource):
+        """
+        Returns the heap of the demands of the neighbourhoods that may claim
+        the resource, determined the first time the resource is checked
+        """
+
+        if resource not in self.floors:
+            floor = [(self.requests_of(neighbourhood)[resource], position,
+                      neighbourhood.code)
+                     for position, neighbourhood in self.candidates.pop(
+                         resource)
+                     if neighbourhood.code not in self.processed]
+            heapq.heapify(floor)
+            self.floors[resource] = floor
+
+        return self.floors[resource]
+
+
+    def remaining(self, resource, remaining_gas):
+        """
+        Returns the remaining budget of the resource
+        """
+
+        if resource == 'gas':
+            return remaining_gas
+
+        heat_temperature, code = resource
+        source = self.heat_sources[heat_temperature][code]
+
+        return source.available_heat - source.used_heat
+
+
+    def is_exhausted(self, resource, remaining_gas):
+        """
+        Checks if the remaining budget of the resource is too small for all
+        neighbourhoods that have not been processed in this iteration
+        """
+
+        floor = self.floor(resource)
+
+        while floor and floor[0][2] in self.processed:
+            heapq.heappop(floor)
+
+        if not floor:
+            return True
+
+        return not self.remaining(resource, remaining_gas) > floor[0][0]
+
+
+    def all_exhausted(self):
+        """
+        Checks if none of the resources can be granted anymore
+        """
+
+        return not self.live_resources
+
+
+    def nothing_available(self, neighbourhood, remaining_gas):
+        """
+        Checks if none of the resources the neighbourhood may claim can be
+        granted to it. The check is exactly the one performed by
+        heat_sources_available and gas_available.
+        """
+
+        for resource, demand in self.requests_of(neighbourhood).items():
+            if self.remaining(resource, remaining_gas) > demand:
+                return False
+
+        return True
+
+
+    def mark_as_processed(self, neighbourhood, remaining_gas):
+        """
+        Mark the neighbourhood as processed in this iteration and update the
+        resources it may have claimed
+        """
+
+        self.processed.add(neighbourhood.code)
+
+        for resource in self.resources.get(neighbourhood.code, []):
+            if (resource in self.live_resources and
+                    self.is_exhausted(resource, remaining_gas)):
+                self.live_resources.discard(resource)
+
+
+    def fallback(self, neighbourhood):
+        """
+        Returns the heating option and supply route that the decision tree
+        assigns to the neighbourhood when no resource can be granted to it:
+        the first rule of the tree that does not depend on a scarce resource
+        and is open to the neighbourhood. The heating option is None if the
+        neighbourhood stays undecided in this iteration.
+        """
+
+        for heating_option, route in self.decision_tree.rules_for(
+                neighbourhood, self.iteration):
+            if route in GAS_ROUTES or route in HEAT_SOURCE_ROUTES:
+                continue
+
+            if is_open(neighbourhood, route):
+                return heating_option, route
+
+        return None, None
+
+
+    def assign_fallback(self, neighbourhood):
+        """
+        Assign the fallback heating option to the neighbourhood
+        """
+
+        heating_option, route = self.fallback(neighbourhood)
+
+        if route == 'electricity':
+            neighbourhood.assigned_heat_source = None
+            add_electricity_demand_to_bookkeeper(neighbourhood,
+                                                 self.bookkeeper)
+        elif route:
+            add_source_to_bookkeeper(neighbourhood, self.bookkeeper, route,
+                                     heating_option)
+
+        neighbourhood.assigned_heating_option = heating_option
+
+
+    def assign_fallback_in_bulk(self, neighbourhoods):
+        """
+        Assign the fallback heating option to all neighbourhoods at once. The
+        demands are added to the bookkeeper per carrier in a single batch
+        update (in the order of the neighbourhoods).
+        """
+
+        assigned = []
+        useful_demands = ([], [], [], [])
+        final_demands = {}
+
+        for neighbourhood in neighbourhoods:
+            heating_option, route = self.fallback(neighbourhood)
+            neighbourhood.assigned_heating_option = heating_option
+
+            if not heating_option:
+                continue
+
+            demands = future_heat_demands(neighbourhood, heating_option,
+                                          self.bookkeeper)
+
+            assigned.append(neighbourhood)
+            for batch, value in zip(useful_demands,
+                                    [demands.useful_residences,
+                                     demands.useful_utility,
+                                     demands.heat_reduction_residences,
+                                     demands.heat_reduction_utility]):
+                batch.append(value)
+
+            if route == 'electricity':
+                neighbourhood.assigned_heat_source = None
+                self.add_to_batch(final_demands, 'E', neighbourhood,
+                                  demands.final_residences,
+                                  demands.final_utility)
+                continue
+
+            # See add_source_to_bookkeeper
+            neighbourhood.assigned_heat_source = route
+            share_of_heat = config.current_project.SPECS[
+                f'share_of_{route}_heat']
+
+            self.add_to_batch(final_demands, route, neighbourhood,
+                              demands.useful_residences,
+                              demands.useful_utility)
+            self.add_to_batch(final_demands, 'backup', neighbourhood,
+                              demands.final_residences * (1. - share_of_heat),
+                              demands.final_utility * (1. - share_of_heat))
+
+        self.bookkeeper.add_useful_heat_demands(assigned, *useful_demands)
+
+        for heat_type, (batch, residences, utility) in final_demands.items():
+            self.bookkeeper.add_final_heat_demands(batch, heat_type,
+                                                   residences, utility)
+
+        for neighbourhood in neighbourhoods:
+            self.processed.add(neighbourhood.code)
+
+        return assigned
+
+
+    @staticmethod
+    def add_to_batch(final_demands, heat_type, neighbourhood, residences,
+                     utility):
+        """
+        Add the final demands of the neighbourhood to the batch of the heat type
+        """
+
+        batch = final_demands.setdefault(heat_type, ([], [], []))
+        batch[0].append(neighbourhood)
+        batch[1].append(residences)
+        batch[2].append(utility)
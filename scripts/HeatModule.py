@@ -0,0 +1,148 @@
+# system modules
+from collections import namedtuple
+import json
+import pickle
+
+# project modules
+from load_data import (build_stock, determine_preferences, map_heat_sources,
+                       set_attributes)
+from main import allocate, export_results, result_tables, summarise_run
+from normalisation import normalised
+from run_tests import run_checks
+from RunContext import ProjectSettings, RunContext
+from StageCache import STAGE_SETTINGS, setting_value, stages_of_settings
+import config
+
+# The results of a run of a scenario: its summary (see main.summarise_run),
+# the result tables (DataFrames by the name of their output file, see
+# main.result_tables), the results of the checks (see run_tests.run_checks)
+# and the objects of the allocation
+ScenarioResults = namedtuple('ScenarioResults', [
+    'summary', 'tables', 'checks', 'neighbourhoods', 'heat_sources',
+    'bookkeeper'
+])
+
+
+class HeatModule:
+    """
+    Class to describe the heat module of a project in memory, to run its
+    scenarios from Python (e.g. a notebook or a service) without the pickles
+    and CSV files of load_data.py and main.py:
+
+        module = HeatModule('sample').load()
+        results = module.run('scenario_1')
+        results.tables['neighbourhoods_output']
+
+    The stock and preferences of the neighbourhoods are loaded once, and the
+    heat sources once per set of heat sources (and reach) of the scenarios.
+    Each run works on its own copy of the neighbourhoods and heat sources,
+    and only writes its results to the output data directory if asked to.
+    """
+
+    def __init__(self, project_name, settings=None):
+        if settings is None:
+            settings = ProjectSettings(config.project_module(project_name))
+
+        self.project_name = project_name
+        self.settings = settings
+        self.neighbourhoods = None
+        self.mapped_heat_sources = {}
+
+
+    def load(self):
+        """
+        Load the stock and determine the preferences of the neighbourhoods
+        (which do not depend on the scenario). Returns the module.
+        """
+
+        with RunContext(self.project_name, None, self.settings).activate():
+            self.neighbourhoods = build_stock()
+            determine_preferences(self.neighbourhoods)
+
+        self.mapped_heat_sources = {}
+
+        return self
+
+
+    def run(self, scenario_name, export=False, tables=None, overrides=None):
+        """
+        Run the scenario: assign the heating options to (a copy of) the
+        neighbourhoods and bookkeep the results. Returns the results (see
+        ScenarioResults) with all result tables or the given tables, which
+        are also written to the output data directory of the scenario if
+        export is True.
+
+        Settings can be overridden for the run (see RunContext.override),
+        the stock and preferences are then determined again if they depend
+        on them.
+        """
+
+        if self.neighbourhoods is None:
+            self.load()
+
+        context = RunContext(self.project_name, scenario_name, self.settings)
+        stages = []
+
+        if overrides:
+            context.override(overrides)
+            stages = stages_of_settings(overrides.keys())
+
+        with context.activate():
+            if 'stock' in stages:
+                neighbourhoods = build_stock()
+                determine_preferences(neighbourhoods)
+                attributes, ht_sources, lt_sources = map_heat_sources(
+                    neighbourhoods)
+                heat_sources = {'HT': ht_sources, 'LT': lt_sources}
+
+            else:
+                attributes, ht_sources, lt_sources = (
+                    self.heat_sources_of_scenario())
+
+                # Copying the objects by pickling them in memory is about
+                # twice as fast as deepcopy
+                neighbourhoods, heat_sources = pickle.loads(pickle.dumps(
+                    (self.neighbourhoods, {'HT': ht_sources,
+                                           'LT': lt_sources}),
+                    pickle.HIGHEST_PROTOCOL))
+
+                if 'preferences' in stages:
+                    determine_preferences(neighbourhoods)
+
+            set_attributes(neighbourhoods, attributes)
+
+            neighbourhoods, bookkeeper, region_names = allocate(
+                neighbourhoods, heat_sources, context=context)
+
+            if export:
+                export_results(neighbourhoods, heat_sources, bookkeeper,
+                               region_names, context)
+
+            checks = run_checks(neighbourhoods, heat_sources, bookkeeper,
+                                context)
+
+            return ScenarioResults(
+                summarise_run(neighbourhoods, heat_sources, checks, context),
+                result_tables(neighbourhoods, heat_sources, bookkeeper,
+                              region_names, tables, context),
+                checks, neighbourhoods, heat_sources, bookkeeper)
+
+
+    def heat_sources_of_scenario(self):
+        """
+        Returns the heat sources of the current scenario mapped to the
+        neighbourhoods (see load_data.map_heat_sources), mapping them once
+        per set of heat sources
+        """
+
+        key = json.dumps(normalised({
+            name: setting_value(name) for name in STAGE_SETTINGS['sources']
+        }), sort_keys=True)
+
+        if key not in self.mapped_heat_sources:
+            # Mapping only sets the heat source attributes of the
+            # neighbourhoods, which are set again on the copy of each run
+            self.mapped_heat_sources[key] = map_heat_sources(
+                self.neighbourhoods)
+
+        return self.mapped_heat_sources[key]
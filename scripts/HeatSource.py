@@ -22,6 +22,53 @@ class HeatSource:
         else:
             self.available_heat = 9999999.0
 
+        # Inverse assignment index: the neighbourhoods supplied by this source
+        # as (neighbourhood code, distance, heat) in order of assignment
+        self.assignments = []
+
+
+    def __setstate__(self, state):
+        # Heat sources pickled before the assignments were kept have none
+        state.setdefault('assignments', [])
+        self.__dict__.update(state)
+
+
+    def assign(self, neighbourhood_code, heat, distance):
+        """
+        Assign heat of this source to a neighbourhood at the given distance
+        """
+
+        self.used_heat += heat
+        self.assignments.append((neighbourhood_code, distance, heat))
+
+
+    def utilisation_summary(self):
+        """
+        Returns the utilisation of this source, the number of neighbourhoods it
+        supplies and their distances (mean, weighted by the supplied heat, and
+        maximum)
+        """
+
+        granted_heat = sum(heat for _, _, heat in self.assignments)
+
+        if self.assignments and granted_heat > 0:
+            weighted_mean_distance = sum(
+                distance * heat
+                for _, distance, heat in self.assignments) / granted_heat
+        else:
+            weighted_mean_distance = 0.
+
+        return {
+            'utilisation': (self.used_heat / self.available_heat
+                            if self.available_heat else 0.),
+            'number_of_neighbourhoods_served': len(self.assignments),
+            'neighbourhoods_served': ','.join(
+                code for code, _, _ in self.assignments),
+            'weighted_mean_distance_in_m': weighted_mean_distance,
+            'max_distance_in_m': max(
+                (distance for _, distance, _ in self.assignments), default=0.)
+        }
+
 
     def __str__(self):
         overview = ("Source {} (id: {}) \n"
@@ -31,6 +31,16 @@ class Matrix:
         4) Sorting the heating option preference vector by preference
         """
 
+        self.determine_normalised_vector(neighbourhood)
+
+        return self.sorted_preference(neighbourhood)
+
+    def determine_normalised_vector(self, neighbourhood):
+        '''
+        Returns the normalised heating option vector of the neighbourhood by
+        executing step 1 and 2 of determine_heating_option_preference
+        '''
+
         # Determine heating option vector based on housing stock
         self.apply_matrix_to_housing_stock(neighbourhood)
 
@@ -45,7 +55,7 @@ class Matrix:
         # Normalize combined heating option vector
         self.normalized_vector = Matrix.normalise_vector(self.heat_demand_vector)
 
-        return self.sorted_preference(neighbourhood)
+        return self.normalized_vector
 
     def sorted_preference(self, neighbourhood):
         '''
@@ -60,9 +70,14 @@ class Matrix:
         )
 
         # Check for existing heat networks
+        # (set on every call, so the preferences can be determined again with
+        # other thresholds)
         ass = config.current_project.ASSUMPTIONS
-        if neighbourhood.existing_heat_network_share > ass['heat_network_coverage_threshold_high']:
-            neighbourhood.force_heat_network = True
+        neighbourhood.force_heat_network = (
+            neighbourhood.existing_heat_network_share >
+            ass['heat_network_coverage_threshold_high'])
+
+        if neighbourhood.force_heat_network:
             vector_with_offset = [1., 0., 0.]
         elif neighbourhood.existing_heat_network_share > ass['heat_network_coverage_threshold_low']:
             vector_with_offset[0] += ass['heat_network_coverage_favour']
@@ -0,0 +1,147 @@
+# external modules
+import numpy as np
+
+
+class NeighbourhoodGraph:
+    """
+    Class to describe the adjacency graph of the neighbourhoods (based on
+    their adjacent_neighbourhoods, see spatial_analysis.add_adjacent_features).
+
+    The graph is undirected and stored as compressed sparse rows: the
+    neighbours of neighbourhood i are indices[indptr[i]:indptr[i + 1]].
+    Adjacent neighbourhoods that are not part of the project are ignored.
+    """
+
+    def __init__(self, neighbourhoods):
+        self.codes = list(neighbourhoods.keys())
+        self.index = {code: index for index, code in enumerate(self.codes)}
+
+        edges = []
+
+        for index, neighbourhood in enumerate(neighbourhoods.values()):
+            for code in split_codes(
+                    getattr(neighbourhood, 'adjacent_neighbourhoods', None)):
+                if code in self.index and self.index[code] != index:
+                    edges.append((index, self.index[code]))
+
+        edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+        # Make the graph undirected and remove duplicate edges
+        edges = np.unique(np.concatenate([edges, edges[:, ::-1]]), axis=0)
+
+        self.indptr = np.zeros(len(self.codes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges[:, 0], minlength=len(self.codes)),
+                  out=self.indptr[1:])
+        self.indices = edges[:, 1].copy()
+
+
+    def __len__(self):
+        return len(self.codes)
+
+
+    def edges(self):
+        """
+        Returns the edges of the graph as an array of (i, j) pairs with i < j
+        """
+
+        sources = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        edges = np.column_stack([sources, self.indices])
+
+        return edges[edges[:, 0] < edges[:, 1]]
+
+
+    def neighbours(self, nodes):
+        """
+        Returns the neighbours of the nodes as two arrays: for each neighbour
+        the position of its node in nodes, and the neighbour itself
+        """
+
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+
+        owners = np.repeat(np.arange(len(nodes)), counts)
+        offsets = (np.arange(counts.sum()) -
+                   np.repeat(np.cumsum(counts) - counts, counts))
+
+        return owners, self.indices[np.repeat(starts, counts) + offsets]
+
+
+    def reach_per_source(self, sources, seeds, hops):
+        """
+        Returns the (source, neighbourhood) pairs of the neighbourhoods within
+        the number of hops of the seed neighbourhoods of each source, given
+        the seeds as pairs of arrays. The breadth-first searches of all
+        sources are done at once, on the pairs.
+        """
+
+        number_of_nodes = len(self)
+
+        visited = np.unique(np.asarray(sources, dtype=np.int64) *
+                            number_of_nodes +
+                            np.asarray(seeds, dtype=np.int64))
+        frontier = visited
+
+        for _ in range(hops):
+            if not len(frontier):
+                break
+
+            owners, neighbours = self.neighbours(frontier % number_of_nodes)
+            keys = np.unique((frontier // number_of_nodes)[owners] *
+                             number_of_nodes + neighbours)
+            frontier = keys[~np.isin(keys, visited, assume_unique=True)]
+            visited = np.union1d(visited, frontier)
+
+        return visited // number_of_nodes, visited % number_of_nodes
+
+
+def connected_components(number_of_nodes, edges):
+    """
+    Returns the component of each node, given the edges as (i, j) pairs, using
+    union-find with path halving and union by size. Components are numbered
+    in order of their first node.
+    """
+
+    parent = list(range(number_of_nodes))
+    size = [1] * number_of_nodes
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+
+        return node
+
+    for i, j in edges.tolist():
+        root_i, root_j = find(i), find(j)
+
+        if root_i == root_j:
+            continue
+
+        if size[root_i] < size[root_j]:
+            root_i, root_j = root_j, root_i
+
+        parent[root_j] = root_i
+        size[root_i] += size[root_j]
+
+    roots = np.array([find(node) for node in range(number_of_nodes)],
+                     dtype=np.int64)
+
+    # Number the components in order of their first node
+    _, first_nodes, components = np.unique(roots, return_index=True,
+                                           return_inverse=True)
+    ranks = np.empty(len(first_nodes), dtype=np.int64)
+    ranks[np.argsort(first_nodes)] = np.arange(len(first_nodes))
+
+    return ranks[components]
+
+
+def split_codes(codes):
+    """
+    Returns the list of codes in a comma separated string (or an empty list
+    if there are none)
+    """
+
+    if not isinstance(codes, str):
+        return []
+
+    return [code.strip() for code in codes.split(',') if code.strip()]
@@ -0,0 +1,278 @@
+# external modules
+import numpy as np
+
+# project modules
+from CandidateIndex import CandidateIndex
+from classify_neighbourhoods import future_heat_demands
+from DecisionTree import OPTION_INDEX, OPTIONS, decision_tree_of_project
+import config
+
+# Heating options for which future heat demands are calculated (in the same
+# order as OPTIONS)
+DEMAND_OPTIONS = OPTIONS[:-1]
+
+# Temperatures of the residual heat sources
+HEAT_TEMPERATURES = ['HT', 'LT']
+
+# Arrays of the snapshot with a row per neighbourhood
+NEIGHBOURHOOD_ARRAYS = [
+    'preference_options', 'preference_values', 'undecided', 'lt_elegible',
+    'geothermal_available', 'teo_available', 'force_heat_network',
+    'number_of_houses', 'm2_of_utility', 'demands'
+]
+
+
+class ProjectSnapshot:
+    """
+    Class to describe the neighbourhoods and heat sources of a project as flat
+    NumPy arrays, which is what the allocation kernel operates on.
+
+    The neighbourhoods are indexed in the order in which they are given. For
+    each neighbourhood the snapshot contains:
+
+    - its heating option preferences (first, second and third choice)
+    - its flags (LT eligibility, geothermal and TEO availability, existing
+      heat network)
+    - its stock: the number of houses and m2 of utility
+    - the demand tensor: the future heat demands of residences and utility
+      for each heating option its decision trees may assign (see
+      classify_neighbourhoods.HeatDemands)
+    - per heat temperature, the candidate heat sources in range sorted by
+      distance (as compressed sparse rows: the candidates of neighbourhood i
+      are indices[indptr[i]:indptr[i + 1]])
+
+    The demand tensor does not depend on the scenario, so it is taken from
+    the demands shared with the current run if there are any (see
+    shared_demands).
+    """
+
+    def __init__(self, neighbourhoods, heat_sources, bookkeeper=None,
+                 decision_tree=None):
+        if decision_tree is None:
+            decision_tree = decision_tree_of_project()
+
+        self.decision_tree = decision_tree
+        self.codes = list(neighbourhoods.keys())
+        self.index = {code: index for index, code in enumerate(self.codes)}
+
+        number_of_neighbourhoods = len(self.codes)
+
+        self.preference_options = np.full((number_of_neighbourhoods, 3), -1,
+                                          dtype=np.int64)
+        self.preference_values = np.zeros((number_of_neighbourhoods, 3))
+        self.undecided = np.zeros(number_of_neighbourhoods, dtype=np.bool_)
+        self.lt_elegible = np.zeros(number_of_neighbourhoods, dtype=np.bool_)
+        self.geothermal_available = np.zeros(number_of_neighbourhoods,
+                                             dtype=np.bool_)
+        self.teo_available = np.zeros(number_of_neighbourhoods,
+                                      dtype=np.bool_)
+        self.force_heat_network = np.zeros(number_of_neighbourhoods,
+                                           dtype=np.bool_)
+        self.number_of_houses = np.zeros(number_of_neighbourhoods)
+        self.m2_of_utility = np.zeros(number_of_neighbourhoods)
+
+        # Demand tensor: neighbourhood x heating option x HeatDemands field.
+        # Demands that can never be requested are left NaN.
+        self.demands = shared_demands(self.codes)
+        add_demands = self.demands is None
+
+        if add_demands:
+            self.demands = np.full(
+                (number_of_neighbourhoods, len(DEMAND_OPTIONS), 6), np.nan)
+
+        for index, neighbourhood in enumerate(neighbourhoods.values()):
+            self.add_neighbourhood(index, neighbourhood, bookkeeper,
+                                   add_demands)
+
+        # Heat sources and the candidate lists of the neighbourhoods
+        self.candidate_index = {}
+        self.source_codes = {}
+        self.source_index = {}
+        self.available_heat = {}
+        self.used_heat = {}
+        self.candidate_indptr = {}
+        self.candidate_indices = {}
+        self.candidate_distances = {}
+
+        for heat_temperature in HEAT_TEMPERATURES:
+            self.add_heat_sources(neighbourhoods,
+                                  heat_sources[heat_temperature],
+                                  heat_temperature)
+
+
+    @classmethod
+    def of_tiles(cls, tiles, codes):
+        """
+        Returns the snapshot of the neighbourhoods with the codes from the
+        snapshots of tiles of them (with the same heat sources and decision
+        trees, see tiled.py): (positions, snapshot) pairs, with the positions
+        of the neighbourhoods of each tile in codes
+        """
+
+        snapshot = cls.__new__(cls)
+        _, first = tiles[0]
+
+        snapshot.decision_tree = first.decision_tree
+        snapshot.codes = list(codes)
+        snapshot.index = {code: index
+                          for index, code in enumerate(snapshot.codes)}
+
+        for name in NEIGHBOURHOOD_ARRAYS:
+            array = getattr(first, name)
+            setattr(snapshot, name, np.empty((len(codes),) + array.shape[1:],
+                                             dtype=array.dtype))
+
+            for positions, tile in tiles:
+                getattr(snapshot, name)[positions] = getattr(tile, name)
+
+        snapshot.source_codes = first.source_codes
+        snapshot.source_index = first.source_index
+        snapshot.available_heat = first.available_heat
+        snapshot.used_heat = first.used_heat
+        snapshot.candidate_indptr = {}
+        snapshot.candidate_indices = {}
+        snapshot.candidate_distances = {}
+
+        for heat_temperature in HEAT_TEMPERATURES:
+            # Put the candidates of the neighbourhoods of the tiles in the
+            # order of the neighbourhoods
+            counts = np.zeros(len(codes), dtype=np.int64)
+
+            for positions, tile in tiles:
+                counts[positions] = np.diff(
+                    tile.candidate_indptr[heat_temperature])
+
+            indptr = np.zeros(len(codes) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            indices = np.empty(indptr[-1], dtype=np.int64)
+            distances = np.empty(indptr[-1], dtype=float)
+
+            for positions, tile in tiles:
+                tile_indptr = tile.candidate_indptr[heat_temperature]
+                tile_counts = np.diff(tile_indptr)
+                targets = (np.repeat(indptr[positions] - tile_indptr[:-1],
+                                     tile_counts) +
+                           np.arange(tile_indptr[-1]))
+
+                indices[targets] = tile.candidate_indices[heat_temperature]
+                distances[targets] = tile.candidate_distances[
+                    heat_temperature]
+
+            snapshot.candidate_indptr[heat_temperature] = indptr
+            snapshot.candidate_indices[heat_temperature] = indices
+            snapshot.candidate_distances[heat_temperature] = distances
+
+        return snapshot
+
+
+    def add_neighbourhood(self, index, neighbourhood, bookkeeper,
+                          add_demands=True):
+        """
+        Add the preferences, flags and (if add_demands) demands of the
+        neighbourhood
+        """
+
+        preference = neighbourhood.heating_option_preference
+
+        for rank, (option, value) in enumerate(preference):
+            self.preference_options[index, rank] = OPTION_INDEX[option]
+            self.preference_values[index, rank] = value
+
+        # See apply_pre_analysis
+        self.undecided[index] = sum(n for _, n in preference) == 0.
+        self.lt_elegible[index] = neighbourhood.lt_elegible
+        self.geothermal_available[index] = neighbourhood.geothermal_available
+        self.teo_available[index] = neighbourhood.teo_available
+        self.force_heat_network[index] = neighbourhood.force_heat_network
+        self.number_of_houses[index] = neighbourhood.number_of_houses()
+        self.m2_of_utility[index] = neighbourhood.m2_of_utility()
+
+        if self.undecided[index] or not add_demands:
+            return
+
+        for option in self.decision_tree.heating_options_for(neighbourhood):
+            self.demands[index, DEMAND_OPTIONS.index(option)] = (
+                future_heat_demands(neighbourhood, option, bookkeeper))
+
+
+    def add_heat_sources(self, neighbourhoods, heat_sources, heat_temperature):
+        """
+        Add the heat sources of the temperature, and for each neighbourhood the
+        heat sources in range sorted by distance (see CandidateIndex)
+        """
+
+        candidate_index = CandidateIndex(neighbourhoods, heat_sources,
+                                         heat_temperature)
+
+        self.candidate_index[heat_temperature] = candidate_index
+        self.source_codes[heat_temperature] = candidate_index.source_codes
+        self.source_index[heat_temperature] = candidate_index.source_index
+        self.available_heat[heat_temperature] = np.array(
+            [source.available_heat for source in heat_sources.values()],
+            dtype=float)
+        self.used_heat[heat_temperature] = np.array(
+            [source.used_heat for source in heat_sources.values()],
+            dtype=float)
+        self.candidate_indptr[heat_temperature] = candidate_index.indptr
+        self.candidate_indices[heat_temperature] = candidate_index.indices
+        self.candidate_distances[heat_temperature] = candidate_index.distances
+
+
+    def candidate_distance(self, heat_temperature, index, source):
+        """
+        Returns the distance from neighbourhood index to its candidate heat
+        source (both by index)
+        """
+
+        indptr = self.candidate_indptr[heat_temperature]
+        start, end = indptr[index], indptr[index + 1]
+        position = np.flatnonzero(
+            self.candidate_indices[heat_temperature][start:end] == source)[0]
+
+        return float(self.candidate_distances[heat_temperature][start +
+                                                                position])
+
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def demand_tensor(neighbourhoods):
+    """
+    Returns the demand tensor (see ProjectSnapshot) of the neighbourhoods for
+    all heating options, which only depends on their stock and the settings
+    of the project. The demands of undecided neighbourhoods are left NaN.
+    """
+
+    demands = np.full((len(neighbourhoods), len(DEMAND_OPTIONS), 6), np.nan)
+
+    for index, neighbourhood in enumerate(neighbourhoods.values()):
+        if sum(n for _, n in neighbourhood.heating_option_preference) == 0.:
+            continue
+
+        for column, option in enumerate(DEMAND_OPTIONS):
+            demands[index, column] = future_heat_demands(neighbourhood,
+                                                         option, None)
+
+    return demands
+
+
+def shared_demands(codes):
+    """
+    Returns the demand tensor of the neighbourhoods with the codes (in that
+    order) from the demands shared with the current run (the 'codes' and
+    'demands' arrays in RunContext.shared_demands, see scenario_runner), or
+    None if there are none or they lack some of the neighbourhoods
+    """
+
+    shared = getattr(config.current_context, 'shared_demands', None)
+
+    if shared is None:
+        return None
+
+    index = {code: row for row, code in enumerate(shared['codes'].tolist())}
+
+    if any(code not in index for code in codes):
+        return None
+
+    return shared['demands'][[index[code] for code in codes]]
@@ -0,0 +1,262 @@
+# system modules
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+
+# project modules
+from normalisation import normalised
+import config
+
+# The pickles written by load_data.py that a run of a scenario starts from
+LOADED_OBJECTS = ['neighbourhoods.pkl', 'ht_sources.pkl', 'lt_sources.pkl']
+
+# Files in the output data directory of a scenario that are never cached
+UNCACHED_FILES = ['run.log']
+
+# Settings of a project that are not part of the key of a run (the current
+# scenario is keyed on its own, the others do not change the results)
+UNKEYED_SETTINGS = ['SCENARIOS', 'RESULT_CACHE_SIZE', 'CHECKPOINT_INTERVAL',
+                    'TILE_SIZE']
+
+# Name of the file of a cache entry with the summary of the run and the
+# results of its checks
+SUMMARY_FILE = '.summary.pkl'
+
+
+class ResultCache:
+    """
+    Class to describe a content-addressed cache of the results of the runs of
+    the scenarios of a project (in output_data/<project>/.result_cache).
+
+    A run is keyed by a hash of everything it depends on: the input data of
+    the project, the objects loaded by load_data.py, the settings of the
+    project (except the other scenarios), the scenario and the scripts. A
+    cache entry holds the files the run wrote to the output data directory of
+    the scenario (results, demands, heat sources, etc.), its summary and the
+    results of its checks (see verification), so an identical run restores
+    them instead of running again.
+
+    The cache is kept under its size (in bytes, the RESULT_CACHE_SIZE of the
+    project) by evicting the least recently used entries.
+    """
+
+    def __init__(self, path, size):
+        self.path = Path(path)
+        self.size = size
+
+
+    @classmethod
+    def of_current_project(cls, context=None):
+        """
+        Returns the result cache of the project of the run context (or the
+        current one), or None if its RESULT_CACHE_SIZE is not set (or 0)
+        """
+
+        context = config.context_of_run(context)
+        size = getattr(context.project, 'RESULT_CACHE_SIZE', 0)
+
+        if not size:
+            return None
+
+        return cls(Path(__file__).resolve().parents[1] / "output_data" /
+                   f"{context.project_name}" / ".result_cache", size)
+
+
+    @staticmethod
+    def key_of_current_run():
+        """
+        Returns the key of a run of the current scenario
+        """
+
+        root = Path(__file__).resolve().parents[1]
+        digest = hashlib.sha256()
+
+        files = (
+            sorted((root / "input_data" /
+                    f"{config.current_project_name}").rglob('*')) +
+            [output_directory() / name for name in LOADED_OBJECTS])
+
+        for path in files:
+            if path.is_file():
+                digest.update(str(path.relative_to(root)).encode())
+                digest.update(file_digest(path))
+
+        digest.update(scripts_digest())
+
+        project = config.current_project
+        digest.update(json.dumps(normalised({
+            name: value for name, value in vars(project).items()
+            if name.isupper() and name not in UNKEYED_SETTINGS
+        }), sort_keys=True).encode())
+        digest.update(json.dumps(normalised(project.current_scenario),
+                                 sort_keys=True).encode())
+
+        return digest.hexdigest()
+
+
+    def restore(self, key):
+        """
+        Copy the cached files of the run with the key to the output data
+        directory of the current scenario. Returns the summary of the run and
+        the results of its checks, or None if it is not in the cache.
+        """
+
+        entry = self.path / key
+
+        try:
+            with open(entry / SUMMARY_FILE, 'rb') as input:
+                summary, checks = pickle.load(input)
+
+            directory = output_directory()
+
+            for path in entry.rglob('*'):
+                if path.is_file() and path.name != SUMMARY_FILE:
+                    target = directory / path.relative_to(entry)
+                    os.makedirs(target.parent, exist_ok=True)
+                    shutil.copyfile(path, target)
+
+            # Mark the entry as recently used
+            os.utime(entry / SUMMARY_FILE)
+
+        except FileNotFoundError:
+            # Not cached (or evicted by a concurrent run)
+            return None
+
+        return summary, checks
+
+
+    def store(self, key, summary, checks, paths):
+        """
+        Store the files (in the output data directory of the current
+        scenario), summary and results of the checks of the run with the key,
+        and evict the least recently used entries
+        """
+
+        directory = output_directory()
+        entry = self.path / key
+        temporary = self.path / f".{key}.{os.getpid()}"
+
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        for path in paths:
+            target = temporary / path.relative_to(directory)
+            os.makedirs(target.parent, exist_ok=True)
+            shutil.copyfile(path, target)
+
+        with open(temporary / SUMMARY_FILE, 'wb') as output:
+            pickle.dump((summary, checks), output, pickle.HIGHEST_PROTOCOL)
+
+        try:
+            os.replace(temporary, entry)
+        except OSError:
+            # Already stored by a concurrent run
+            shutil.rmtree(temporary, ignore_errors=True)
+
+        self.evict()
+
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is within its
+        size
+        """
+
+        entries = []
+
+        for entry in self.path.iterdir():
+            try:
+                entries.append(((entry / SUMMARY_FILE).stat().st_mtime,
+                                size_of(entry), entry))
+            except FileNotFoundError:
+                # Being stored or evicted by a concurrent run
+                continue
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, entry in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.size:
+                break
+
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def output_directory():
+    """
+    Returns the output data directory of the current scenario
+    """
+
+    return (Path(__file__).resolve().parents[1] / "output_data" /
+            f"{config.current_project_name}" /
+            f"{config.current_project.current_scenario_name}")
+
+
+def output_files():
+    """
+    Returns the size and modification time of the files in the output data
+    directory of the current scenario, by path
+    """
+
+    directory = output_directory()
+
+    if not directory.exists():
+        return {}
+
+    return {
+        path: (path.stat().st_size, path.stat().st_mtime_ns)
+        for path in directory.rglob('*')
+        if path.is_file() and path.name not in UNCACHED_FILES
+    }
+
+
+def changed_files(before):
+    """
+    Returns the files in the output data directory of the current scenario
+    that were written since output_files returned before
+    """
+
+    return [path for path, state in output_files().items()
+            if before.get(path) != state]
+
+
+def file_digest(path):
+    """
+    Returns the SHA-256 digest of the content of a file
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as input:
+        for block in iter(lambda: input.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.digest()
+
+
+def scripts_digest():
+    """
+    Returns the SHA-256 digest of the scripts (so changing the code
+    invalidates the cached results)
+    """
+
+    digest = hashlib.sha256()
+
+    for path in sorted(Path(__file__).resolve().parent.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(file_digest(path))
+
+    return digest.digest()
+
+
+def size_of(entry):
+    """
+    Returns the size of the files of a cache entry, in bytes
+    """
+
+    return sum(path.stat().st_size for path in entry.rglob('*')
+               if path.is_file())
+
@@ -0,0 +1,192 @@
+# system modules
+from contextlib import contextmanager
+import copy
+from pathlib import Path
+
+# project modules
+import config
+from DecisionTree import DEFAULT_DECISION_TREES
+
+
+class ProjectSettings:
+    """
+    Class to describe a snapshot of the settings of a project: a (deep) copy
+    of the settings in its config file (ASSUMPTIONS, SPECS, KEY_FIGURES,
+    SCENARIOS, etc.). Unlike the config module itself, a snapshot can be
+    pickled, e.g. to send it to the processes of a pool, and changing it
+    never changes the config file module.
+
+    Projects without DECISION_TREES get the default decision trees (see
+    DecisionTree), so the trees can be overridden like any other setting.
+    """
+
+    def __init__(self, project):
+        for name, value in vars(project).items():
+            if name.isupper():
+                setattr(self, name, copy.deepcopy(value))
+
+        if not hasattr(self, 'DECISION_TREES'):
+            self.DECISION_TREES = copy.deepcopy(DEFAULT_DECISION_TREES)
+
+        self.current_scenario = None
+        self.current_scenario_name = None
+
+
+    def set_current_scenario(self, scenario_name):
+        """
+        Set the current scenario to a copy of the scenario, so running it does
+        not change the scenario in SCENARIOS
+        """
+
+        self.current_scenario = copy.deepcopy(self.SCENARIOS[scenario_name])
+        self.current_scenario_name = scenario_name
+
+        return self.current_scenario, self.current_scenario_name
+
+
+class RunContext:
+    """
+    Class to describe the context of a run of a scenario: the project (a
+    ProjectSettings snapshot), the scenario and its mutable counters (the used
+    renewable gas). Each run has its own copy of the scenario, so a run never
+    changes SCENARIOS and reruns (or other scenarios) start from the same
+    state.
+
+    The context is passed explicitly to the run (main), its checks
+    (verification) and its exports (table_export). The decision trees still
+    get the project and scenario from config, so a run has to be done within
+    activate, which makes the context the current one (in
+    config.current_context, config.current_project and
+    config.current_project_name) and restores the previous one afterwards.
+    Functions that take a context fall back on the current one.
+    """
+
+    def __init__(self, project_name, scenario_name, settings=None):
+        if settings is None:
+            settings = ProjectSettings(config.project_module(project_name))
+
+        self.project_name = project_name
+        self.scenario_name = scenario_name
+        self.project = settings
+        self.active = False
+
+        # Arrays computed once for several runs (e.g. the demand tensor
+        # shared by the scenario runner, see ProjectSnapshot.shared_demands)
+        self.shared_demands = None
+
+        # Without a scenario, the context only provides the project settings
+        # (e.g. to load the stock, which does not depend on the scenario)
+        if scenario_name is None:
+            self.scenario = None
+            return
+
+        if scenario_name not in settings.SCENARIOS:
+            raise KeyError(f"Unknown scenario '{scenario_name}' in project "
+                           f"'{project_name}'")
+
+        self.scenario = copy.deepcopy(settings.SCENARIOS[scenario_name])
+        self.scenario.setdefault('used_renewable_gas', 0.)
+
+
+    def __getstate__(self):
+        """
+        A pickled copy of the context (e.g. sent to a worker process) is not
+        active, so it can be activated in the worker
+        """
+
+        return {**vars(self), 'active': False}
+
+
+    def output_directory(self):
+        """
+        Returns the output data directory of the scenario
+        """
+
+        return (Path(__file__).resolve().parents[1] / "output_data" /
+                f"{self.project_name}" / f"{self.scenario_name}")
+
+
+    @property
+    def counters(self):
+        """
+        Returns the mutable counters of the run
+        """
+
+        return {
+            'used_renewable_gas': float(self.scenario['used_renewable_gas'])
+        }
+
+
+    def override(self, overrides):
+        """
+        Override settings of the run (by name, e.g. 'SPECS.share_of_HT_heat',
+        'ASSUMPTIONS.desired_epi.E' or 'SCENARIO.renewable_gas_budget') on a
+        copy of the project settings, so other runs are not affected. The
+        settings of the project must exist, the scenario may get new keys.
+        """
+
+        self.project = copy.deepcopy(self.project)
+
+        for name, value in overrides.items():
+            section, *keys = name.split('.')
+
+            if section == 'SCENARIO':
+                settings = self.scenario
+            elif section.isupper() and hasattr(self.project, section):
+                settings, keys = vars(self.project), [section] + keys
+            else:
+                settings = None
+
+            for key in keys[:-1]:
+                settings = (settings.get(key)
+                            if isinstance(settings, dict) else None)
+
+            if (not keys or not isinstance(settings, dict) or
+                    (keys[-1] not in settings and
+                     settings is not self.scenario)):
+                raise KeyError(f"Unknown setting '{name}', a setting is "
+                               "named <section>.<key> (e.g. "
+                               "SPECS.share_of_HT_heat)")
+
+            settings[keys[-1]] = copy.deepcopy(value)
+
+
+    @contextmanager
+    def activate(self):
+        """
+        Context manager to make the context the current one during a run. It
+        is the only writer of config.current_context, config.current_project
+        and config.current_project_name, and restores them (and the current
+        scenario of the project) afterwards, so other contexts can be
+        activated within it.
+
+        Activating is not reentrant: a context can not be activated again
+        while it is active, and since config is shared by the process, runs
+        in threads of one process can not each have their own context (use
+        processes, see scenario_runner).
+        """
+
+        if self.active:
+            raise RuntimeError(f"The run context of '{self.project_name}' "
+                               f"({self.scenario_name}) is already active")
+
+        previous = (config.current_context, config.current_project,
+                    config.current_project_name)
+        previous_scenario = (self.project.current_scenario,
+                             self.project.current_scenario_name)
+
+        config.current_context = self
+        config.current_project = self.project
+        config.current_project_name = self.project_name
+        self.project.current_scenario = self.scenario
+        self.project.current_scenario_name = self.scenario_name
+        self.active = True
+
+        try:
+            yield self
+        finally:
+            self.active = False
+            (config.current_context, config.current_project,
+             config.current_project_name) = previous
+            (self.project.current_scenario,
+             self.project.current_scenario_name) = previous_scenario
@@ -0,0 +1,159 @@
+# system modules
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+# external modules
+import numpy as np
+
+# project modules
+from allocation_kernel import kernel_arrays
+
+# Arrays are aligned on cache lines in the shared memory block
+ALIGNMENT = 64
+
+# Picklable description of a shared snapshot: the name of its shared memory
+# block and the name, dtype, shape and offset of each array in it
+SnapshotDescriptor = namedtuple('SnapshotDescriptor', ['name', 'layout'])
+
+# The snapshots the current (worker) process is attached to, by name
+attached_snapshots = {}
+
+
+class SharedSnapshot:
+    """
+    Class to describe the arrays of a ProjectSnapshot published once in a
+    single shared memory block (see multiprocessing.shared_memory): the flags,
+    preferences and stock of the neighbourhoods, the demand tensor, the
+    candidate lists and capacities of the heat sources, and the compiled
+    decision trees (see allocation_kernel.kernel_arrays).
+
+    Worker processes attach to it with its descriptor (which is small,
+    whatever the number of neighbourhoods) and get read-only NumPy views on
+    the same memory, so no data is copied or pickled per worker. Their
+    mutable allocation state (e.g. the used heat of the heat sources, see
+    allocation_kernel.run_kernel) is kept private.
+
+    The process that publishes the snapshot owns the memory: close it (or use
+    the snapshot as a context manager) to release it.
+    """
+
+    def __init__(self, arrays):
+        arrays = {name: np.ascontiguousarray(array)
+                  for name, array in arrays.items()}
+
+        layout = []
+        size = 0
+
+        for name, array in arrays.items():
+            offset = -(-size // ALIGNMENT) * ALIGNMENT
+            layout.append((name, array.dtype.str, array.shape, offset))
+            size = offset + array.nbytes
+
+        self.memory = shared_memory.SharedMemory(create=True,
+                                                 size=max(size, 1))
+        self.descriptor = SnapshotDescriptor(self.memory.name, tuple(layout))
+        self.arrays = views(self.memory, self.descriptor.layout)
+
+        for name, array in arrays.items():
+            self.arrays[name].flags.writeable = True
+            self.arrays[name][...] = array
+            self.arrays[name].flags.writeable = False
+
+
+    @classmethod
+    def of_project_snapshot(cls, snapshot):
+        """
+        Returns the shared snapshot of a ProjectSnapshot: the arrays of the
+        kernel and the stock of the neighbourhoods
+        """
+
+        return cls({
+            **kernel_arrays(snapshot),
+            'number_of_houses': snapshot.number_of_houses,
+            'm2_of_utility': snapshot.m2_of_utility
+        })
+
+
+    def close(self):
+        """
+        Release the shared memory (the workers should be done with it)
+        """
+
+        self.arrays = {}
+        self.memory.close()
+        self.memory.unlink()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def views(memory, layout):
+    """
+    Returns read-only NumPy views on the arrays in the shared memory block
+    """
+
+    arrays = {}
+
+    for name, dtype, shape, offset in layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf,
+                           offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    return arrays
+
+
+def attach(descriptor):
+    """
+    Returns the arrays of a shared snapshot (read-only views), attaching the
+    current process to its shared memory once
+    """
+
+    if descriptor.name not in attached_snapshots:
+        memory = shared_memory.SharedMemory(name=descriptor.name)
+        attached_snapshots[descriptor.name] = (memory,
+                                               views(memory,
+                                                     descriptor.layout))
+
+    return attached_snapshots[descriptor.name][1]
+
+
+def call_on_snapshot(function, descriptor, arguments):
+    """
+    Call function(arrays, *arguments) on the arrays of a shared snapshot
+    """
+
+    return function(attach(descriptor), *arguments)
+
+
+def map_on_snapshot(function, snapshot, arguments, processes=None):
+    """
+    Call function(arrays, *arguments) for each of the arguments in a pool of
+    worker processes that attach to the shared snapshot (on their first
+    task), returns the results in the order of the arguments. The function
+    must be picklable (defined at the top level of a module).
+    """
+
+    arguments = [tuple(argument) for argument in arguments]
+
+    if processes is None:
+        processes = min(len(arguments), os.cpu_count() or 1)
+
+    if processes <= 1:
+        return [function(snapshot.arrays, *argument) for argument in arguments]
+
+    with ProcessPoolExecutor(max_workers=processes,
+                             initializer=attach,
+                             initargs=(snapshot.descriptor, )) as executor:
+        return list(
+            executor.map(call_on_snapshot, [function] * len(arguments),
+                         [snapshot.descriptor] * len(arguments), arguments,
+                         chunksize=max(1, len(arguments) //
+                                       (4 * processes))))
@@ -0,0 +1,273 @@
+# system modules
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+# project modules
+from DecisionTree import HEAT_SOURCE_ROUTES
+from ProjectSnapshot import DEMAND_OPTIONS
+from normalisation import normalised
+from ResultCache import file_digest, scripts_digest
+import config
+
+# Stages of a run of a scenario, in order, with the settings each stage reads
+# (a setting is named <section>.<key>, as in monte_carlo.point_estimate).
+#
+# The stages of loading the data (LOAD_STAGES) are cached: each also depends
+# on the stock (the first stage) and the input files it reads (see
+# files_of_stage). The demands (the insulation and efficiencies of the heating
+# options) and the allocation are computed when assigning the heating options
+# (see main.allocate), so changing their settings reuses all cached stages and
+# only changes the key of the run (see ResultCache).
+STAGE_SETTINGS = {
+    'stock': ['NEIGHBOURHOOD_CSVS'],
+    'preferences': [
+        'DEFAULT_MATRIX_RESIDENCES',
+        'DEFAULT_MATRIX_UTILITY',
+        'LT_MATRIX_RESIDENCES',
+        'LT_MATRIX_UTILITY',
+        'ASSUMPTIONS.linear_heat_density_max_offset',
+        'ASSUMPTIONS.heat_network_coverage_threshold_high',
+        'ASSUMPTIONS.heat_network_coverage_threshold_low',
+        'ASSUMPTIONS.heat_network_coverage_favour',
+        'ASSUMPTIONS.lt_eligibility_threshold',
+        'KEY_FIGURES.gj_to_mwh'
+    ],
+    'sources': [
+        'SCENARIO.ht_heat',
+        'SCENARIO.lt_heat',
+        'SCENARIO.geothermal',
+        'SCENARIO.teo',
+        'SCENARIO.source_reach_hops'
+    ],
+    'demands': [
+        'SPECS.efficiency_of_heat_network',
+        'SPECS.efficiency_of_LT_heat_network',
+        'SPECS.efficiency_gas_to_heat_ccb',
+        'SPECS.efficiency_gas_to_heat_hhp',
+        'SPECS.efficiency_electricity_to_heat',
+        'KEY_FIGURES.epi_reduction_table'
+    ] + [f'ASSUMPTIONS.desired_epi.{option}' for option in DEMAND_OPTIONS],
+    'allocation': [
+        f'SPECS.share_of_{route}_heat{suffix}'
+        for route in HEAT_SOURCE_ROUTES
+        for suffix in [''] + [f'_for_{option}' for option in DEMAND_OPTIONS]
+    ] + [
+        'DECISION_TREES',
+        'SCENARIO.allocation_engine',
+        'SCENARIO.source_selection',
+        'SCENARIO.max_source_distance',
+        'SCENARIO.renewable_gas_budget',
+        'SCENARIO.lp_time_limit',
+        'SCENARIO.lp_relative_gap'
+    ]
+}
+
+# Stages of loading the data (see load_data.py)
+LOAD_STAGES = ['stock', 'preferences', 'sources']
+
+# Scenario keys of the heat source files
+SOURCE_FILES = ['ht_heat', 'lt_heat', 'geothermal', 'teo']
+
+
+class StageCache:
+    """
+    Class to describe a cache of the outputs of the stages of loading the data
+    of a project (LOAD_STAGES, in output_data/<project>/.stage_cache): the
+    stock of the neighbourhoods, their heating option preferences and the
+    heat sources mapped to them.
+
+    The output of each stage is keyed by a fingerprint of exactly what it
+    depends on: the settings it reads (see STAGE_SETTINGS), its input files,
+    the stock and the scripts. So, e.g., changing a matrix only recomputes
+    the preferences, and changing the settings of the demand and allocation
+    stages (e.g. the efficiencies or the gas budget, which are only read when
+    assigning the heating options) reuses all stages.
+
+    The cache is kept under its size (in bytes, the RESULT_CACHE_SIZE of the
+    project) by evicting the least recently used outputs.
+    """
+
+    def __init__(self, path, size):
+        self.path = Path(path)
+        self.size = size
+        self.reused = {}
+
+
+    @classmethod
+    def of_current_project(cls):
+        """
+        Returns the stage cache of the current project, or None if its
+        RESULT_CACHE_SIZE is not set (or 0)
+        """
+
+        size = getattr(config.current_project, 'RESULT_CACHE_SIZE', 0)
+
+        if not size:
+            return None
+
+        return cls(Path(__file__).resolve().parents[1] / "output_data" /
+                   f"{config.current_project_name}" / ".stage_cache", size)
+
+
+    @staticmethod
+    def key_of_stage(stage, stock_key=None):
+        """
+        Returns the key of the stage in the current scenario (the stages after
+        the stock depend on the key of the stock)
+        """
+
+        digest = hashlib.sha256(stage.encode())
+
+        if stock_key is not None:
+            digest.update(stock_key.encode())
+
+        digest.update(json.dumps(normalised({
+            name: setting_value(name) for name in STAGE_SETTINGS[stage]
+        }), sort_keys=True).encode())
+
+        for path in files_of_stage(stage):
+            digest.update(path.name.encode())
+            digest.update(file_digest(path))
+
+        digest.update(scripts_digest())
+
+        return digest.hexdigest()
+
+
+    def run(self, stage, key, compute):
+        """
+        Returns the cached output of the stage with the key, or computes and
+        stores it
+        """
+
+        path = self.path / f"{stage}-{key}.pkl"
+
+        try:
+            with open(path, 'rb') as input:
+                output = pickle.load(input)
+
+            # Mark the output as recently used
+            os.utime(path)
+            self.reused[stage] = True
+
+            return output
+
+        except FileNotFoundError:
+            pass
+
+        output = compute()
+        self.reused[stage] = False
+
+        os.makedirs(self.path, exist_ok=True)
+        temporary = self.path / f".{stage}-{key}.{os.getpid()}"
+
+        with open(temporary, 'wb') as output_file:
+            pickle.dump(output, output_file, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, path)
+        self.evict()
+
+        return output
+
+
+    def evict(self):
+        """
+        Remove the least recently used outputs until the cache is within its
+        size
+        """
+
+        outputs = []
+
+        for path in self.path.glob('*.pkl'):
+            try:
+                status = path.stat()
+                outputs.append((status.st_mtime, status.st_size, path))
+            except FileNotFoundError:
+                # Evicted by a concurrent run
+                continue
+
+        total = sum(size for _, size, _ in outputs)
+
+        for _, size, path in sorted(outputs, key=lambda output: output[0]):
+            if total <= self.size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+
+    def print_report(self):
+        """
+        Print which stages were reused and which were computed
+        """
+
+        print('  - Stages: {}'.format(', '.join(
+            f"{stage} {'reused' if reused else 'computed'}"
+            for stage, reused in self.reused.items())))
+
+
+def setting_value(name):
+    """
+    Returns the value of a setting (e.g. 'ASSUMPTIONS.lt_eligibility_threshold'
+    or 'SCENARIO.ht_heat') in the current project and scenario, or None if it
+    is not set
+    """
+
+    section, *keys = name.split('.')
+
+    if section == 'SCENARIO':
+        value = config.current_project.current_scenario
+    else:
+        value = getattr(config.current_project, section, None)
+
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+
+        value = value.get(key)
+
+    return value
+
+
+def stages_of_settings(names):
+    """
+    Returns the stages that read any of the settings (or part of them)
+    """
+
+    return [
+        stage for stage, settings in STAGE_SETTINGS.items()
+        if any(name == setting or name.startswith(f'{setting}.') or
+               setting.startswith(f'{name}.')
+               for name in names for setting in settings)
+    ]
+
+
+def files_of_stage(stage):
+    """
+    Returns the input files the stage reads in the current project and
+    scenario
+    """
+
+    directory = (Path(__file__).resolve().parents[1] / "input_data" /
+                 f"{config.current_project_name}")
+
+    if stage == 'stock':
+        csvs = config.current_project.NEIGHBOURHOOD_CSVS
+        names = [csvs['list'], *csvs['properties'], csvs['housing_stock'],
+                 csvs['utility_stock']]
+
+    elif stage == 'sources':
+        scenario = config.current_project.current_scenario
+        names = [scenario[key] for key in SOURCE_FILES]
+
+    else:
+        names = []
+
+    return [directory / name for name in names]
@@ -0,0 +1,388 @@
+"""
+Allocation kernel: runs the pre-analysis and both iterations of the decision
+trees (see main.apply_decision_trees) on the flat arrays of a ProjectSnapshot,
+evaluating the compiled rule table of the project (see DecisionTree).
+
+The kernel is compiled with Numba if it is installed. Otherwise (or when
+compiled=False is passed to run_allocation_kernel) the very same function is
+run as pure Python. Both produce exactly the same assignments as the decision
+trees on the Neighbourhood objects: the kernel only decides, after which the
+decisions are replayed on the objects and the bookkeeper in the order in which
+they were made.
+"""
+
+# external modules
+import numpy as np
+
+# project modules
+from classify_neighbourhoods import (HeatDemands,
+                                     add_electricity_demand_to_bookkeeper,
+                                     add_gas_demand_to_bookkeeper,
+                                     add_heat_network_demand_to_bookkeeper,
+                                     add_present_heat_demand_to_bookkeeper,
+                                     determine_confidence,
+                                     final_gas_demand,
+                                     final_residual_heat_demand,
+                                     share_of_residual_heat_in_heat_network,
+                                     use_renewable_gas)
+from compilation import jit
+import config
+from DecisionTree import HEAT_SOURCE_ROUTES, OPTIONS, ROUTES
+from ProjectSnapshot import DEMAND_OPTIONS, HEAT_TEMPERATURES, ProjectSnapshot
+from source_selection import (capacity_index, claim_source,
+                              source_selection_of_scenario)
+
+# Heating options (see DecisionTree.OPTIONS)
+W_MTHT, H, E, W_LT, UNDECIDED = range(5)
+
+# Supply routes (see DecisionTree.ROUTES)
+(ROUTE_NONE, ROUTE_HT, ROUTE_LT, ROUTE_GEOTHERMAL, ROUTE_TEO, ROUTE_UNDEFINED,
+ ROUTE_GAS, ROUTE_ELECTRICITY, ROUTE_UNDECIDED) = range(len(ROUTES))
+
+
+@jit
+def allocate(orders, undecided, preference_options, rules, number_of_rules,
+             requires_lt_elegibility, lt_elegible, geothermal_available,
+             teo_available, force_heat_network, demands, shares, ht_indptr,
+             ht_indices, ht_distances, ht_available_heat, ht_used_heat,
+             lt_indptr, lt_indices, lt_distances, lt_available_heat,
+             lt_used_heat, strategy, max_distance, renewable_gas_budget,
+             used_renewable_gas):
+    """
+    Runs the pre-analysis and both iterations of the decision trees. The
+    neighbourhoods are visited in orders[0] (pre-analysis and first iteration)
+    and orders[1] (second iteration). For each neighbourhood the rules of the
+    decision tree of its preference are tried in order (see DecisionTree).
+
+    Returns per neighbourhood the assigned heating option, supply route, heat
+    source index (or -1) and stage (0: pre-analysis, 1 or 2: iteration),
+    the assigned neighbourhoods in order of assignment, and the used renewable
+    gas. The used heat of the sources is updated in place.
+    """
+
+    number_of_neighbourhoods = len(undecided)
+
+    # The capacity indices of the candidates (see source_selection)
+    ht_tree, ht_source_indptr, ht_source_positions = capacity_index(
+        ht_indices, len(ht_available_heat), ht_available_heat - ht_used_heat)
+    lt_tree, lt_source_indptr, lt_source_positions = capacity_index(
+        lt_indices, len(lt_available_heat), lt_available_heat - lt_used_heat)
+
+    options = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+    routes = np.zeros(number_of_neighbourhoods, dtype=np.int64)
+    sources = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+    stages = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+    events = np.empty(number_of_neighbourhoods, dtype=np.int64)
+    number_of_events = 0
+
+    # Pre-analysis
+    for position in range(number_of_neighbourhoods):
+        neighbourhood = orders[0, position]
+
+        if undecided[neighbourhood]:
+            options[neighbourhood] = UNDECIDED
+            routes[neighbourhood] = ROUTE_UNDECIDED
+            stages[neighbourhood] = 0
+            events[number_of_events] = neighbourhood
+            number_of_events += 1
+
+    for iteration in range(2):
+        for position in range(number_of_neighbourhoods):
+            neighbourhood = orders[iteration, position]
+
+            if options[neighbourhood] >= 0:
+                continue
+
+            preference = preference_options[neighbourhood, iteration]
+
+            for rule in range(number_of_rules[preference, iteration]):
+                option = rules[preference, iteration, rule, 0]
+                route = rules[preference, iteration, rule, 1]
+                source = -1
+
+                if (requires_lt_elegibility[option] and
+                        not lt_elegible[neighbourhood]):
+                    continue
+
+                if route == ROUTE_HT or route == ROUTE_LT:
+                    share = shares[option, route - ROUTE_HT]
+                    demand = (demands[neighbourhood, option, 0] * share +
+                              demands[neighbourhood, option, 3] * share)
+
+                    if route == ROUTE_HT:
+                        source = claim_source(
+                            ht_indptr, ht_indices, ht_distances,
+                            ht_available_heat, ht_used_heat, ht_tree,
+                            ht_source_indptr, ht_source_positions,
+                            neighbourhood, demand, strategy, max_distance)
+                    else:
+                        source = claim_source(
+                            lt_indptr, lt_indices, lt_distances,
+                            lt_available_heat, lt_used_heat, lt_tree,
+                            lt_source_indptr, lt_source_positions,
+                            neighbourhood, demand, strategy, max_distance)
+
+                    is_available = source >= 0
+
+                elif route == ROUTE_GAS:
+                    demand = (demands[neighbourhood, option, 0] +
+                              demands[neighbourhood, option, 3])
+                    is_available = (
+                        renewable_gas_budget - used_renewable_gas > demand)
+
+                    if is_available:
+                        used_renewable_gas += demand
+
+                elif route == ROUTE_GEOTHERMAL:
+                    is_available = geothermal_available[neighbourhood]
+                elif route == ROUTE_TEO:
+                    is_available = teo_available[neighbourhood]
+                elif route == ROUTE_UNDEFINED:
+                    is_available = force_heat_network[neighbourhood]
+                else:
+                    is_available = True
+
+                if not is_available:
+                    continue
+
+                options[neighbourhood] = option
+                routes[neighbourhood] = route
+                sources[neighbourhood] = source
+                stages[neighbourhood] = iteration + 1
+                events[number_of_events] = neighbourhood
+                number_of_events += 1
+                break
+
+    return (options, routes, sources, stages, events[:number_of_events],
+            used_renewable_gas)
+
+
+def iteration_orders(snapshot):
+    """
+    Returns the order in which the neighbourhoods are visited in the first and
+    second iteration (see apply_decision_trees): sorted on first preference
+    percentage, and then on first + second preference percentage
+    """
+
+    values = snapshot.preference_values
+
+    first = sorted(range(len(snapshot)), key=lambda i: values[i, 0],
+                   reverse=True)
+    second = sorted(first, key=lambda i: values[i, 0] + values[i, 1],
+                    reverse=True)
+
+    return np.array([first, second], dtype=np.int64)
+
+
+def residual_heat_shares(decision_tree, specs=None):
+    """
+    Returns the shares of HT and LT residual heat in the heat network per
+    heating option (NaN if no rule of the decision trees uses it), with the
+    SPECS of the project or the given specs
+    """
+
+    shares = np.full((len(OPTIONS), len(HEAT_SOURCE_ROUTES)), np.nan)
+
+    for rules in decision_tree.rule_table.values():
+        for heating_option, route in rules:
+            if route in HEAT_SOURCE_ROUTES:
+                shares[OPTIONS.index(heating_option),
+                       HEAT_SOURCE_ROUTES.index(route)] = (
+                    share_of_residual_heat_in_heat_network(heating_option,
+                                                           route, specs))
+
+    return shares
+
+
+def kernel_arrays(snapshot):
+    """
+    Returns the arrays of the snapshot the kernel operates on (by name): the
+    iteration orders, the compiled decision trees, the flags and demands of
+    the neighbourhoods and the candidate lists and capacities of the heat
+    sources. The kernel does not change them (see run_kernel).
+    """
+
+    decision_tree = snapshot.decision_tree
+    arrays = {
+        'orders': iteration_orders(snapshot),
+        'undecided': snapshot.undecided,
+        'preference_options': snapshot.preference_options,
+        'rules': decision_tree.rules,
+        'number_of_rules': decision_tree.number_of_rules,
+        'requires_lt_elegibility': decision_tree.requires_lt_elegibility,
+        'lt_elegible': snapshot.lt_elegible,
+        'geothermal_available': snapshot.geothermal_available,
+        'teo_available': snapshot.teo_available,
+        'force_heat_network': snapshot.force_heat_network,
+        'demands': snapshot.demands,
+        'shares': residual_heat_shares(decision_tree)
+    }
+
+    for heat_temperature in HEAT_TEMPERATURES:
+        prefix = heat_temperature.lower()
+
+        arrays[f'{prefix}_indptr'] = snapshot.candidate_indptr[
+            heat_temperature]
+        arrays[f'{prefix}_indices'] = snapshot.candidate_indices[
+            heat_temperature]
+        arrays[f'{prefix}_distances'] = snapshot.candidate_distances[
+            heat_temperature]
+        arrays[f'{prefix}_available_heat'] = snapshot.available_heat[
+            heat_temperature]
+        arrays[f'{prefix}_used_heat'] = snapshot.used_heat[heat_temperature]
+
+    return arrays
+
+
+def run_kernel(arrays, strategy, max_distance, renewable_gas_budget,
+               used_renewable_gas, compiled=True):
+    """
+    Run the kernel on the arrays (see kernel_arrays), which may be read-only
+    (e.g. in shared memory, see SharedSnapshot): only the used heat of the
+    heat sources is changed, on a private copy. Returns the results of
+    allocate and the used heat per heat temperature.
+    """
+
+    kernel = allocate if compiled else allocate.py_func
+    used_heat = {
+        heat_temperature:
+        arrays[f'{heat_temperature.lower()}_used_heat'].copy()
+        for heat_temperature in HEAT_TEMPERATURES
+    }
+
+    results = kernel(
+        arrays['orders'], arrays['undecided'], arrays['preference_options'],
+        arrays['rules'], arrays['number_of_rules'],
+        arrays['requires_lt_elegibility'], arrays['lt_elegible'],
+        arrays['geothermal_available'], arrays['teo_available'],
+        arrays['force_heat_network'], arrays['demands'], arrays['shares'],
+        arrays['ht_indptr'], arrays['ht_indices'], arrays['ht_distances'],
+        arrays['ht_available_heat'], used_heat['HT'], arrays['lt_indptr'],
+        arrays['lt_indices'], arrays['lt_distances'],
+        arrays['lt_available_heat'], used_heat['LT'], strategy, max_distance,
+        float(renewable_gas_budget), float(used_renewable_gas))
+
+    return results, used_heat
+
+
+def run_allocation_kernel(sorted_neighbourhoods, heat_sources, bookkeeper,
+                          compiled=True):
+    """
+    Assign heating options to the neighbourhoods with the allocation kernel,
+    and add the results to the neighbourhoods, heat sources and bookkeeper
+    """
+
+    snapshot = ProjectSnapshot(sorted_neighbourhoods, heat_sources, bookkeeper)
+    scenario = config.current_project.current_scenario
+
+    strategy, max_distance = source_selection_of_scenario()
+
+    (options, routes, sources, stages, events, _), _ = run_kernel(
+        kernel_arrays(snapshot), strategy, max_distance,
+        scenario['renewable_gas_budget'], scenario['used_renewable_gas'],
+        compiled)
+
+    replay_assignments(snapshot, sorted_neighbourhoods, heat_sources,
+                       bookkeeper, options, routes, sources, stages, events)
+
+    for stage, name in enumerate(['PRE-ANALYSIS', 'ITERATION 1',
+                                  'ITERATION 2']):
+        print("\n{}: [{}/{}] neighbourhoods have been assigned "
+              "a heating option".format(name,
+                                        np.count_nonzero((stages >= 0) &
+                                                         (stages <= stage)),
+                                        len(snapshot)))
+
+    if np.any(stages < 0):
+        print("\nERROR: some neighbourhoods are still undecided!")
+
+        for index in np.flatnonzero(stages < 0):
+            neighbourhood = sorted_neighbourhoods[snapshot.codes[index]]
+            print("  - {} ({})".format(neighbourhood.name, neighbourhood.code))
+
+
+def replay_assignments(snapshot, neighbourhoods, heat_sources, bookkeeper,
+                       options, routes, sources, stages, events):
+    """
+    Replay the decisions of the kernel on the neighbourhood and heat source
+    objects, and add the demands to the bookkeeper, in order of assignment
+    (so that all sums are accumulated in the same order as in the decision
+    trees)
+    """
+
+    for index in events:
+        neighbourhood = neighbourhoods[snapshot.codes[index]]
+        heating_option = OPTIONS[options[index]]
+        route = ROUTES[routes[index]]
+
+        neighbourhood.assigned_heating_option = heating_option
+
+        if route == 'undecided':
+            add_present_heat_demand_to_bookkeeper(neighbourhood, bookkeeper)
+
+        elif route == 'electricity':
+            neighbourhood.assigned_heat_source = None
+            add_electricity_demand_to_bookkeeper(
+                neighbourhood, bookkeeper,
+                heat_demands(snapshot, index, heating_option))
+
+        elif route == 'gas':
+            demands = heat_demands(snapshot, index, heating_option)
+            use_renewable_gas(final_gas_demand(demands))
+            add_gas_demand_to_bookkeeper(neighbourhood, bookkeeper,
+                                         heating_option, demands)
+
+        elif route in ['HT', 'LT']:
+            source, share_of_residual_heat, demands = assign_heat_source(
+                snapshot, heat_sources, index, heating_option, route,
+                sources[index])
+
+            neighbourhood.assigned_heat_source = source.code
+            add_heat_network_demand_to_bookkeeper(neighbourhood, bookkeeper,
+                                                  route,
+                                                  share_of_residual_heat,
+                                                  demands)
+
+        else:
+            neighbourhood.assigned_heat_source = route
+            add_heat_network_demand_to_bookkeeper(
+                neighbourhood, bookkeeper, route,
+                config.current_project.SPECS[f'share_of_{route}_heat'],
+                heat_demands(snapshot, index, heating_option))
+
+        if stages[index] == 0:
+            neighbourhood.stage_of_assignment = 'pre-analysis'
+            neighbourhood.confidence = config.current_project.ASSUMPTIONS[
+                'pre_analysis_confidence']
+        else:
+            determine_confidence(neighbourhood, stages[index] - 1)
+
+
+def assign_heat_source(snapshot, heat_sources, index, heating_option, route,
+                       source_index):
+    """
+    Assign the residual heat of the heat source (by its index in the
+    candidates of the route) to the neighbourhood. Returns the heat source,
+    the share of residual heat and the future heat demands of the
+    neighbourhood.
+    """
+
+    demands = heat_demands(snapshot, index, heating_option)
+    share_of_residual_heat = share_of_residual_heat_in_heat_network(
+        heating_option, route)
+
+    source = heat_sources[route][snapshot.source_codes[route][source_index]]
+    source.assign(snapshot.codes[index],
+                  final_residual_heat_demand(demands, share_of_residual_heat),
+                  snapshot.candidate_distance(route, index, source_index))
+
+    return source, share_of_residual_heat, demands
+
+
+def heat_demands(snapshot, index, heating_option):
+    """
+    Returns the future heat demands of the neighbourhood from the demand tensor
+    """
+
+    return HeatDemands(
+        *snapshot.demands[index, DEMAND_OPTIONS.index(heating_option)].tolist())
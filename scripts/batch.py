@@ -0,0 +1,442 @@
+"""
+Batch mode: run the scenarios of several projects (e.g. one per grid operator
+region, each with its own config file) as one batch on a shared pool of
+worker processes, instead of separate load_data.py and main.py runs.
+
+A batch is split into jobs:
+
+  - a snapshot job per project, which loads the stock and determines the
+    preferences of its neighbourhoods (which do not depend on the scenario)
+    once, and pickles them for the scenarios of the project,
+  - a load job per scenario, which maps the heat sources of the scenario to
+    the snapshot of the project and saves the neighbourhoods and heat sources
+    (as load_data.py does),
+  - an allocation job per scenario, which runs the scenario (as main.py does).
+
+A job is started once the jobs it depends on are done, if a worker is free
+and its memory estimate (from the number of neighbourhoods of the project,
+see MEMORY_PER_NEIGHBOURHOOD) fits in the memory left by the running jobs. A
+job whose estimate exceeds the memory limit is run on its own. Each job is
+run in a fresh worker process, so it returns its memory when it is done. If
+a job fails, the jobs that depend on it are skipped.
+
+Run python3 batch.py <project_name>:<scenario_name> ... <optional:
+processes=N> <optional: memory=MB> in your terminal to run the given
+scenarios (or all SCENARIOS of a project given without a scenario) on N
+processes (the number of CPUs by default) within a memory limit (the
+available memory by default). The output of each job is written to a log in
+the output data directory (snapshot.log of the project, load.log and run.log
+of the scenario). The jobs and a combined summary of the runs are printed at
+the end, and written to output_data/batch_report.csv.
+"""
+
+# system modules
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# project modules
+from load_data import (build_stock, determine_preferences, map_heat_sources,
+                       read_data, save_loaded_objects, set_attributes)
+from RunContext import ProjectSettings, RunContext
+from scenario_runner import (SUMMARY_COLUMNS, print_summary,
+                             run_scenario_with_log)
+from table_export import table_of_records
+import config
+
+# Estimated memory of a job (in bytes) per neighbourhood of its project, on
+# top of the memory of a worker process (WORKER_MEMORY)
+MEMORY_PER_NEIGHBOURHOOD = {'snapshot': 10e3, 'load': 12e3,
+                            'allocate': 32e3}
+
+# Memory of a worker process with the project modules imported (in bytes)
+WORKER_MEMORY = 250e6
+
+# A job of a batch: its kind (see MEMORY_PER_NEIGHBOURHOOD), project and
+# scenario (None for a snapshot job), the names of the jobs it depends on and
+# its memory estimate
+Job = namedtuple('Job', ['name', 'kind', 'project_name', 'scenario_name',
+                         'dependencies', 'memory'])
+
+# Columns of the table of jobs
+JOB_COLUMNS = ['job', 'status', 'estimated_MB', 'peak_MB', 'seconds']
+
+
+def output_path(project_name, *names):
+    """
+    Returns the path in the output data directory of the project
+    """
+
+    return Path(__file__).resolve().parents[1].joinpath(
+        "output_data", f"{project_name}", *names)
+
+
+def snapshot_path(directory, project_name):
+    """
+    Returns the path of the pickled snapshot of the project in the directory
+    of the batch
+    """
+
+    return Path(directory) / f"{project_name}.pkl"
+
+
+def load_project_snapshot(project_name, scenario_name, settings, directory):
+    """
+    Load the stock and determine the preferences of the neighbourhoods of the
+    project, and pickle them to the directory of the batch
+    """
+
+    path = output_path(project_name, "snapshot.log")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as log, redirect_stdout(log):
+        with RunContext(project_name, None, settings).activate():
+            print('\nLoading the stock and preferences of the '
+                  'neighbourhoods..')
+
+            neighbourhoods = build_stock()
+            determine_preferences(neighbourhoods)
+
+        with open(snapshot_path(directory, project_name), 'wb') as output:
+            pickle.dump(neighbourhoods, output, pickle.HIGHEST_PROTOCOL)
+
+        print('Done!')
+
+
+def load_scenario(project_name, scenario_name, settings, directory):
+    """
+    Map the heat sources of the scenario to the snapshot of its project, and
+    save the neighbourhoods and heat sources (see load_data.py)
+    """
+
+    path = output_path(project_name, scenario_name, "load.log")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as log, redirect_stdout(log):
+        with RunContext(project_name, scenario_name, settings).activate():
+            print('\nInitialising the heat sources of the scenario..')
+
+            with open(snapshot_path(directory, project_name), 'rb') as input:
+                neighbourhoods = pickle.load(input)
+
+            sources, ht_sources, lt_sources = map_heat_sources(
+                neighbourhoods)
+            set_attributes(neighbourhoods, sources)
+
+            save_loaded_objects(neighbourhoods, ht_sources, lt_sources)
+
+            print('Done!')
+
+
+def allocate_scenario(project_name, scenario_name, settings, directory):
+    """
+    Run the scenario (see main.py), returns the summary of the run
+    """
+
+    return run_scenario_with_log(project_name, scenario_name, settings)
+
+
+# The function of each kind of job
+JOB_FUNCTIONS = {
+    'snapshot': load_project_snapshot,
+    'load': load_scenario,
+    'allocate': allocate_scenario
+}
+
+
+def run_job(kind, project_name, scenario_name, settings, directory):
+    """
+    Run a job (in a worker process). Returns its output, its duration and the
+    peak memory of the worker process (None if unknown).
+    """
+
+    start = time.perf_counter()
+    output = JOB_FUNCTIONS[kind](project_name, scenario_name, settings,
+                                 directory)
+    duration = time.perf_counter() - start
+
+    if resource is None:
+        return output, duration, None
+
+    # The maximum resident set size is in kilobytes (on Linux)
+    return (output, duration,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+def number_of_neighbourhoods(project_name, settings):
+    """
+    Returns the number of neighbourhoods of the project (from its list of
+    neighbourhoods only)
+    """
+
+    with RunContext(project_name, None, settings).activate():
+        return len(read_data(
+            config.current_project.NEIGHBOURHOOD_CSVS['list'],
+            columns=['neighbourhood_code']))
+
+
+def available_memory():
+    """
+    Returns the available memory of the system (in bytes), or None if
+    unknown
+    """
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def jobs_of_batch(runs, settings):
+    """
+    Returns the jobs of the runs ((project, scenario) pairs) in the order in
+    which they are preferably started: per project its snapshot job, then the
+    load and allocation job of each of its scenarios
+    """
+
+    jobs = []
+
+    for project_name in dict.fromkeys(project for project, _ in runs):
+        neighbourhoods = number_of_neighbourhoods(project_name,
+                                                  settings[project_name])
+        memory = {kind: WORKER_MEMORY + neighbourhoods * per_neighbourhood
+                  for kind, per_neighbourhood in
+                  MEMORY_PER_NEIGHBOURHOOD.items()}
+
+        snapshot = Job(f'snapshot {project_name}', 'snapshot', project_name,
+                       None, [], memory['snapshot'])
+        jobs.append(snapshot)
+
+        for scenario_name in [scenario for project, scenario in runs
+                              if project == project_name]:
+            run = f'{project_name}:{scenario_name}'
+            load = Job(f'load {run}', 'load', project_name, scenario_name,
+                       [snapshot.name], memory['load'])
+            jobs.extend([load, Job(f'allocate {run}', 'allocate',
+                                   project_name, scenario_name, [load.name],
+                                   memory['allocate'])])
+
+    return jobs
+
+
+def record_result(record, future):
+    """
+    Record the result of the job of the future in its record
+    """
+
+    try:
+        (record['summary'], record['seconds'],
+         record['peak_memory']) = future.result()
+        record['status'] = 'done'
+
+    except Exception as error:
+        record['status'] = 'failed'
+        record['error'] = f'{type(error).__name__}: {error}'
+
+    print('  - {} {}'.format(record['status'].capitalize(), record['job']))
+
+
+def run_batch(runs, processes=None, memory_limit=None):
+    """
+    Run the jobs of the runs ((project, scenario) pairs) on a pool of
+    processes (the number of CPUs by default) within the memory limit (in
+    bytes, the available memory by default), see the module docstring.
+    Returns the records of the jobs, in the order of the jobs.
+    """
+
+    runs = list(dict.fromkeys(runs))
+
+    # One snapshot of the settings per project, for all its jobs
+    settings = {
+        project_name: ProjectSettings(config.project_module(project_name))
+        for project_name in dict.fromkeys(project for project, _ in runs)
+    }
+
+    for project_name, scenario_name in runs:
+        if scenario_name not in settings[project_name].SCENARIOS:
+            raise KeyError(f"Unknown scenario '{scenario_name}' in project "
+                           f"'{project_name}'")
+
+    jobs = jobs_of_batch(runs, settings)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if memory_limit is None:
+        memory_limit = available_memory()
+
+    records = {job.name: {'job': job.name, 'kind': job.kind,
+                          'project': job.project_name,
+                          'scenario': job.scenario_name,
+                          'status': 'pending', 'error': None,
+                          'estimated_memory': job.memory,
+                          'peak_memory': None, 'seconds': None,
+                          'summary': None} for job in jobs}
+
+    pending = list(jobs)
+    running = {}
+    output_data = Path(__file__).resolve().parents[1] / "output_data"
+    os.makedirs(output_data, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='.batch-', dir=output_data)
+
+    print('\nRunning {} jobs on {} processes{}..'.format(
+        len(jobs), processes, '' if memory_limit is None else
+        ' within {:.0f} MB'.format(memory_limit / 1e6)))
+
+    try:
+        # Each job is run in a fresh process, which returns its memory when
+        # the job is done
+        with ProcessPoolExecutor(max_workers=processes,
+                                 max_tasks_per_child=1) as executor:
+            while pending or running:
+                reserved = sum(job.memory for job in running.values())
+
+                for job in list(pending):
+                    statuses = [records[name]['status']
+                                for name in job.dependencies]
+
+                    if any(status in ['failed', 'skipped']
+                           for status in statuses):
+                        records[job.name]['status'] = 'skipped'
+                        pending.remove(job)
+
+                    elif (all(status == 'done' for status in statuses) and
+                          len(running) < processes and
+                          (not running or memory_limit is None or
+                           reserved + job.memory <= memory_limit)):
+                        print('  - Started {} ({:.0f} MB estimated)'.format(
+                            job.name, job.memory / 1e6))
+
+                        future = executor.submit(
+                            run_job, job.kind, job.project_name,
+                            job.scenario_name, settings[job.project_name],
+                            directory)
+                        running[future] = job
+                        reserved += job.memory
+                        records[job.name]['status'] = 'running'
+                        pending.remove(job)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    record_result(records[running.pop(future).name], future)
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return [records[job.name] for job in jobs]
+
+
+def megabytes(value):
+    """
+    Returns the number of bytes in MB (for the report), or None
+    """
+
+    return None if value is None else round(value / 1e6)
+
+
+def report_batch(records):
+    """
+    Print the jobs of the batch and the combined summary of its runs, and
+    write both to output_data/batch_report.csv (a row per job, with the
+    summary of each run on its allocation job)
+    """
+
+    rows = [{
+        'job': record['job'],
+        'status': record['status'],
+        'estimated_MB': str(megabytes(record['estimated_memory'])),
+        'peak_MB': ('' if record['peak_memory'] is None else
+                    str(megabytes(record['peak_memory']))),
+        'seconds': ('' if record['seconds'] is None else
+                    '{:.1f}'.format(record['seconds']))
+    } for record in records]
+
+    print_summary(rows, JOB_COLUMNS)
+
+    for record in records:
+        if record['error'] is not None:
+            print('\nERROR in {}: {}'.format(record['job'], record['error']))
+
+    summaries = [{'project': record['project'], **record['summary']}
+                 for record in records if record['summary'] is not None]
+
+    if summaries:
+        print_summary(summaries, ['project'] + SUMMARY_COLUMNS)
+
+    table = table_of_records([{
+        **{name: record[name] for name in ['job', 'kind', 'project',
+                                           'scenario', 'status', 'error',
+                                           'seconds']},
+        'estimated_MB': megabytes(record['estimated_memory']),
+        'peak_MB': megabytes(record['peak_memory']),
+        **{column: (record['summary'] or {}).get(column)
+           for column in SUMMARY_COLUMNS[1:]}
+    } for record in records])
+
+    path = (Path(__file__).resolve().parents[1] / "output_data" /
+            "batch_report.csv")
+    table.to_csv(path, index=False)
+
+    print(f'\nThe report of the batch is written to {path}')
+
+
+def runs_of_arguments(names):
+    """
+    Returns the runs ((project, scenario) pairs) of the names on the command
+    line: <project>:<scenario>, or <project> for all its SCENARIOS
+    """
+
+    runs = []
+
+    for name in names:
+        project_name, _, scenario_name = name.partition(':')
+
+        if scenario_name:
+            runs.append((project_name, scenario_name))
+        else:
+            runs.extend((project_name, scenario_name) for scenario_name in
+                        config.project_module(project_name).SCENARIOS)
+
+    return runs
+
+
+def main(args):
+    """
+    Run the batch given on the command line, see the module docstring
+    """
+
+    options = dict(arg.split('=', 1) for arg in args if '=' in arg)
+    names = [arg for arg in args if '=' not in arg]
+
+    if not names or set(options) - {'processes', 'memory'}:
+        print('The following arguments were expected: batch.py '
+              '<PROJECT>:<SCENARIO> ... <optional: processes=N> '
+              '<optional: memory=MB>')
+        return
+
+    records = run_batch(
+        runs_of_arguments(names),
+        int(options['processes']) if 'processes' in options else None,
+        float(options['memory']) * 1e6 if 'memory' in options else None)
+
+    report_batch(records)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,8 +1,17 @@
 # external modules
+from collections import namedtuple
 import numpy as np
 
 # project modules
+from DecisionTree import GAS_ROUTES, HEAT_SOURCE_ROUTES, is_open
 import config
+from source_selection import select_candidate, source_selection_of_scenario
+
+# Future heat demands (in GJ) of a neighbourhood for a heating option
+HeatDemands = namedtuple('HeatDemands', [
+    'final_residences', 'useful_residences', 'heat_reduction_residences',
+    'final_utility', 'useful_utility', 'heat_reduction_utility'
+])
 
 
 def apply_pre_analysis(neighbourhood, heat_sources, bookkeeper):
@@ -22,116 +31,84 @@ def apply_pre_analysis(neighbourhood, heat_sources, bookkeeper):
         add_present_heat_demand_to_bookkeeper(neighbourhood, bookkeeper)
 
 
-def apply_electricity_decision_tree(neighbourhood, heat_sources,
-                                    is_second_time, bookkeeper):
+def apply_decision_tree(neighbourhood, heat_sources, decision_tree, iteration,
+                        bookkeeper, candidate_index=None):
     """
-    Apply electricity decision tree: if the neighbourhood's heating preference
-    is all-electric, assign this option. Also check for W_LT
+    Apply the decision tree of the neighbourhood's preferred heating option in
+    the iteration (0: first preference, 1: second preference). The rules of
+    the tree are tried in order: the heating option of the first rule whose
+    supply route is available is assigned. If there is none, the heating
+    option is assigned to None (i.e., 'undecided' for now).
     """
 
-    # Check if this is either second time, or the neighbourhood does not want a W_LT
-    if is_second_time or not neighbourhood.lt_elegible:
-        neighbourhood.assigned_heating_option = 'E'
-        neighbourhood.assigned_heat_source = None
-        add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper)
-        return
-
-    # Else check for W_LT
-    if heat_sources_available(neighbourhood, 'W_LT', heat_sources['LT'], 'LT', bookkeeper):
-        neighbourhood.assigned_heating_option = 'W_LT'
-        return
-    # Else check for TEO
-    if neighbourhood.teo_available:
-        add_source_to_bookkeeper(neighbourhood, bookkeeper, 'TEO', 'W_LT')
-        neighbourhood.assigned_heating_option = 'W_LT'
-        return
-
-    neighbourhood.assigned_heating_option = 'E'
-    neighbourhood.assigned_heat_source = None
-    add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper)
-
-
-def apply_heat_decision_tree(neighbourhood, heat_sources, is_pre_analysis,
-                             is_second_time, bookkeeper):
-    """
-    Apply heat decision tree: if the neighbourhood's heating preference is
-    heat network, check if there are (still) heat sources available with
-    sufficient remaining heat to meet the neighbourhood's demand.
-    """
-
-    # Hypothetically assign 'W_MTHT' to the neighbourhood. If W doesn't work out,
-    # the heating option will be assigned to None again.
-    neighbourhood.assigned_heating_option = 'W_MTHT'
-
-    # If there is an HT source available for this neighbourhood, assign it
-    # (otherwise keep None)
-    if heat_sources_available(neighbourhood, 'W_MTHT', heat_sources['HT'], 'HT', bookkeeper):
-        return
-
-    # Else if there is a geothermal source available for this neighbourhood,
-    if neighbourhood.geothermal_available:
-        add_source_to_bookkeeper(neighbourhood, bookkeeper, 'geothermal', 'W_MTHT')
-        return
-
-    # Else if there is an LT source available,
-    if heat_sources_available(neighbourhood, 'W_MTHT', heat_sources['LT'], 'LT', bookkeeper):
-        return
-
-    # Check if there already is a heat network in the neighbourhood
-    if neighbourhood.force_heat_network:
-        neighbourhood.assigned_heat_source = 'undefined'
-        add_source_to_bookkeeper(neighbourhood, bookkeeper, 'undefined', 'W_MTHT')
-        return
-
-    # Else if the decision tree is applied in the pre-analysis,
-    # and no suitable option can be found, assign 'W_MTHT' and
-    # use the gas budgets as a backup heat source
-    if is_pre_analysis:
-        if gas_available(neighbourhood, 'W_MTHT', bookkeeper, 'backup'):
-            neighbourhood.assigned_heat_source = 'backup'
-            return
-
-    # Else if the decision tree is applied for the second time,
-    # and no suitable option can be found, assign 'E'
-    if is_second_time:
-        neighbourhood.assigned_heating_option = 'E'
+    # Future heat demands per heating option, calculated only once
+    demands = {}
 
-        # Add heat demand to bookkeeper
-        add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper)
+    for heating_option, route in decision_tree.rules_for(neighbourhood,
+                                                         iteration):
+        if heating_option not in demands:
+            demands[heating_option] = future_heat_demands(
+                neighbourhood, heating_option, bookkeeper)
 
-        return
+        if apply_route(neighbourhood, heat_sources, heating_option, route,
+                       bookkeeper, demands[heating_option], candidate_index):
+            neighbourhood.assigned_heating_option = heating_option
+            return
 
-    # If the decision tree is applied for the first time,
-    # and no suitable option can be found, assign None (or 'undecided')
     neighbourhood.assigned_heating_option = None
 
 
-def apply_hybrid_decision_tree(neighbourhood, heat_sources, is_second_time,
-                               bookkeeper):
+def apply_route(neighbourhood, heat_sources, heating_option, route,
+                bookkeeper, demands, candidate_index=None):
     """
-    Apply hybrid decision tree: if the neighbourhood's heating preference is
-    hybrid or renewable gas, check if there is (still) sufficient gas left to
-    meet the neighbourhood's demand.
+    Checks if the supply route is available for the heating option of the
+    neighbourhood. If so, claim the heat source or gas and add the demands to
+    the bookkeeper. The candidate index holds the candidate heat sources per
+    heat temperature (see CandidateIndex).
     """
 
-    heating_option = None
+    if route in HEAT_SOURCE_ROUTES:
+        return heat_sources_available(
+            neighbourhood, heating_option, heat_sources[route], route,
+            bookkeeper, demands,
+            candidate_index[route] if candidate_index else None)
+
+    if route in GAS_ROUTES:
+        return gas_available(neighbourhood, heating_option, bookkeeper,
+                             heating_option, demands)
+
+    if not is_open(neighbourhood, route):
+        return False
+
+    if route == 'electricity':
+        neighbourhood.assigned_heat_source = None
+        add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper,
+                                             demands)
+    else:
+        add_source_to_bookkeeper(neighbourhood, bookkeeper, route,
+                                 heating_option, demands)
 
-    # If there is network gas available for this neighbourhood,
-    # assign 'H'
-    if gas_available(neighbourhood, 'H', bookkeeper, 'H'):
-        heating_option = 'H'
+    return True
 
-    # Else if the decision tree is applied for the second time,
-    # and no suitable option can be found, assign 'E'
-    elif is_second_time:
-        heating_option = 'E'
 
-        # Add heat demand to bookkeeper
-        add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper)
+def determine_confidence(neighbourhood, iteration):
+    """
+    Determine the stage of assignment and the confidence for the heating option
+    assigned to the neighbourhood in the given iteration
+    """
+
+    neighbourhood.stage_of_assignment = 'iteration {}'.format(iteration + 1)
 
-    # If no suitable option can be found for this neighbourhood,
-    # return None, representing 'undecided'
-    neighbourhood.assigned_heating_option = heating_option
+    if neighbourhood.assigned_heating_option == 'W_LT':
+        confidence_option = 'E'
+    else:
+        confidence_option = neighbourhood.assigned_heating_option
+
+    confidence = [
+        conf for option, conf in neighbourhood.heating_option_preference
+        if option == confidence_option
+    ][0]
+    neighbourhood.confidence = confidence
 
 
 def sort_heat_sources_for_neighbourhood(neighbourhood, heat_sources,
@@ -171,82 +148,146 @@ def sort_heat_sources_for_neighbourhood(neighbourhood, heat_sources,
 
 
 def heat_sources_available(neighbourhood, heating_option, heat_sources,
-                           heat_temperature, bookkeeper):
+                           heat_temperature, bookkeeper, demands=None,
+                           candidate_index=None):
     """
-    Check if there is a heat source available for the neighbourhood
+    Check if there is a heat source available for the neighbourhood, selected
+    with the source selection strategy of the scenario (see source_selection).
+    The future heat demands for the heating option and the candidate index of
+    the heat sources (a CapacityIndex) may be given if they have been
+    calculated already.
     """
-    # Sort heat sources by distance for the neighbourhood
-    available_sources = sort_heat_sources_for_neighbourhood(
-        neighbourhood, heat_sources, heat_temperature)
 
-    if not available_sources:
-        return False
+    # Heat sources in range of the neighbourhood, sorted by distance
+    if candidate_index is None:
+        available_sources = sort_heat_sources_for_neighbourhood(
+            neighbourhood, heat_sources, heat_temperature)
 
-    # Calculate future heat demand for residences
-    final_heat_demand_residences, useful_heat_demand_residences, heat_reduction_residences = neighbourhood.future_heat_demand_of_residences(
-        bookkeeper, heating_option)
+        if not available_sources:
+            return False
 
-    # Calculate future heat demand for utility
-    final_heat_demand_utility, useful_heat_demand_utility, heat_reduction_utility = neighbourhood.future_heat_demand_of_utility(
-        bookkeeper, heating_option)
+    elif not candidate_index.number_of_candidates(neighbourhood):
+        return False
+
+    # Calculate future heat demand for residences and utility
+    if demands is None:
+        demands = future_heat_demands(neighbourhood, heating_option,
+                                      bookkeeper)
 
     # Get efficiency of using residual heat for the heat network
+    share_of_residual_heat = share_of_residual_heat_in_heat_network(
+        heating_option, heat_temperature)
+
+    # Calculate final demand of residual heat for the two combined
+    residual_heat_demand = final_residual_heat_demand(demands,
+                                                      share_of_residual_heat)
+
+    # Select a heat source with heat left for this neighbourhood
+    if candidate_index is None:
+        remaining_heat = np.array([
+            source['source'].available_heat - source['source'].used_heat
+            for source in available_sources
+        ], dtype=float)
+        distances = np.array([source['distance']
+                              for source in available_sources])
+
+        position = select_candidate(remaining_heat, distances,
+                                    residual_heat_demand,
+                                    *source_selection_of_scenario())
+        selected = (None if position < 0 else
+                    (available_sources[position]['source'].code,
+                     float(distances[position])))
+
+    else:
+        selected = candidate_index.select(neighbourhood, residual_heat_demand,
+                                          *source_selection_of_scenario())
+
+    # If there is no residual heat source available, return False
+    if selected is None:
+        return False
+
+    # Else assign heat source to neighbourhood and increase used heat
+    code, distance = selected
+    assigned_source = heat_sources[code]
+    neighbourhood.assigned_heat_source = assigned_source.code
+    assigned_source.assign(neighbourhood.code, residual_heat_demand, distance)
+
+    if candidate_index is not None:
+        candidate_index.update(assigned_source)
+
+    # Add future heat demands to the bookkeeper
+    add_heat_network_demand_to_bookkeeper(neighbourhood, bookkeeper,
+                                          heat_temperature,
+                                          share_of_residual_heat, demands)
+
+    return True
+
+
+def future_heat_demands(neighbourhood, heating_option, bookkeeper):
+    """
+    Returns the future heat demands of both residences and utility of the
+    neighbourhood for the heating option
+    """
+
+    return HeatDemands(
+        *neighbourhood.future_heat_demand_of_residences(bookkeeper,
+                                                        heating_option),
+        *neighbourhood.future_heat_demand_of_utility(bookkeeper,
+                                                     heating_option))
+
+
+def share_of_residual_heat_in_heat_network(heating_option, heat_temperature,
+                                           specs=None):
+    """
+    Returns the share of residual heat (HT or LT) in the heat network of the
+    heating option. The remaining share is provided by a backup heater. The
+    SPECS of the project are used, unless other specs are given.
+    """
+
+    if specs is None:
+        specs = config.current_project.SPECS
+
     try:
-        share_of_residual_heat = config.current_project.SPECS[
-            'share_of_{}_heat'.format(heat_temperature)
-        ]
+        return specs['share_of_{}_heat'.format(heat_temperature)]
     except KeyError:
-        share_of_residual_heat = config.current_project.SPECS[
-            f'share_of_{heat_temperature}_heat_for_{heating_option}'
-        ]
+        return specs[f'share_of_{heat_temperature}_heat_for_{heating_option}']
 
-    # Calculate final demand of residual heat
-    final_residual_heat_demand_residences = (final_heat_demand_residences * share_of_residual_heat)
-    final_residual_heat_demand_utility = (final_heat_demand_utility * share_of_residual_heat)
 
-    # Calculate final demand of backup heat for cofiring
-    final_backup_demand_residences = final_heat_demand_residences * (
-        1. - share_of_residual_heat)
-    final_backup_demand_utility = final_heat_demand_utility * (
-        1. - share_of_residual_heat)
+def final_residual_heat_demand(demands, share_of_residual_heat):
+    """
+    Returns the final demand of residual heat (HT or LT) for residences and
+    utility combined, i.e. the heat that is claimed from a heat source
+    """
 
-    # Calculate future heat demand for the two combined
-    final_residual_heat_demand = (final_residual_heat_demand_residences +
-                                  final_residual_heat_demand_utility)
-
-    # print('   Checking for available {} sources..'.format(heat_temperature))
-    for available_source in available_sources:
-        # Check if closest heat source has heat left for this neighbourhood
-        available_source_object = heat_sources[available_source['source'].code]
-        remaining_heat = (available_source_object.available_heat -
-                          available_source_object.used_heat)
-
-        if remaining_heat > final_residual_heat_demand:
-            assigned_source = available_source_object.code
-
-            # If so, assign heat source to neighbourhood and increase used heat
-            neighbourhood.assigned_heat_source = assigned_source
-            available_source_object.used_heat += final_residual_heat_demand
-
-            # Add future heat demands to the bookkeeper
-            bookkeeper.add_useful_heat_demand(neighbourhood,
-                                              useful_heat_demand_residences,
-                                              useful_heat_demand_utility,
-                                              heat_reduction_residences,
-                                              heat_reduction_utility)
-
-            # Add final demands to the bookkeeper
-            bookkeeper.add_final_heat_demand(neighbourhood, heat_temperature,
-                                             useful_heat_demand_residences,
-                                             useful_heat_demand_utility)
-            bookkeeper.add_final_heat_demand(neighbourhood, 'backup',
-                                             final_backup_demand_residences,
-                                             final_backup_demand_utility)
-
-            return True
+    return ((demands.final_residences * share_of_residual_heat) +
+            (demands.final_utility * share_of_residual_heat))
+
+
+def final_gas_demand(demands):
+    """
+    Returns the final demand of renewable gas for residences and utility
+    combined, i.e. the gas that is claimed from the gas budget
+    """
+
+    return demands.final_residences + demands.final_utility
+
+
+def remaining_renewable_gas():
+    """
+    Returns the renewable gas budget that is still left in the current scenario
+    """
+
+    return (config.current_project.current_scenario['renewable_gas_budget'] -
+            config.current_project.current_scenario['used_renewable_gas'])
+
+
+def use_renewable_gas(gas_demand):
+    """
+    Use renewable gas of the budget of the current scenario
+    """
+
+    config.current_project.current_scenario['used_renewable_gas'] += gas_demand
 
-    # If there is no residual heat source available, return False
-    return False
 
 def add_heat_demands_for_undefined(neighbourhood, bookkeeper):
     # Calculate future heat demand for residences
@@ -264,7 +305,8 @@ def add_heat_demands_for_undefined(neighbourhood, bookkeeper):
                                       heat_reduction_residences,
                                       heat_reduction_utility)
 
-def add_source_to_bookkeeper(neighbourhood, bookkeeper, source, heating_option):
+def add_source_to_bookkeeper(neighbourhood, bookkeeper, source, heating_option,
+                             demands=None):
     """
     Use source for heating_option for a neighbourhood, and add info to the
     Bookkeeper
@@ -274,86 +316,76 @@ def add_source_to_bookkeeper(neighbourhood, bookkeeper, source, heating_option):
     neighbourhood.assigned_heat_source = source
 
     # Calculate future heat demand for residences and utility
-    final_hd_residences, useful_hd_residences, heat_reduction_residences = neighbourhood.future_heat_demand_of_residences(
-        bookkeeper, heating_option)
+    if demands is None:
+        demands = future_heat_demands(neighbourhood, heating_option,
+                                      bookkeeper)
 
-    final_hd_utility, useful_hd_utility, heat_reduction_utility = neighbourhood.future_heat_demand_of_utility(
-        bookkeeper, heating_option)
+    # Get share of using sources heat for the heat network
+    share_of_heat = config.current_project.SPECS[f'share_of_{source}_heat']
 
     # Add future heat demands to the bookkeeper
-    bookkeeper.add_useful_heat_demand(neighbourhood,
-                                      useful_hd_residences,
-                                      useful_hd_utility,
-                                      heat_reduction_residences,
-                                      heat_reduction_utility)
+    add_heat_network_demand_to_bookkeeper(neighbourhood, bookkeeper, source,
+                                          share_of_heat, demands)
 
-    # Get share of using sources heat for the heat network
-    share_of_heat = config.current_project.SPECS[f'share_of_{source}_heat']
+    return True
 
-    # Calculate final demand of sources heat
-    # final_source_demand_residences = (final_heat_demand_residences * share_of_heat)
-    # final_source_demand_utility = (final_heat_demand_utility * share_of_heat)
+
+def add_heat_network_demand_to_bookkeeper(neighbourhood, bookkeeper, heat_type,
+                                          share_of_heat, demands):
+    """
+    Add the demands of a neighbourhood on a heat network to the bookkeeper.
+    The heat_type is the source of the heat network (HT, LT, geothermal, TEO or
+    undefined) that provides share_of_heat, the remaining share is provided by
+    a backup heater for cofiring.
+    """
+
+    # Add useful demands to the bookkeeper
+    bookkeeper.add_useful_heat_demand(neighbourhood,
+                                      demands.useful_residences,
+                                      demands.useful_utility,
+                                      demands.heat_reduction_residences,
+                                      demands.heat_reduction_utility)
 
     # Calculate final demand of backup heat for cofiring
-    final_backup_demand_residences = final_hd_residences * (1. - share_of_heat)
-    final_backup_demand_utility = final_hd_utility * (1. - share_of_heat)
+    final_backup_demand_residences = demands.final_residences * (
+        1. - share_of_heat)
+    final_backup_demand_utility = demands.final_utility * (1. - share_of_heat)
 
     # Add final demands to the bookkeeper
-    bookkeeper.add_final_heat_demand(neighbourhood, source,
-                                     useful_hd_residences,
-                                     useful_hd_utility)
+    bookkeeper.add_final_heat_demand(neighbourhood, heat_type,
+                                     demands.useful_residences,
+                                     demands.useful_utility)
     bookkeeper.add_final_heat_demand(neighbourhood, 'backup',
                                      final_backup_demand_residences,
                                      final_backup_demand_utility)
 
-    return True
 
-def gas_available(neighbourhood, heating_option, bookkeeper, heat_type):
+def gas_available(neighbourhood, heating_option, bookkeeper, heat_type,
+                  demands=None):
     """
     Checks if there is enough gas available to meet the future heat demand of
     the neighbourhood. If so, increase the used_renewable_gas variable, and
     update the bookkeeper.
     """
 
-    # Calculate future heat demand for residences
-    final_gas_demand_residences, useful_heat_demand_residences, heat_reduction_residences = neighbourhood.future_heat_demand_of_residences(
-        bookkeeper, heating_option)
-
-    # Calculate future heat demand for utility
-    final_gas_demand_utility, useful_heat_demand_utility, heat_reduction_utility = neighbourhood.future_heat_demand_of_utility(
-        bookkeeper, heating_option)
+    # Calculate future heat demand for residences and utility
+    if demands is None:
+        demands = future_heat_demands(neighbourhood, heating_option,
+                                      bookkeeper)
 
     # Calculate future heat demand for the two combined
-    final_gas_demand = (final_gas_demand_residences +
-                         final_gas_demand_utility)
+    gas_demand = final_gas_demand(demands)
 
     # Check if there is enough gas left to meet the neighbourhood's heat demand
-    remaining_gas = config.current_project.current_scenario[
-        'renewable_gas_budget'] - config.current_project.current_scenario['used_renewable_gas']
+    remaining_gas = remaining_renewable_gas()
 
-    if remaining_gas > final_gas_demand:
+    if remaining_gas > gas_demand:
         # If so, increase used renewable gas
-        config.current_project.current_scenario['used_renewable_gas'] += final_gas_demand
-
-        electricity_demand_residences = (useful_heat_demand_residences * config.current_project.SPECS['electricity_share_in_heat_demand_hhp']) / config.current_project.SPECS['efficiency_electricity_to_heat']
-        electricity_demand_utility = (useful_heat_demand_utility * config.current_project.SPECS['electricity_share_in_heat_demand_hhp']) / config.current_project.SPECS['efficiency_electricity_to_heat']
+        use_renewable_gas(gas_demand)
 
-        # Add useful demands to the bookkeeper
-        bookkeeper.add_useful_heat_demand(neighbourhood,
-                                          useful_heat_demand_residences,
-                                          useful_heat_demand_utility,
-                                          heat_reduction_residences,
-                                          heat_reduction_utility)
-
-        # Add final demands to the bookkeeper
-        bookkeeper.add_final_heat_demand(neighbourhood, heat_type,
-                                         final_gas_demand_residences,
-                                         final_gas_demand_utility)
-
-        # Add final demands to the bookkeeper
-        bookkeeper.add_final_heat_demand(neighbourhood, 'E',
-                                         electricity_demand_residences,
-                                         electricity_demand_utility)
+        # Add future demands to the bookkeeper
+        add_gas_demand_to_bookkeeper(neighbourhood, bookkeeper, heat_type,
+                                     demands)
 
         return True
 
@@ -361,6 +393,33 @@ def gas_available(neighbourhood, heating_option, bookkeeper, heat_type):
     return False
 
 
+def add_gas_demand_to_bookkeeper(neighbourhood, bookkeeper, heat_type, demands):
+    """
+    Add the demands of a neighbourhood with a (hybrid) gas heating option to
+    the bookkeeper
+    """
+
+    electricity_demand_residences = (demands.useful_residences * config.current_project.SPECS['electricity_share_in_heat_demand_hhp']) / config.current_project.SPECS['efficiency_electricity_to_heat']
+    electricity_demand_utility = (demands.useful_utility * config.current_project.SPECS['electricity_share_in_heat_demand_hhp']) / config.current_project.SPECS['efficiency_electricity_to_heat']
+
+    # Add useful demands to the bookkeeper
+    bookkeeper.add_useful_heat_demand(neighbourhood,
+                                      demands.useful_residences,
+                                      demands.useful_utility,
+                                      demands.heat_reduction_residences,
+                                      demands.heat_reduction_utility)
+
+    # Add final demands to the bookkeeper
+    bookkeeper.add_final_heat_demand(neighbourhood, heat_type,
+                                     demands.final_residences,
+                                     demands.final_utility)
+
+    # Add final demands to the bookkeeper
+    bookkeeper.add_final_heat_demand(neighbourhood, 'E',
+                                     electricity_demand_residences,
+                                     electricity_demand_utility)
+
+
 def efficiency_of_heating_option(neighbourhood, heating_option):
     """
     Returns the heat losses (in GJ) per heating option. These should be
@@ -414,28 +473,26 @@ def add_present_heat_demand_to_bookkeeper(neighbourhood, bookkeeper):
         neighbourhood.total_heat_demand_of_utility())
 
 
-def add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper):
+def add_electricity_demand_to_bookkeeper(neighbourhood, bookkeeper,
+                                         demands=None):
     """
     After heating option 'E' has been assigned to a neighbourhood, add the
-    future electricity demand to the bookkeeper.
+    future electricity demand to the bookkeeper. The future heat demands for
+    'E' may be given if they have been calculated already.
     """
 
-    # Calculate final heat demand for residences
-    final_heat_demand_residences, useful_heat_demand_residences, heat_reduction_residences = neighbourhood.future_heat_demand_of_residences(
-        bookkeeper, 'E')
-
-    # Calculate final heat demand for utility
-    final_heat_demand_utility, useful_heat_demand_utility, heat_reduction_utility = neighbourhood.future_heat_demand_of_utility(
-        bookkeeper, 'E')
+    # Calculate final heat demand for residences and utility
+    if demands is None:
+        demands = future_heat_demands(neighbourhood, 'E', bookkeeper)
 
     # Add useful demands to the bookkeeper
     bookkeeper.add_useful_heat_demand(neighbourhood,
-                                      useful_heat_demand_residences,
-                                      useful_heat_demand_utility,
-                                      heat_reduction_residences,
-                                      heat_reduction_utility)
+                                      demands.useful_residences,
+                                      demands.useful_utility,
+                                      demands.heat_reduction_residences,
+                                      demands.heat_reduction_utility)
 
     # Add final demands to the bookkeeper
     bookkeeper.add_final_heat_demand(neighbourhood, 'E',
-                                     final_heat_demand_residences,
-                                     final_heat_demand_utility)
+                                     demands.final_residences,
+                                     demands.final_utility)
@@ -0,0 +1,22 @@
+"""
+Optional compilation of the array kernels with Numba. Numba is not a required
+dependency: without it the kernels simply run as pure Python.
+"""
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def jit(function):
+    """
+    Compile the function with Numba if it is installed. The pure Python
+    function remains available as function.py_func.
+    """
+
+    if njit is None:
+        function.py_func = function
+        return function
+
+    return njit(cache=True)(function)
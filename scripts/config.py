@@ -1,11 +1,38 @@
 import importlib
 
-def set_current_project(project_name):
+# The context of the current run and its project settings (see RunContext),
+# only set by RunContext.activate
+current_context = None
+current_project = None
+current_project_name = None
 
-    global current_project
-    global current_project_name
 
-    current_project = importlib.import_module('..{}'.format(project_name), 'config_files.subpkg')
-    current_project_name = project_name
+def project_module(project_name, reload=False):
+    """
+    Returns the config file module of the project, reloaded from the config
+    file if reload is True
+    """
 
-    return current_project, current_project_name
\ No newline at end of file
+    module = importlib.import_module('..{}'.format(project_name),
+                                     'config_files.subpkg')
+
+    if reload:
+        module = importlib.reload(module)
+
+    return module
+
+
+def context_of_run(context=None):
+    """
+    Returns the given run context, or the current one if none is given (see
+    RunContext)
+    """
+
+    if context is None:
+        context = current_context
+
+    if context is None:
+        raise RuntimeError('No run context has been given or activated, see '
+                           'RunContext')
+
+    return context
@@ -260,6 +260,19 @@ NEIGHBOURHOOD_CSVS = {
     'utility_stock': 'building_stock_size_year_per_neighbourhood.csv'
 }
 
+# Maximum size of the cache of results of identical runs (in bytes), 0 to
+# disable the cache (see ResultCache)
+RESULT_CACHE_SIZE = 0
+
+# Seconds between the checkpoints of a run (of the allocation), to resume an
+# interrupted run from its last checkpoint, 0 to disable the checkpoints (see
+# Checkpoints)
+CHECKPOINT_INTERVAL = 0
+
+# Maximum number of neighbourhoods loaded at once in the tiled mode, which
+# bounds its memory (see tiled.py)
+TILE_SIZE = 1000
+
 
 def set_current_scenario(scenario_name):
 
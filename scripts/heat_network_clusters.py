@@ -0,0 +1,135 @@
+"""
+Post-allocation stage: groups adjacent neighbourhoods with a heat network
+('W_MTHT' or 'W_LT') that are assigned the same heat source into candidate heat
+networks (clusters), and exports them to the heat_network_clusters table.
+"""
+
+# external modules
+import numpy as np
+
+# project modules
+from NeighbourhoodGraph import NeighbourhoodGraph, connected_components
+import config
+from table_export import table_of_records, write_table
+
+HEAT_NETWORK_OPTIONS = ['W_MTHT', 'W_LT']
+
+# Carriers of the final heat demand of a heat network (see Bookkeeper)
+FINAL_HEAT_CARRIERS = ['geothermal', 'TEO', 'HT', 'MT', 'LT', 'undefined',
+                       'backup']
+
+# Columns of the table of the heat network clusters
+CLUSTER_COLUMNS = [
+    'cluster', 'heating_option', 'heat_source', 'number_of_neighbourhoods',
+    'neighbourhoods', 'useful_heat_demand', 'final_heat_demand',
+    'present_heat_demand', 'trace_length', 'linear_heat_density'
+]
+
+
+def cluster_heat_networks(neighbourhoods, bookkeeper, graph=None):
+    """
+    Returns the heat network clusters: the connected components of the
+    adjacency graph of the neighbourhoods, keeping only the edges between
+    neighbourhoods with the same heat network option and heat source. Each
+    cluster holds its neighbourhoods, the aggregated useful and final heat
+    demand, the total trace length and the linear heat density.
+    """
+
+    if graph is None:
+        graph = NeighbourhoodGraph(neighbourhoods)
+
+    keys = [
+        (neighbourhood.assigned_heating_option,
+         neighbourhood.assigned_heat_source)
+        if neighbourhood.assigned_heating_option in HEAT_NETWORK_OPTIONS
+        else None for neighbourhood in neighbourhoods.values()
+    ]
+
+    edges = graph.edges()
+    edges = edges[np.array([
+        keys[i] is not None and keys[i] == keys[j] for i, j in edges.tolist()
+    ], dtype=np.bool_)]
+
+    components = connected_components(len(graph), edges)
+
+    clusters = {}
+
+    for index, neighbourhood in enumerate(neighbourhoods.values()):
+        if keys[index] is None:
+            continue
+
+        cluster = clusters.setdefault(components[index], {
+            'heating_option': keys[index][0],
+            'heat_source': keys[index][1],
+            'neighbourhoods': [],
+            'useful_heat_demand': 0.,
+            'final_heat_demand': 0.,
+            'present_heat_demand': 0.,
+            'trace_length': 0.
+        })
+
+        demands = bookkeeper.heat_demand.get(neighbourhood.code, {})
+
+        cluster['neighbourhoods'].append(neighbourhood.code)
+        cluster['present_heat_demand'] += neighbourhood.total_heat_demand()
+        cluster['trace_length'] += neighbourhood.trace_length
+
+        for sector in ['residences', 'utility']:
+            sector_demands = demands.get(sector, {})
+            cluster['useful_heat_demand'] += sector_demands.get(
+                'useful_heat', 0.)
+            cluster['final_heat_demand'] += sum(
+                sector_demands.get(carrier, 0.)
+                for carrier in FINAL_HEAT_CARRIERS)
+
+    # Linear heat density of the cluster (see
+    # Neighbourhood.linear_heat_density)
+    GJ_TO_MWH = config.current_project.KEY_FIGURES['gj_to_mwh']
+
+    for cluster in clusters.values():
+        if cluster['trace_length'] == 0:
+            cluster['linear_heat_density'] = 0.
+        else:
+            cluster['linear_heat_density'] = (
+                cluster['present_heat_demand'] * GJ_TO_MWH /
+                cluster['trace_length'])
+
+    return list(clusters.values())
+
+
+def export_heat_network_clusters_to_csv(clusters, context=None):
+    """
+    Export the heat network clusters to a table in the output data directory
+    (in the output format of the scenario) of the run context (or the current
+    one), largest clusters (by useful heat demand) first
+    """
+
+    write_table(heat_network_clusters_table(clusters),
+                "heat_network_clusters", context=context)
+
+
+def heat_network_clusters_table(clusters):
+    """
+    Returns the table of the heat network clusters (see
+    export_heat_network_clusters_to_csv)
+    """
+
+    return table_of_records(heat_network_cluster_rows(clusters),
+                            CLUSTER_COLUMNS)
+
+
+def heat_network_cluster_rows(clusters):
+    """
+    Returns the rows of the table of the heat network clusters, largest
+    clusters (by useful heat demand) first
+    """
+
+    order = np.argsort([-cluster['useful_heat_demand']
+                        for cluster in clusters], kind='stable')
+
+    return [{
+        **clusters[index],
+        'cluster': number + 1,
+        'number_of_neighbourhoods': len(clusters[index]['neighbourhoods']),
+        'neighbourhoods': ','.join(clusters[index]['neighbourhoods'])
+    } for number, index in enumerate(order)]
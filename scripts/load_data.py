@@ -1,47 +1,84 @@
 # system modules
+from functools import partial
 import os
 import sys
 from pathlib import Path
 
 # external modules
-import csv
 import math
 import numpy as np
 import pandas as pd
 import pickle
 
 # project modules
+from Checkpoints import Checkpoints
 from HeatSource import HeatSource
 from Neighbourhood import Neighbourhood
+from NeighbourhoodGraph import NeighbourhoodGraph
+from RunContext import RunContext
+from StageCache import LOAD_STAGES, StageCache
+from table_export import table_of_records, write_table
 import config
 
+# Attributes of the neighbourhoods set by determine_preferences
+PREFERENCE_ATTRIBUTES = ['heating_option_preference', 'lt_elegible',
+                         'force_heat_network']
 
-def read_data(target_file):
+# Columns with the code of the neighbourhood of a row in the input data
+CODE_COLUMNS = ['neighbourhood_code', 'buurtcode']
+
+# Number of rows read at once when reading the input data of some of the
+# neighbourhoods (see read_data)
+READ_CHUNK_SIZE = 50000
+
+# Attributes of the neighbourhoods set by map_heat_sources
+SOURCE_ATTRIBUTES = ['ht_sources_available', 'lt_sources_available',
+                     'geothermal_available', 'teo_available']
+
+
+def read_data(target_file, codes=None, columns=None):
     """
-    Read input data from CSV into DataFrame
+    Read input data from CSV into DataFrame (only the rows of the
+    neighbourhoods with the codes and the columns, if given)
     """
 
     # Specify target file path
     target_path = (Path(__file__).resolve().parents[1] /
                    "input_data" / f"{config.current_project_name}")
 
+    # Columns to read (the columns of the file that are given)
+    usecols = None if columns is None else lambda column: column in columns
+
+    if codes is None:
+        # Read csv into DataFrame
+        data = pd.read_csv(target_path / target_file, usecols=usecols)
+
+        return data
 
-    # Read csv into DataFrame
-    data = pd.read_csv(target_path / target_file)
+    # Stream the csv in chunks and keep the rows of the neighbourhoods, so
+    # only a chunk of the file is in memory at once
+    chunks = []
 
-    return data
+    for chunk in pd.read_csv(target_path / target_file, usecols=usecols,
+                             chunksize=READ_CHUNK_SIZE):
+        column = next(column for column in CODE_COLUMNS
+                      if column in chunk.columns)
+        chunks.append(chunk[chunk[column].isin(codes)])
 
+    return pd.concat(chunks, ignore_index=True)
 
-def initialise_neighbourhoods():
+
+def initialise_neighbourhoods(codes=None):
     """
-    Initialise dictionary of neighbourhoods by their code (ID) and name
+    Initialise dictionary of neighbourhoods by their code (ID) and name (all
+    neighbourhoods, or the neighbourhoods with the codes)
     """
 
     neighbourhoods = {}
 
     csv = config.current_project.NEIGHBOURHOOD_CSVS['list']
 
-    initial_values = read_data(csv)
+    initial_values = read_data(csv, codes)
 
     for index, row in initial_values.iterrows():
         neighbourhoods[row['neighbourhood_code']] = Neighbourhood(
@@ -53,12 +90,13 @@ def initialise_neighbourhoods():
     return neighbourhoods
 
 
-def update_neighbourhoods(neighbourhoods, csv):
+def update_neighbourhoods(neighbourhoods, csv, codes=None):
     """
     Enrich the neighbourhoods with additional information read from the CSV
+    (of the neighbourhoods with the codes, if given)
     """
 
-    values = read_data(csv)
+    values = read_data(csv, codes)
 
     count = 0
 
@@ -247,12 +285,12 @@ def add_new_houses_to_housing_stock(neighbourhoods):
     return neighbourhoods
 
 
-def update_neighbourhood_housing_stock(neighbourhoods, csv):
+def update_neighbourhood_housing_stock(neighbourhoods, csv, codes=None):
     """
     Describe method
     """
 
-    values = read_data(csv)
+    values = read_data(csv, codes)
 
     count = 0
 
@@ -296,12 +334,12 @@ def update_neighbourhood_housing_stock(neighbourhoods, csv):
     return neighbourhoods
 
 
-def update_neighbourhood_utility_stock(neighbourhoods, csv):
+def update_neighbourhood_utility_stock(neighbourhoods, csv, codes=None):
     """
     Describe method
     """
 
-    values = read_data(csv)
+    values = read_data(csv, codes)
 
     count = 0
 
@@ -352,10 +390,13 @@ def initialise_heat_sources(csv):
 
 
 def map_heat_sources_to_neighbourhoods(neighbourhoods, heat_sources,
-                                       source_type):
+                                       source_type, graph=None):
     """
     Map the heat sources to neighbourhoods: for each neighbourhood, determine
     which sources are in range (and thereby possibly available to supply heat).
+    If the scenario extends the reach of the source type (see
+    source_reach_hops), the neighbourhoods within that number of hops of the
+    neighbourhoods in range are mapped as well.
     """
 
     neighbourhood_dict = {}
@@ -363,15 +404,15 @@ def map_heat_sources_to_neighbourhoods(neighbourhoods, heat_sources,
     for code, neighbourhood in neighbourhoods.items():
         neighbourhood_dict[code] = []
 
-    for code, source in heat_sources.items():
-        try:
-            neighbourhoods_in_range = source.neighbourhoods_in_range.split(',')
-
-        except AttributeError:
-            neighbourhoods_in_range = []
+    hops = source_reach_hops(source_type)
 
-        for code in neighbourhoods_in_range:
-            neighbourhood_dict[code].append(source.code)
+    if hops and graph is not None:
+        neighbourhood_dict = map_heat_sources_within_hops(
+            neighbourhood_dict, heat_sources, graph, hops)
+    else:
+        for code, source in heat_sources.items():
+            for code in neighbourhoods_in_range(source):
+                neighbourhood_dict[code].append(source.code)
 
     for code, neighbourhood in neighbourhoods.items():
         if source_type == 'ht_heat':
@@ -389,6 +430,67 @@ def map_heat_sources_to_neighbourhoods(neighbourhoods, heat_sources,
     return neighbourhoods
 
 
+def neighbourhoods_in_range(source):
+    """
+    Returns the codes of the neighbourhoods in range of the heat source
+    """
+
+    try:
+        return source.neighbourhoods_in_range.split(',')
+
+    except AttributeError:
+        return []
+
+
+def map_heat_sources_within_hops(neighbourhood_dict, heat_sources, graph,
+                                 hops):
+    """
+    Map the heat sources to the neighbourhoods within the number of hops of
+    the neighbourhoods in range (in the adjacency graph of the neighbourhoods)
+    """
+
+    source_codes = list(heat_sources.keys())
+    sources = []
+    seeds = []
+
+    for index, source in enumerate(heat_sources.values()):
+        for code in neighbourhoods_in_range(source):
+            sources.append(index)
+            seeds.append(graph.index[code])
+
+    sources, reached = graph.reach_per_source(sources, seeds, hops)
+
+    # Sort on neighbourhood (and then on source) to keep the sources of each
+    # neighbourhood in the order of the heat sources
+    order = np.lexsort((sources, reached))
+
+    for source, neighbourhood in zip(sources[order], reached[order]):
+        neighbourhood_dict[graph.codes[neighbourhood]].append(
+            heat_sources[source_codes[source]].code)
+
+    return neighbourhood_dict
+
+
+def source_reach_hops(source_type):
+    """
+    Returns the number of hops (in the adjacency graph of the neighbourhoods)
+    by which the reach of the source type is extended in the current scenario.
+    'source_reach_hops' in the scenario is either a number of hops for HT, LT
+    and geothermal sources, or a dictionary with the number of hops per
+    source type ('ht_heat', 'lt_heat', 'geothermal' and 'teo').
+    """
+
+    hops = config.current_project.current_scenario.get('source_reach_hops', 0)
+
+    if isinstance(hops, dict):
+        return hops.get(source_type, 0)
+
+    if source_type == 'teo':
+        return 0
+
+    return hops
+
+
 def save_objects(object, name):
     """
     Pickle the objects to the output data directory
@@ -408,111 +510,83 @@ def save_objects(object, name):
 
 def export_data_to_csv(neighbourhoods):
     """
-    Export the neighbourhood's properties to a CSV file in the output data
-    directory
-    """
-
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}" /
-            "neighbourhoods_characteristics.csv")
-
-    csv_columns = [
-        'code', 'name', 'geo_coordinate',
-        'number_of_house_equivalents_residences',
-        'number_of_house_equivalents_utility', 'm2_of_utility',
-        'total_heat_demand_of_residences', 'total_heat_demand_of_utility',
-        'total_electricity_demand_of_residences',
-        'total_electricity_demand_of_utility', 'geothermal_available', 'teo_available',
-        'ht_sources_available', 'lt_sources_available', 'preference_W_MTHT',
-        'preference_H', 'preference_E', 'elegible_W_LT', 'force_heat_network'
-    ]
-
-    # Write the neighbourhood objects to csv file rows
-    with open(path, 'w') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=csv_columns)
-        writer.writeheader()
-        for neighbourhood in neighbourhoods.values():
-            for preference in neighbourhood.heating_option_preference:
-                if preference[0] == 'W_MTHT':
-                    preference_W_MTHT = preference[1]
-                elif preference[0] == 'H':
-                    preference_H = preference[1]
-                elif preference[0] == 'E':
-                    preference_E = preference[1]
-
-            characteristics = {
-                'code':
-                neighbourhood.code,
-                'name':
-                neighbourhood.name,
-                'geo_coordinate':
-                neighbourhood.geo_coordinate,
-                'number_of_house_equivalents_residences':
-                neighbourhood.number_of_houses(),
-                'number_of_house_equivalents_utility':
-                (neighbourhood.m2_of_utility() *
-                 config.current_project.KEY_FIGURES['m2_utility_to_house_equivalents']),
-                'm2_of_utility':
-                neighbourhood.m2_of_utility(),
-                'total_heat_demand_of_residences':
-                neighbourhood.total_heat_demand_of_residences(),
-                'total_heat_demand_of_utility':
-                neighbourhood.total_heat_demand_of_utility(),
-                'total_electricity_demand_of_residences':
-                neighbourhood.total_electricity_demand_of_residences(),
-                'total_electricity_demand_of_utility':
-                neighbourhood.total_electricity_demand_of_utility(),
-                'geothermal_available':
-                neighbourhood.geothermal_available,
-                'teo_available':
-                neighbourhood.teo_available,
-                'ht_sources_available':
-                neighbourhood.ht_sources_available,
-                'lt_sources_available':
-                neighbourhood.lt_sources_available,
-                'preference_W_MTHT':
-                preference_W_MTHT,
-                'preference_H':
-                preference_H,
-                'preference_E':
-                preference_E,
-                'elegible_W_LT':
-                neighbourhood.lt_elegible,
-                'force_heat_network':
-                neighbourhood.force_heat_network
-            }
-            writer.writerow(characteristics)
-
-
-def initialise_neighbourhoods_and_heat_sources():
-    """
-    Main method in which all neighbourhoods and heat sources are initialised
-    and updated (or enriched) based on the input data (CSV files specified in
-    the config file)
+    Export the neighbourhood's properties to a table in the output data
+    directory (in the output format of the scenario)
     """
 
-    print('\nInitialising neighbourhoods and heat sources..')
+    m2_utility_to_house_equivalents = config.current_project.KEY_FIGURES[
+        'm2_utility_to_house_equivalents']
+
+    table = table_of_records([{
+        'code': neighbourhood.code,
+        'name': neighbourhood.name,
+        'geo_coordinate': neighbourhood.geo_coordinate,
+        'number_of_house_equivalents_residences':
+        neighbourhood.number_of_houses(),
+        'number_of_house_equivalents_utility':
+        neighbourhood.m2_of_utility() * m2_utility_to_house_equivalents,
+        'm2_of_utility': neighbourhood.m2_of_utility(),
+        'total_heat_demand_of_residences':
+        neighbourhood.total_heat_demand_of_residences(),
+        'total_heat_demand_of_utility':
+        neighbourhood.total_heat_demand_of_utility(),
+        'total_electricity_demand_of_residences':
+        neighbourhood.total_electricity_demand_of_residences(),
+        'total_electricity_demand_of_utility':
+        neighbourhood.total_electricity_demand_of_utility(),
+        'geothermal_available': neighbourhood.geothermal_available,
+        'teo_available': neighbourhood.teo_available,
+        'ht_sources_available': neighbourhood.ht_sources_available,
+        'lt_sources_available': neighbourhood.lt_sources_available,
+        **{
+            f'preference_{option}': value
+            for option, value in neighbourhood.heating_option_preference
+            if option in ['W_MTHT', 'H', 'E']
+        },
+        'elegible_W_LT': neighbourhood.lt_elegible,
+        'force_heat_network': neighbourhood.force_heat_network
+    } for neighbourhood in neighbourhoods.values()])
+
+    write_table(table, "neighbourhoods_characteristics")
+
+
+def build_stock(codes=None):
+    """
+    Initialise the neighbourhoods and update (or enrich) them with their
+    properties and housing and utility stock (CSV files specified in the
+    config file). Only the neighbourhoods with the codes are built if given
+    (see tiled.py).
+    """
 
     # Initialise neighbourhoods
-    neighbourhoods = initialise_neighbourhoods()
+    neighbourhoods = initialise_neighbourhoods(codes)
 
     # Update neighbourhoods based on additional csv files
     csvs = config.current_project.NEIGHBOURHOOD_CSVS['properties']
     for csv in csvs:
-        neighbourhoods = update_neighbourhoods(neighbourhoods, csv)
+        neighbourhoods = update_neighbourhoods(neighbourhoods, csv, codes)
 
     # Update neighbourhoods based on housing and utility stock csv files
     neighbourhoods = update_neighbourhood_housing_stock(
-        neighbourhoods, config.current_project.NEIGHBOURHOOD_CSVS['housing_stock'])
+        neighbourhoods, config.current_project.NEIGHBOURHOOD_CSVS['housing_stock'],
+        codes)
 
     neighbourhoods = remove_demolished_houses_from_housing_stock(neighbourhoods)
     neighbourhoods = add_new_houses_to_housing_stock(neighbourhoods)
 
     neighbourhoods = update_neighbourhood_utility_stock(
-        neighbourhoods, config.current_project.NEIGHBOURHOOD_CSVS['utility_stock'])
+        neighbourhoods, config.current_project.NEIGHBOURHOOD_CSVS['utility_stock'],
+        codes)
+
+    return neighbourhoods
+
+
+def determine_preferences(neighbourhoods):
+    """
+    Determine the heating option preferences for all neighbourhoods. Returns
+    the attributes they set per neighbourhood (see PREFERENCE_ATTRIBUTES).
+    """
 
-    # Determine the heating option preferences for all neighbourhoods
     for neighbourhood in neighbourhoods.values():
         neighbourhood.determine_heating_option_preference()
 
@@ -523,30 +597,77 @@ def initialise_neighbourhoods_and_heat_sources():
                 print('\nWARNING! For {}, the confidences of the heating options = {} != 1.'.format(
                     neighbourhood.code, sum_of_confidences))
 
+    return attributes_of(neighbourhoods, PREFERENCE_ATTRIBUTES)
+
+
+def map_heat_sources(neighbourhoods):
+    """
+    Initialise the heat sources of the scenario and map them to the
+    neighbourhoods. Returns the attributes they set per neighbourhood (see
+    SOURCE_ATTRIBUTES) and the HT and LT sources.
+    """
+
+    # Compile the adjacency graph of the neighbourhoods, only if the scenario
+    # extends the reach of the heat sources
+    graph = None
+    if any(source_reach_hops(source_type)
+           for source_type in ['ht_heat', 'lt_heat', 'geothermal', 'teo']):
+        graph = NeighbourhoodGraph(neighbourhoods)
+
     # Initialise HT sources and map to neighbourhoods
     ht_sources = initialise_heat_sources(config.current_project.current_scenario['ht_heat'])
     neighbourhoods = map_heat_sources_to_neighbourhoods(
-        neighbourhoods, ht_sources, 'ht_heat')
+        neighbourhoods, ht_sources, 'ht_heat', graph)
 
     # Initialise LT sources and map to neighbourhoods
     lt_sources = initialise_heat_sources(config.current_project.current_scenario['lt_heat'])
     neighbourhoods = map_heat_sources_to_neighbourhoods(
-        neighbourhoods, lt_sources, 'lt_heat')
+        neighbourhoods, lt_sources, 'lt_heat', graph)
 
     # Initialise geothermal sources and map to neighbourhoods
     geothermal_sources = initialise_heat_sources(
         config.current_project.current_scenario['geothermal'])
     neighbourhoods = map_heat_sources_to_neighbourhoods(
-        neighbourhoods, geothermal_sources, 'geothermal')
+        neighbourhoods, geothermal_sources, 'geothermal', graph)
 
     # Initialise TEO sources and map to neighbourhoods
     teo_sources = initialise_heat_sources(config.current_project.current_scenario['teo'])
     neighbourhoods = map_heat_sources_to_neighbourhoods(
-    neighbourhoods, teo_sources, 'teo')
+    neighbourhoods, teo_sources, 'teo', graph)
+
+    # Geothermal is not returned as only availability ('yes'/'no') is
+    # relevant (which is saved in the neighbourhood objects)
+    return (attributes_of(neighbourhoods, SOURCE_ATTRIBUTES), ht_sources,
+            lt_sources)
+
+
+def attributes_of(neighbourhoods, names):
+    """
+    Returns the attributes with the names of each neighbourhood, by code
+    """
+
+    return {
+        code: {name: getattr(neighbourhood, name) for name in names}
+        for code, neighbourhood in neighbourhoods.items()
+    }
+
+
+def set_attributes(neighbourhoods, attributes):
+    """
+    Set the attributes (see attributes_of) of the neighbourhoods
+    """
+
+    for code, neighbourhood in neighbourhoods.items():
+        for name, value in attributes[code].items():
+            setattr(neighbourhood, name, value)
+
+
+def save_loaded_objects(neighbourhoods, ht_sources, lt_sources):
+    """
+    Pickle the neighbourhoods and heat sources (for main.py) and export the
+    neighbourhood characteristics
+    """
 
-    # Pickle neighbourhoods and heat sources
-    # Geothermal is not saved as only availability ('yes'/'no') is relevant
-    # (which is saved in the neighbourhood objects)
     save_objects(neighbourhoods, 'neighbourhoods')
     save_objects(ht_sources, 'ht_sources')
     save_objects(lt_sources, 'lt_sources')
@@ -554,13 +675,78 @@ def initialise_neighbourhoods_and_heat_sources():
     # Export neighbourhood characteristics to CSV
     export_data_to_csv(neighbourhoods)
 
+
+def run_stage(stage, key, compute, cache, checkpoints):
+    """
+    Returns the output of a stage of loading the data with the key: from its
+    checkpoint or the stage cache (if given), or computed
+    """
+
+    if cache is not None:
+        compute = partial(cache.run, stage, key, compute)
+
+    if checkpoints is None:
+        return compute()
+
+    return checkpoints.run(stage, key, compute)
+
+
+def initialise_neighbourhoods_and_heat_sources(resume=False):
+    """
+    Main method in which all neighbourhoods and heat sources are initialised
+    and updated (or enriched) based on the input data (CSV files specified in
+    the config file).
+
+    If the project has a stage cache (see StageCache), the stages (the stock,
+    preferences and heat sources) whose settings and input files did not
+    change are reused. If it has checkpoints (see Checkpoints), a checkpoint
+    is written after each stage, and with resume the stages are resumed from
+    their checkpoints.
+    """
+
+    print('\nInitialising neighbourhoods and heat sources..')
+
+    cache = StageCache.of_current_project()
+    checkpoints = Checkpoints.of_current_run(resume)
+
+    if cache is None and checkpoints is None:
+        neighbourhoods = build_stock()
+        preferences = determine_preferences(neighbourhoods)
+        sources, ht_sources, lt_sources = map_heat_sources(neighbourhoods)
+
+    else:
+        stock_key = StageCache.key_of_stage('stock')
+        neighbourhoods = run_stage('stock', stock_key, build_stock, cache,
+                                   checkpoints)
+
+        # The stages after the stock only read the stock and set their own
+        # attributes, so they are independent of each other
+        preferences = run_stage(
+            'preferences', StageCache.key_of_stage('preferences', stock_key),
+            lambda: determine_preferences(neighbourhoods), cache, checkpoints)
+        sources, ht_sources, lt_sources = run_stage(
+            'sources', StageCache.key_of_stage('sources', stock_key),
+            lambda: map_heat_sources(neighbourhoods), cache, checkpoints)
+
+        if cache is not None:
+            cache.print_report()
+
+    set_attributes(neighbourhoods, preferences)
+    set_attributes(neighbourhoods, sources)
+
+    save_loaded_objects(neighbourhoods, ht_sources, lt_sources)
+
+    # The loaded objects are saved, so the stages need not be resumed anymore
+    if checkpoints is not None:
+        checkpoints.remove(LOAD_STAGES)
+
     print('Done!')
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print('The following arguments were expected: load_data.py <PROJECT> <SCENARIO>')
+    if len(sys.argv) not in [3, 4] or sys.argv[3:] not in [[], ['resume']]:
+        print('The following arguments were expected: load_data.py <PROJECT> <SCENARIO> <optional: \'resume\'>')
     else:
-        config.set_current_project(sys.argv[1])
-        config.current_project.set_current_scenario(sys.argv[2])
-        initialise_neighbourhoods_and_heat_sources()
+        with RunContext(sys.argv[1], sys.argv[2]).activate():
+            initialise_neighbourhoods_and_heat_sources(
+                resume=sys.argv[3:] == ['resume'])
@@ -0,0 +1,293 @@
+"""
+LP allocation: assigns heating options to all neighbourhoods at once, instead
+of one by one in order of preference (see main.apply_decision_trees).
+
+Every rule of the decision trees of a neighbourhood (see DecisionTree) gives
+one or more alternatives: an alternative per candidate heat source for the HT
+and LT routes, and a single alternative for the other routes. The assignment
+is the integer program
+
+    maximise    sum of the confidences of the assigned heating options
+    subject to  one alternative per neighbourhood
+                per heat source: claimed heat <= remaining heat
+                claimed renewable gas <= remaining gas budget
+
+which is solved with the HiGHS solver of SciPy (an optional dependency). The
+results are added to the neighbourhoods, heat sources and bookkeeper in the
+same way as the allocation kernel does, so the output files are the same.
+"""
+
+# external modules
+import numpy as np
+
+# project modules
+from DecisionTree import (GAS_ROUTES, HEAT_SOURCE_ROUTES, OPTION_INDEX,
+                          ROUTE_INDEX, is_open)
+from ProjectSnapshot import ProjectSnapshot
+from allocation_kernel import (iteration_orders, replay_assignments,
+                               residual_heat_shares)
+import config
+
+try:
+    from scipy import sparse
+    from scipy.optimize import Bounds, LinearConstraint, milp
+except ImportError:
+    milp = None
+
+
+class AllocationProblem:
+    """
+    Class to describe the sparse integer program of the LP allocation. Each
+    column is an alternative of a neighbourhood, the rows are the neighbourhoods
+    followed by the HT sources, the LT sources and the gas budget.
+    """
+
+    def __init__(self, snapshot, neighbourhoods):
+        self.snapshot = snapshot
+
+        number_of_neighbourhoods = len(snapshot)
+        self.heat_source_rows = {
+            'HT': number_of_neighbourhoods,
+            'LT': number_of_neighbourhoods + len(snapshot.source_codes['HT'])
+        }
+        self.gas_row = (self.heat_source_rows['LT'] +
+                        len(snapshot.source_codes['LT']))
+
+        # Alternatives (columns)
+        self.number_of_alternatives = 0
+        self.neighbourhood = [np.zeros(0, dtype=np.int64)]
+        self.option = [np.zeros(0, dtype=np.int64)]
+        self.route = [np.zeros(0, dtype=np.int64)]
+        self.source = [np.zeros(0, dtype=np.int64)]
+        self.stage = [np.zeros(0, dtype=np.int64)]
+        self.confidence = [np.zeros(0)]
+
+        # Resource claims of the alternatives (entries of the resource rows)
+        self.claim_rows = [np.zeros(0, dtype=np.int64)]
+        self.claim_columns = [np.zeros(0, dtype=np.int64)]
+        self.claims = [np.zeros(0)]
+
+        self.shares = residual_heat_shares(snapshot.decision_tree)
+
+        for index, neighbourhood in enumerate(neighbourhoods.values()):
+            if snapshot.undecided[index]:
+                continue
+
+            self.add_alternatives(index, neighbourhood)
+
+        self.neighbourhood = np.concatenate(self.neighbourhood)
+        self.option = np.concatenate(self.option)
+        self.route = np.concatenate(self.route)
+        self.source = np.concatenate(self.source)
+        self.stage = np.concatenate(self.stage)
+        self.confidence = np.concatenate(self.confidence)
+        self.claim_rows = np.concatenate(self.claim_rows)
+        self.claim_columns = np.concatenate(self.claim_columns)
+        self.claims = np.concatenate(self.claims)
+
+
+    def __len__(self):
+        return self.number_of_alternatives
+
+
+    def add_alternatives(self, index, neighbourhood):
+        """
+        Add the alternatives of the rules of the neighbourhood's decision trees
+        in both iterations (the first iteration in which a rule occurs is its
+        stage of assignment)
+        """
+
+        snapshot = self.snapshot
+        confidences = dict(neighbourhood.heating_option_preference)
+        rules = {}
+
+        for iteration in [0, 1]:
+            for rule in snapshot.decision_tree.rules_for(neighbourhood,
+                                                         iteration):
+                rules.setdefault(rule, iteration + 1)
+
+        for (heating_option, route), stage in rules.items():
+            option = OPTION_INDEX[heating_option]
+            demands = snapshot.demands[index, option]
+
+            # See determine_confidence
+            confidence = confidences.get(
+                'E' if heating_option == 'W_LT' else heating_option, 0.)
+
+            if route in HEAT_SOURCE_ROUTES:
+                indptr = snapshot.candidate_indptr[route]
+                sources = snapshot.candidate_indices[route][
+                    indptr[index]:indptr[index + 1]]
+                share = self.shares[option, HEAT_SOURCE_ROUTES.index(route)]
+                claim = (demands[0] * share) + (demands[3] * share)
+                claim_rows = self.heat_source_rows[route] + sources
+
+            elif route in GAS_ROUTES:
+                sources = np.full(1, -1)
+                claim = demands[0] + demands[3]
+                claim_rows = np.full(1, self.gas_row)
+
+            elif is_open(neighbourhood, route):
+                sources = np.full(1, -1)
+                claim_rows = None
+
+            else:
+                continue
+
+            number_of_alternatives = len(sources)
+            columns = np.arange(self.number_of_alternatives,
+                                self.number_of_alternatives +
+                                number_of_alternatives)
+            self.number_of_alternatives += number_of_alternatives
+
+            self.neighbourhood.append(np.full(number_of_alternatives, index))
+            self.option.append(np.full(number_of_alternatives, option))
+            self.route.append(np.full(number_of_alternatives,
+                                      ROUTE_INDEX[route]))
+            self.source.append(np.asarray(sources, dtype=np.int64))
+            self.stage.append(np.full(number_of_alternatives, stage))
+            self.confidence.append(np.full(number_of_alternatives,
+                                           float(confidence)))
+
+            if claim_rows is not None:
+                self.claim_rows.append(claim_rows)
+                self.claim_columns.append(columns)
+                self.claims.append(np.full(number_of_alternatives, claim))
+
+
+    def constraints(self, renewable_gas_budget, used_renewable_gas):
+        """
+        Returns the constraint matrix and its lower and upper bounds
+        """
+
+        snapshot = self.snapshot
+        number_of_rows = self.gas_row + 1
+        number_of_columns = len(self)
+
+        # A neighbourhood that has an alternative without a scarce resource
+        # should always be assigned, others may stay unassigned
+        has_fallback = np.zeros(len(snapshot), dtype=np.bool_)
+        has_fallback[self.neighbourhood[
+            ~np.isin(self.route, [ROUTE_INDEX[route] for route in
+                                  HEAT_SOURCE_ROUTES + GAS_ROUTES])]] = True
+
+        rows = np.concatenate([self.neighbourhood, self.claim_rows])
+        columns = np.concatenate([np.arange(number_of_columns),
+                                  self.claim_columns])
+        values = np.concatenate([np.ones(number_of_columns), self.claims])
+
+        matrix = sparse.csr_matrix((values, (rows, columns)),
+                                   shape=(number_of_rows, number_of_columns))
+
+        lower_bound = np.full(number_of_rows, -np.inf)
+        lower_bound[:len(snapshot)] = np.where(has_fallback, 1., 0.)
+
+        upper_bound = np.concatenate([
+            np.ones(len(snapshot)),
+            snapshot.available_heat['HT'] - snapshot.used_heat['HT'],
+            snapshot.available_heat['LT'] - snapshot.used_heat['LT'],
+            [renewable_gas_budget - used_renewable_gas]
+        ])
+
+        return matrix, lower_bound, upper_bound
+
+
+def run_lp_allocation(sorted_neighbourhoods, heat_sources, bookkeeper):
+    """
+    Assign heating options to the neighbourhoods with the LP allocation, and
+    add the results to the neighbourhoods, heat sources and bookkeeper
+    """
+
+    if milp is None:
+        raise ImportError("The LP allocation engine requires SciPy (>= 1.9), "
+                          "install it with: pip install scipy")
+
+    scenario = config.current_project.current_scenario
+
+    snapshot = ProjectSnapshot(sorted_neighbourhoods, heat_sources, bookkeeper)
+    problem = AllocationProblem(snapshot, sorted_neighbourhoods)
+
+    matrix, lower_bound, upper_bound = problem.constraints(
+        scenario['renewable_gas_budget'], scenario['used_renewable_gas'])
+
+    print("\nLP ALLOCATION: {} alternatives for {} neighbourhoods, "
+          "{} heat sources".format(len(problem), len(snapshot),
+                                   matrix.shape[0] - len(snapshot) - 1))
+
+    result = milp(-problem.confidence,
+                  constraints=LinearConstraint(matrix, lower_bound,
+                                               upper_bound),
+                  integrality=np.ones(len(problem)),
+                  bounds=Bounds(0, 1),
+                  options={
+                      'time_limit': scenario.get('lp_time_limit', 600.),
+                      'mip_rel_gap': scenario.get('lp_relative_gap', 1e-4)
+                  })
+
+    if result.x is None:
+        raise RuntimeError(f"LP allocation failed: {result.message}")
+
+    print(f"LP ALLOCATION: {result.message} (total confidence: "
+          f"{-result.fun:.2f})")
+
+    options, routes, sources, stages = select_alternatives(
+        problem, np.round(result.x) > 0.5)
+
+    replay_assignments(snapshot, sorted_neighbourhoods, heat_sources,
+                       bookkeeper, options, routes, sources, stages,
+                       order_of_assignment(snapshot, stages))
+
+    print("\nLP ALLOCATION: [{}/{}] neighbourhoods have been assigned "
+          "a heating option".format(np.count_nonzero(stages >= 0),
+                                    len(snapshot)))
+
+    if np.any(stages < 0):
+        print("\nERROR: some neighbourhoods are still undecided!")
+
+        for index in np.flatnonzero(stages < 0):
+            neighbourhood = sorted_neighbourhoods[snapshot.codes[index]]
+            print("  - {} ({})".format(neighbourhood.name, neighbourhood.code))
+
+
+def select_alternatives(problem, selected):
+    """
+    Returns per neighbourhood the heating option, supply route, heat source
+    index and stage of the selected alternatives (see allocation_kernel.allocate)
+    """
+
+    number_of_neighbourhoods = len(problem.snapshot)
+
+    options = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+    routes = np.zeros(number_of_neighbourhoods, dtype=np.int64)
+    sources = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+    stages = np.full(number_of_neighbourhoods, -1, dtype=np.int64)
+
+    neighbourhoods = problem.neighbourhood[selected]
+    options[neighbourhoods] = problem.option[selected]
+    routes[neighbourhoods] = problem.route[selected]
+    sources[neighbourhoods] = problem.source[selected]
+    stages[neighbourhoods] = problem.stage[selected]
+
+    # Neighbourhoods without a heating option preference (see pre-analysis)
+    undecided = problem.snapshot.undecided
+    options[undecided] = OPTION_INDEX['undecided']
+    routes[undecided] = ROUTE_INDEX['undecided']
+    stages[undecided] = 0
+
+    return options, routes, sources, stages
+
+
+def order_of_assignment(snapshot, stages):
+    """
+    Returns the assigned neighbourhoods in the order in which the decision
+    trees would visit them: per stage, in the order of that iteration
+    """
+
+    orders = iteration_orders(snapshot)
+    order = [orders[0][stages[orders[0]] == 0]]
+
+    for iteration in [0, 1]:
+        order.append(orders[iteration][stages[orders[iteration]] ==
+                                       iteration + 1])
+
+    return np.concatenate(order)
@@ -1,30 +1,42 @@
 # system modules
+from itertools import islice
 import os
 import sys
 
 # external modules
-import csv
+import math
 import numpy as np
+import pandas as pd
 import pickle
-from pathlib import Path
 
 # project modules
 from Bookkeeper import Bookkeeper
-from classify_neighbourhoods import (apply_electricity_decision_tree,
-                                     apply_heat_decision_tree,
-                                     apply_hybrid_decision_tree,
-                                     apply_pre_analysis)
+from CapacityIndex import CapacityIndex
+from Checkpoints import Checkpoints
+from ExhaustionTracker import ExhaustionTracker
+from allocation_kernel import run_allocation_kernel
+from classify_neighbourhoods import (apply_decision_tree, apply_pre_analysis,
+                                     determine_confidence,
+                                     remaining_renewable_gas)
+from DecisionTree import OPTIONS, decision_tree_of_project
+from heat_network_clusters import (cluster_heat_networks,
+                                   export_heat_network_clusters_to_csv,
+                                   heat_network_clusters_table)
 from load_data import initialise_neighbourhoods_and_heat_sources
 import config
-from run_tests import run_all_tests
+from regions import (export_regional_assignments_to_csv, region_mappings,
+                     regional_assignment_tables)
+from ResultCache import ResultCache, changed_files, output_files
+from run_tests import run_checks
+from RunContext import ProjectSettings, RunContext
+from table_export import table_of_records, write_table
+from verification import print_verification
 
 
-def load_neighbourhoods():
+def load_neighbourhoods(context=None):
     # Load pickled neighbourhood objects (cached data)
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}"
-            / "neighbourhoods.pkl")
+    path = config.context_of_run(context).output_directory() / (
+        "neighbourhoods.pkl")
 
     with open(path, 'rb') as input:
         neighbourhoods = pickle.load(input)
@@ -32,12 +44,10 @@ def load_neighbourhoods():
     return neighbourhoods
 
 
-def load_ht_sources():
+def load_ht_sources(context=None):
     # Load pickled HT sources objects (cached data)
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}"
-            / "ht_sources.pkl")
+    path = config.context_of_run(context).output_directory() / (
+        "ht_sources.pkl")
 
     with open(path, 'rb') as input:
         ht_sources = pickle.load(input)
@@ -45,12 +55,10 @@ def load_ht_sources():
     return ht_sources
 
 
-def load_lt_sources():
+def load_lt_sources(context=None):
     # Load pickled LT sources objects (cached data)
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}" /
-            "lt_sources.pkl")
+    path = config.context_of_run(context).output_directory() / (
+        "lt_sources.pkl")
 
     with open(path, 'rb') as input:
         lt_sources = pickle.load(input)
@@ -58,14 +66,12 @@ def load_lt_sources():
     return lt_sources
 
 
-def apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper):
+def apply_pre_analyses(sorted_neighbourhoods, heat_sources, bookkeeper):
     """
-    Pre-analysis,
-    First preference decision tree,
-    Second preference decision tree
+    Pre-analysis of all neighbourhoods, returns the number of neighbourhoods
+    that have been assigned a heating option
     """
 
-    # Run pre-analysis for all neighbourhoods
     number_of_assigned_neighbourhoods = 0
 
     for code, neighbourhood in sorted_neighbourhoods.items():
@@ -90,77 +96,166 @@ def apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper):
           "a heating option".format(number_of_assigned_neighbourhoods,
                                     len(sorted_neighbourhoods)))
 
+    return number_of_assigned_neighbourhoods
+
+
+def sort_for_iteration(neighbourhoods, iteration):
+    """
+    Returns the neighbourhoods sorted for an iteration of the decision trees
+    """
+
+    sorted_neighbourhoods = {}
+    # First iteration: sort on first preference percentage
+    if iteration == 0:
+        key = lambda x: x.heating_option_preference[0][1]
+    # Second iteration: sort on first + second preference percentage
+    elif iteration == 1:
+        key = lambda x: (x.heating_option_preference[0][1] + x.
+                         heating_option_preference[1][1])
+    # Create new dictionary to store the sorted neighbourhoods
+    for neighbourhood in sorted(neighbourhoods.values(),
+                                key=key,
+                                reverse=True):
+        sorted_neighbourhoods[neighbourhood.code] = neighbourhood
+
+    return sorted_neighbourhoods
+
+
+def apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper,
+                         checkpoints=None, progress=None):
+    """
+    Pre-analysis,
+    First preference decision tree,
+    Second preference decision tree
+
+    If checkpoints are given (see Checkpoints), the progress of the decision
+    trees is saved whenever a checkpoint is due. Given the progress of a
+    checkpoint, the decision trees continue from there.
+    """
+
+    if progress is not None:
+        # Continue from the progress of a checkpoint
+        number_of_assigned_neighbourhoods = progress['assigned']
+        candidate_index = progress['candidate_index']
+        tracker = progress['tracker']
+        sorted_neighbourhoods = {code: sorted_neighbourhoods[code]
+                                 for code in progress['order']}
+
+    else:
+        # Compiled decision trees of the project
+        decision_tree = decision_tree_of_project()
+
+        # Candidate heat sources of the neighbourhoods, sorted by distance,
+        # with their remaining heat
+        candidate_index = {
+            heat_temperature: CapacityIndex(sorted_neighbourhoods,
+                                            heat_sources[heat_temperature],
+                                            heat_temperature)
+            for heat_temperature in ['HT', 'LT']
+        }
+
+        # Initialise tracker to detect when the scarce resources are
+        # exhausted
+        tracker = ExhaustionTracker(heat_sources, bookkeeper, decision_tree)
+
+        # Run pre-analysis for all neighbourhoods
+        number_of_assigned_neighbourhoods = apply_pre_analyses(
+            sorted_neighbourhoods, heat_sources, bookkeeper)
+
+    decision_tree = tracker.decision_tree
+
     # Loop twice over all neighbourhoods in order to assign heating options.
     # 1) Use the first loop to assign the neighbourhoods' first preferences. If
     # that's not possible, don't assign any option yet.
     # 2) Use the second loop for all unassigned neighbourhoods to assign their
     # second preference. If that's not possible, assign "E".
     for i in [0, 1]:
-        # Sort neighbourhoods
-        neighbourhoods = sorted_neighbourhoods
-        sorted_neighbourhoods = {}
-        # First iteration: sort on first preference percentage
-        if i == 0:
-            key = lambda x: x.heating_option_preference[0][1]
-        # Second iteration: sort on first + second preference percentage
-        elif i == 1:
-            key = lambda x: (x.heating_option_preference[0][1] + x.
-                             heating_option_preference[1][1])
-        # Create new dictionary to store the sorted neighbourhoods
-        for neighbourhood in sorted(neighbourhoods.values(),
-                                    key=key,
-                                    reverse=True):
-            sorted_neighbourhoods[neighbourhood.code] = neighbourhood
+        # Skip the iterations before the progress of the checkpoint
+        if progress is not None and i < progress['iteration']:
+            continue
+
+        # In the iteration of the checkpoint, the neighbourhoods are sorted
+        # and the tracker has started already
+        if progress is not None and i == progress['iteration']:
+            neighbourhoods = sorted_neighbourhoods
+            start = progress['position']
+            progress = None
+
+        else:
+            sorted_neighbourhoods = sort_for_iteration(sorted_neighbourhoods,
+                                                       i)
+            neighbourhoods = sorted_neighbourhoods
+            start = 0
+
+            # Keep track of the resources that can still be granted in this
+            # iteration
+            tracker.start_iteration(sorted_neighbourhoods, i)
+
+        for position, (code, neighbourhood) in enumerate(
+                islice(sorted_neighbourhoods.items(), start, None), start):
+            # Save the progress up to this neighbourhood if a checkpoint is
+            # due
+            if checkpoints is not None and checkpoints.due():
+                checkpoints.save_allocation({
+                    'iteration': i,
+                    'position': position,
+                    'order': list(sorted_neighbourhoods),
+                    'assigned': number_of_assigned_neighbourhoods,
+                    'tracker': tracker,
+                    'candidate_index': candidate_index
+                })
 
-        for code, neighbourhood in sorted_neighbourhoods.items():
-            # If the neighbourhood has not been assigned a heating option yet,
+            # Skip the neighbourhood if it has been assigned a heating option
+            if neighbourhood.assigned_heating_option:
+                continue
+
+            # If nothing can be granted to any of the remaining neighbourhoods
+            # anymore, assign their fallback options all at once
+            if tracker.all_exhausted():
+                remaining_neighbourhoods = [
+                    neighbourhood for neighbourhood in
+                    list(sorted_neighbourhoods.values())[position:]
+                    if not neighbourhood.assigned_heating_option
+                ]
+
+                for neighbourhood in tracker.assign_fallback_in_bulk(
+                        remaining_neighbourhoods):
+                    determine_confidence(neighbourhood, i)
+                    number_of_assigned_neighbourhoods += 1
+
+                print("\nITERATION {}: nothing left to allocate, assigned "
+                      "fallback options to the remaining {} neighbourhoods"
+                      .format(i + 1, len(remaining_neighbourhoods)))
+                break
+
+            # If nothing can be granted to this neighbourhood anymore, the
+            # outcome of the decision tree is known beforehand
+            if tracker.nothing_available(neighbourhood,
+                                         remaining_renewable_gas()):
+                tracker.assign_fallback(neighbourhood)
+
+            # Else apply the decision tree of the neighbourhood's preference
+            else:
+                apply_decision_tree(neighbourhood, heat_sources, decision_tree,
+                                    i, bookkeeper, candidate_index)
+
+            tracker.mark_as_processed(neighbourhood, remaining_renewable_gas())
+
+            # If the neighbourhood has been assigned a heating option,
+            # count it
             if not neighbourhood.assigned_heating_option:
-                # If the neighbourhood's preference is "E",
-                if neighbourhood.heating_option_preference[i][0] == 'E':
-                    # Apply electricity decision tree to neighbourhood
-                    apply_electricity_decision_tree(neighbourhood, heat_sources,
-                                                    i == 1, bookkeeper)
-
-                # Else if the neighbourhood's preference is "W",
-                elif neighbourhood.heating_option_preference[i][0] == 'W_MTHT':
-                    # Apply electricity decision tree to neighbourhood
-                    apply_heat_decision_tree(neighbourhood, heat_sources,
-                                             False, i == 1, bookkeeper)
-
-                # Else if the neighbourhood's preference is "H",
-                elif neighbourhood.heating_option_preference[i][0] == 'H':
-                    # Apply hybrid decision tree to neighbourhood
-                    apply_hybrid_decision_tree(neighbourhood, heat_sources,
-                                               i == 1, bookkeeper)
-
-                # If the neighbourhood has been assigned a heating option,
-                # count it
-                if not neighbourhood.assigned_heating_option:
-                    # print("{} ({}): undecided".format(neighbourhood.name,
-                    #                                   neighbourhood.code))
-                    continue
-
-
-                neighbourhood.stage_of_assignment = 'iteration {}'.format(i + 1)
-                number_of_assigned_neighbourhoods += 1
-
-                if neighbourhood.assigned_heating_option == 'W_LT':
-                    confidence_option = 'E'
-                else:
-                    confidence_option =  neighbourhood.assigned_heating_option
-
-                confidence = [
-                    conf for option, conf in neighbourhood.heating_option_preference
-                    if option == confidence_option
-                ][0]
-                neighbourhood.confidence = confidence
-
-                # print("{} ({}): {}, {} (confidence: {})".format(
-                #     neighbourhood.name, neighbourhood.code,
-                #     neighbourhood.assigned_heating_option,
-                #     neighbourhood.assigned_heat_source,
-                #     round(neighbourhood.confidence, 2)))
+                # print("{} ({}): undecided".format(neighbourhood.name,
+                #                                   neighbourhood.code))
+                continue
 
+            determine_confidence(neighbourhood, i)
+            number_of_assigned_neighbourhoods += 1
+
+            # print("{} ({}): {}, {} (confidence: {})".format(
+            #     neighbourhood.name, neighbourhood.code,
+            #     neighbourhood.assigned_heating_option,
+            #     neighbourhood.assigned_heat_source,
+            #     round(neighbourhood.confidence, 2)))
 
         print("\nITERATION {}: [{}/{}] neighbourhoods have been assigned "
               "a heating option".format(i + 1,
@@ -180,147 +275,118 @@ def apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper):
     return
 
 
-def determine_distance_from_neighbourhood_to_source(neighbourhoods, heat_sources):
+def determine_distance_from_neighbourhood_to_source(neighbourhoods, heat_sources,
+                                                   context=None):
     """
     Determine the (Euclidean) distance from a neighbourhood to a (residual)
     heat source
     """
 
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}" /
-            "distance_from_neighbourhood_to_source.csv")
+    write_table(distance_table(neighbourhoods, heat_sources),
+                "distance_from_neighbourhood_to_source", context=context)
 
-    csv_columns = ['neighbourhood_code', 'heat_source_code', 'heat_source_name', 'distance_in_m']
 
-    # Write the distances to csv file rows
-    with open(path, 'w') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=csv_columns)
-        writer.writeheader()
+def distance_table(neighbourhoods, heat_sources):
+    """
+    Returns the table of the (Euclidean) distance from each neighbourhood to
+    its assigned (residual) heat source
+    """
 
-        for code, neighbourhood in neighbourhoods.items():
-            # Check if a heat source has been assigned to the neighbourhood
-            if not neighbourhood.assigned_heat_source:
-                continue
+    # The neighbourhoods with an assigned (residual) heat source
+    assigned = [
+        (code, neighbourhood,
+         heat_sources[neighbourhood.assigned_heat_source[0:2]][
+             neighbourhood.assigned_heat_source])
+        for code, neighbourhood in neighbourhoods.items()
+        if neighbourhood.assigned_heat_source and
+        neighbourhood.assigned_heat_source not in ['geothermal', 'TEO',
+                                                   'undefined']
+    ]
+
+    neighbourhood_coordinates = np.array(
+        [neighbourhood.geo_coordinate for _, neighbourhood, _ in assigned],
+        dtype=float).reshape(-1, 2)
+    source_coordinates = np.array(
+        [source.geo_coordinate for _, _, source in assigned],
+        dtype=float).reshape(-1, 2)
+
+    return pd.DataFrame({
+        'neighbourhood_code': [code for code, _, _ in assigned],
+        'heat_source_code': [source.code for _, _, source in assigned],
+        'heat_source_name': [source.name for _, _, source in assigned],
+        'distance_in_m': np.linalg.norm(
+            neighbourhood_coordinates - source_coordinates, axis=1)
+    })
+
+
+def export_neighbourhood_results_to_csv(neighbourhoods, context=None):
+    """
+    Export the neighbourhood attributes and results to a table in the output
+    data directory (in the output format of the scenario), with the housing
+    and utility stock flattened into a column per type, year and property
+    """
 
-            assigned_heat_source_code = neighbourhood.assigned_heat_source
+    write_table(neighbourhood_results_table(neighbourhoods, context),
+                "neighbourhoods_output", context=context)
 
-            # If so, find the corresponding heat source object
-            if not assigned_heat_source_code in ["geothermal", 'TEO', "undefined"]:
-                heat_type = assigned_heat_source_code[0:2]
-                assigned_heat_source = heat_sources[heat_type][assigned_heat_source_code]
 
-                # and determine the distance to the heat source
-                distance_to_heat_source = np.linalg.norm(
-                    np.array(neighbourhood.geo_coordinate) -
-                    np.array(assigned_heat_source.geo_coordinate))
+def neighbourhood_results_table(neighbourhoods, context=None):
+    """
+    Returns the table of the neighbourhood attributes and results (see
+    export_neighbourhood_results_to_csv)
+    """
 
-                writer.writerow({
-                    'neighbourhood_code': code,
-                    'heat_source_code': assigned_heat_source_code,
-                    'heat_source_name': assigned_heat_source.name,
-                    'distance_in_m': distance_to_heat_source
-                })
+    return table_of_records(neighbourhood_result_records(neighbourhoods,
+                                                         context))
 
 
-def export_neighbourhood_results_to_csv(neighbourhoods):
-    """
-    Export the neighbourhood attributes and results to a CSV file in the output
-    data directory
-    """
-    ### DEBT: this is very quickly and uglyly done
-    # dict_lt_sources = {}
-    # lt_sources_file = (Path(__file__).resolve().parents[1] / "input_data" / f"{config.current_project_name}" / "lt_source_categories.csv")
-    # with open(lt_sources_file) as lt:
-    #     lt_sources = csv.reader(lt)
-    #     next(lt_sources)
-    #     for source in lt_sources:
-    #         dict_lt_sources[int(source[0])] = source[1]
-    #
-    # dict_ht_sources = {}
-    # ht_sources_file = (Path(__file__).resolve().parents[1] / "input_data" / f"{config.current_project_name}" / "ht_source_categories.csv")
-    # with open(ht_sources_file) as ht:
-    #     ht_sources = csv.reader(ht)
-    #     next(ht_sources)
-    #     for source in ht_sources:
-    #         dict_ht_sources[int(source[0])] = source[1]
-
-    path = (Path(__file__).resolve().parents[1] / "output_data" /
-            f"{config.current_project_name}" /
-            f"{config.current_project.current_scenario_name}" /
-            "neighbourhoods_output.csv")
-
-    # Read the Neighbourhood attributes of the first neighbourhood into the
-    # csv_columns variable
-    for neighbourhood in neighbourhoods.values():
-        csv_columns = list(neighbourhood.__dict__.keys()) + ['desired_epi', 'category_heat_source']
-        break
-
-    # Write the neighbourhood objects to csv file rows
-    with open(path, 'w') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=csv_columns)
-        writer.writeheader()
-        for neighbourhood in neighbourhoods.values():
-            attributes = neighbourhood.__dict__
-
-            if neighbourhood.assigned_heating_option == 'undecided':
-                attributes['desired_epi'] = 'undecided'
-            else:
-                attributes['desired_epi'] = (
-                    config.current_project.ASSUMPTIONS['desired_epi'][
-                        neighbourhood.assigned_heating_option
-                    ]
-                )
-
-            attributes['assigned_heat_source'] = neighbourhood.assigned_heat_source
-            # attributes['category_heat_source'] = None
-            # if neighbourhood.assigned_heat_source:
-            #     # if neighbourhood.assigned_heat_source.startswith('LT'):
-            #         # if dict_lt_sources[int(neighbourhood.assigned_heat_source[4:])] == 'RWZI':
-            #         #     attributes['category_heat_source'] = 'TEA'
-            #         # else:
-            #         #     attributes['category_heat_source'] = 'LT-restwarmte'
-            #     elif neighbourhood.assigned_heat_source.startswith('HT'):
-            #         if dict_ht_sources[int(neighbourhood.assigned_heat_source[4:])] == 'BMC':
-            #             attributes['category_heat_source'] = 'BMC'
-            #         else:
-            #             attributes['category_heat_source'] = 'HT-restwarmte'
-            #     else:
-            #         attributes['category_heat_source'] = neighbourhood.assigned_heat_source
-            writer.writerow(attributes)
-
-
-def export_heat_source_results_to_csv(heat_sources):
-    """
-    Export the heat source attributes and results to a CSV file in the output
-    data directory
+def neighbourhood_result_records(neighbourhoods, context=None):
+    """
+    Returns the attributes and results of the neighbourhoods as records (the
+    rows of neighbourhood_results_table)
+    """
+
+    desired_epi = config.context_of_run(context).project.ASSUMPTIONS[
+        'desired_epi']
+
+    return [{
+        **neighbourhood.__dict__,
+        'desired_epi': (
+            'undecided'
+            if neighbourhood.assigned_heating_option == 'undecided' else
+            desired_epi[neighbourhood.assigned_heating_option])
+    } for neighbourhood in neighbourhoods.values()]
+
+
+def export_heat_source_results_to_csv(heat_sources, context=None):
+    """
+    Export the heat source attributes and results to a table in the output
+    data directory (in the output format of the scenario), including the
+    utilisation of each source and the neighbourhoods it supplies (from its
+    assignments)
     """
 
     for heat_type in ['HT', 'LT']:
-        path = (Path(__file__).resolve().parents[1] / "output_data" /
-                f"{config.current_project_name}" /
-                f"{config.current_project.current_scenario_name}" /
-                f"{heat_type}_sources_output.csv")
-
-        # Read the HeatSource attributes of the first heat source into the
-        # csv_columns variable
-        for source in heat_sources[heat_type].values():
-            csv_columns = list(source.__dict__.keys())
-            break
-
-        # Write the neighbourhood objects to csv file rows
-        with open(path, 'w') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=csv_columns)
-            writer.writeheader()
-            for source in heat_sources[heat_type].values():
-                writer.writerow(source.__dict__)
-
-
-def save_objects(name, object):
-    filename = (Path(__file__).resolve().parents[1] / "output_data" /
-                f"{config.current_project_name}" /
-                f"{config.current_project.current_scenario_name}" /
-                f"{name}.pkl")
+        write_table(heat_source_results_table(heat_sources, heat_type),
+                    f"{heat_type}_sources_output", context=context)
+
+
+def heat_source_results_table(heat_sources, heat_type):
+    """
+    Returns the table of the attributes and results of the heat sources of
+    the heat type (see export_heat_source_results_to_csv)
+    """
+
+    return table_of_records([{
+        **{key: value for key, value in source.__dict__.items()
+           if key != 'assignments'},
+        **source.utilisation_summary()
+    } for source in heat_sources[heat_type].values()])
+
+
+def save_objects(name, object, context=None):
+    filename = config.context_of_run(context).output_directory() / (
+        f"{name}.pkl")
 
     # Create file/folders if non-existent
     os.makedirs(os.path.dirname(filename), exist_ok=True)
@@ -335,12 +401,14 @@ def main(args):
     objects, by running the load_data.py script.
 
     Run python3 main.py <project_name> <scenario_name> <optional: 'refresh'>
-    in your terminal, where <project_name> is the name of a config file in the
-    config_files folder (e.g. res_groningen) and <scenario_name> is the name of
-    a scenario within that file, e.g. scenario_1.
+    <optional: 'resume'> in your terminal, where <project_name> is the name of
+    a config file in the config_files folder (e.g. res_groningen) and
+    <scenario_name> is the name of a scenario within that file, e.g.
+    scenario_1. Add 'resume' to the same command to resume a run that was
+    interrupted from its last checkpoint (see Checkpoints).
     """
     try:
-        config.set_current_project(args[0])
+        settings = ProjectSettings(config.project_module(args[0]))
 
     except BaseException:
         print('\nWARNING! No (valid) project has been specified.')
@@ -349,36 +417,203 @@ def main(args):
     # Determine scenario based on the user input
     try:
         print(args[1])
-        config.current_project.set_current_scenario(args[1])
+        context = RunContext(args[0], args[1], settings)
 
     except BaseException:
         print('\nWARNING! No (valid) scenario has been specified.')
         return
 
-    # Determine if the neighbourhoods and heat sources should be refreshed
-    try:
-        if args[2] == 'refresh':
+    # Determine if the neighbourhoods and heat sources should be refreshed,
+    # and if an interrupted run should be resumed
+    run_scenario(context, refresh='refresh' in args[2:],
+                 resume='resume' in args[2:])
+
+
+def run_scenario(context, refresh=False, resume=False):
+    """
+    Run a scenario in its context (see RunContext): assign the heating options
+    to the (loaded) neighbourhoods, bookkeep and export the results. Returns a
+    summary of the run (see summarise_run). The context is passed to the run
+    and only activated for the decision trees and the loading of the data.
+
+    If the project has a result cache (see ResultCache), the results of an
+    identical run (and its checks) are restored from it instead. If it has
+    checkpoints (see
+    Checkpoints), an interrupted run is resumed from its last checkpoint with
+    resume.
+    """
+
+    with context.activate():
+        if refresh:
             # Initialise neighbourhoods and heat sources
-            initialise_neighbourhoods_and_heat_sources()
-    except BaseException:
-        pass
+            initialise_neighbourhoods_and_heat_sources(resume)
+
+        cache = ResultCache.of_current_project(context)
+
+        if cache is None:
+            summary, _ = allocate_and_export(context, resume)
 
-    # Initialise bookkeeper to bookkeep the energy balance
-    bookkeeper = Bookkeeper()
+            return summary
+
+        key = cache.key_of_current_run()
+        restored = cache.restore(key)
+
+        if restored is not None:
+            summary, checks = restored
+
+            print(f'\nRestored the results of an identical run ({key[:12]}) '
+                  'from the result cache')
+            print_verification(checks)
+            context.scenario['used_renewable_gas'] = summary[
+                'used_renewable_gas']
+
+            return summary
+
+        before = output_files()
+        summary, checks = allocate_and_export(context, resume)
+        cache.store(key, summary, checks, changed_files(before))
+
+        return summary
+
+
+def allocate_and_export(context=None, resume=False):
+    """
+    Assign the heating options to the neighbourhoods of the scenario of the
+    run context (or the current one), bookkeep and export the results. With
+    resume, an interrupted run is resumed from its checkpoints (see
+    Checkpoints). Returns the summary of the run and the results of its
+    checks.
+    """
+
+    context = config.context_of_run(context)
+    checkpoints = Checkpoints.of_current_run(resume, context)
 
     # Load pickled (or cached) objects
-    neighbourhoods = load_neighbourhoods()
-    heat_sources = {'HT': load_ht_sources(), 'LT': load_lt_sources()}
+    neighbourhoods = load_neighbourhoods(context)
+    heat_sources = {'HT': load_ht_sources(context),
+                    'LT': load_lt_sources(context)}
 
-    # Sort neighbourhoods on first preference percentage
-    sorted_neighbourhoods = {}
-    for neighbourhood in sorted(
-            neighbourhoods.values(),
-            key=lambda x: x.heating_option_preference[0][1],
-            reverse=True):
-        sorted_neighbourhoods[neighbourhood.code] = neighbourhood
+    sorted_neighbourhoods, bookkeeper, region_names = allocate(
+        neighbourhoods, heat_sources, checkpoints, context)
+
+    export_results(sorted_neighbourhoods, heat_sources, bookkeeper,
+                   region_names, context)
+
+    # Run tests on the results in memory
+    results = run_checks(sorted_neighbourhoods, heat_sources, bookkeeper,
+                         context)
+    summary = summarise_run(sorted_neighbourhoods, heat_sources, results,
+                            context)
 
-    apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper)
+    # The run is complete, so it need not be resumed anymore
+    if checkpoints is not None:
+        checkpoints.remove()
+
+    return summary, results
+
+
+def export_results(sorted_neighbourhoods, heat_sources, bookkeeper,
+                   region_names, context=None):
+    """
+    Save the objects and export the results of an allocation (see allocate)
+    to the output data directory of the scenario of the run context (or the
+    current one)
+    """
+
+    # Save classified neighbourhoods (i.e., the objects with the assigned
+    # heating option and source included)
+    save_objects('classified_neighbourhoods', sorted_neighbourhoods, context)
+
+    # Save and export bookkeeper results
+    bookkeeper.save_bookkeeper(context=context)
+    bookkeeper.export_heat_demand_to_csv(context=context)
+
+    # Save assigned HT and LT sources
+    save_objects('assigned_ht_sources', heat_sources['HT'], context)
+    save_objects('assigned_lt_sources', heat_sources['LT'], context)
+
+    # Determine distance from each "W" neighbourhood to the used heat source
+    determine_distance_from_neighbourhood_to_source(sorted_neighbourhoods,
+                                                    heat_sources, context)
+
+    # Group adjacent neighbourhoods with a heat network on the same heat
+    # source into candidate heat networks
+    export_heat_network_clusters_to_csv(
+        cluster_heat_networks(sorted_neighbourhoods, bookkeeper), context)
+
+    # Export the results to a CSV file
+    export_neighbourhood_results_to_csv(sorted_neighbourhoods, context)
+    export_heat_source_results_to_csv(heat_sources, context)
+
+    # Export the regional demands and the assigned heating options per
+    # region (both kept by the bookkeeper)
+    bookkeeper.export_regional_heat_demand_to_csv(region_names, context)
+    export_regional_assignments_to_csv(bookkeeper, region_names, context)
+
+
+def allocate(neighbourhoods, heat_sources, checkpoints=None, context=None):
+    """
+    Assign the heating options to the neighbourhoods of the scenario of the
+    run context (or the current one, in memory) and bookkeep their demands. Returns the neighbourhoods (sorted
+    on LT eligibility), the bookkeeper and the names of the regions.
+
+    If checkpoints are given (see Checkpoints), the state of the allocation is
+    saved during (with the decision trees) and after the allocation, and an
+    interrupted allocation is resumed from its checkpoint if the run is
+    resumed.
+    """
+
+    context = config.context_of_run(context)
+    state = (checkpoints.restore_allocation() if checkpoints is not None
+             else None)
+
+    if state is None:
+        # Initialise bookkeeper to bookkeep the energy balance, per
+        # neighbourhood and per region (municipality and custom regions)
+        regions, region_names = region_mappings(neighbourhoods)
+        bookkeeper = Bookkeeper(neighbourhoods.keys(), regions)
+
+        # Sort neighbourhoods on first preference percentage
+        sorted_neighbourhoods = {}
+        for neighbourhood in sorted(
+                neighbourhoods.values(),
+                key=lambda x: x.heating_option_preference[0][1],
+                reverse=True):
+            sorted_neighbourhoods[neighbourhood.code] = neighbourhood
+
+    else:
+        # Continue with the objects of the checkpoint (the heat sources in
+        # place, as the caller exports them)
+        heat_sources.update(state.heat_sources)
+        sorted_neighbourhoods = state.neighbourhoods
+        bookkeeper = state.bookkeeper
+        region_names = state.region_names
+
+        # The allocation was complete, only its results are left to export
+        if state.progress is None:
+            return sorted_neighbourhoods, bookkeeper, region_names
+
+    if checkpoints is not None:
+        checkpoints.track_allocation(sorted_neighbourhoods, heat_sources,
+                                     bookkeeper, region_names)
+
+    # Assign heating options with the decision trees on the neighbourhood
+    # objects, with the (optionally compiled) allocation kernel, or all at
+    # once with the LP allocation
+    allocation_engine = context.scenario.get('allocation_engine',
+                                             'decision_trees')
+
+    if allocation_engine == 'kernel':
+        run_allocation_kernel(sorted_neighbourhoods, heat_sources, bookkeeper)
+    elif allocation_engine == 'lp':
+        # SciPy is optional and slow to import, so only import it when needed
+        from lp_allocation import run_lp_allocation
+
+        run_lp_allocation(sorted_neighbourhoods, heat_sources, bookkeeper)
+    else:
+        apply_decision_trees(sorted_neighbourhoods, heat_sources, bookkeeper,
+                             checkpoints,
+                             state.progress if state is not None else None)
 
     # Sort neighbourhoods on LT eligibility
     neighbourhoods = sorted_neighbourhoods
@@ -389,11 +624,30 @@ def main(args):
             reverse=True):
         sorted_neighbourhoods[neighbourhood.code] = neighbourhood
 
+    add_electricity_demand_of_appliances(sorted_neighbourhoods, bookkeeper,
+                                         context)
+    bookkeeper.add_assignments(sorted_neighbourhoods.values())
+
+    if checkpoints is not None:
+        checkpoints.track_allocation(sorted_neighbourhoods, heat_sources,
+                                     bookkeeper, region_names)
+        checkpoints.save_allocation()
+
+    return sorted_neighbourhoods, bookkeeper, region_names
+
+
+def add_electricity_demand_of_appliances(neighbourhoods, bookkeeper,
+                                         context=None):
+    """
+    Add the additional electricity demand (not for heating but for
+    appliances, lighting, etc.) of the neighbourhoods to the bookkeeper
+    """
+
     # Get future efficiency of appliances, etc.
-    efficiency = config.current_project.ASSUMPTIONS['efficiency_of_appliances']
-    # Add additional electricity demand (not for heating but for appliances,
-    # lighting, etc.) to each neighbourhood
-    for code, neighbourhood in sorted_neighbourhoods.items():
+    efficiency = config.context_of_run(context).project.ASSUMPTIONS[
+        'efficiency_of_appliances']
+
+    for code, neighbourhood in neighbourhoods.items():
         # Calculate future electricity demands
         future_electricity_demand_residences = (neighbourhood.total_electricity_demand_of_residences() * efficiency)
         future_electricity_demand_utility = (neighbourhood.total_electricity_demand_of_utility() * efficiency)
@@ -403,27 +657,86 @@ def main(args):
                                          future_electricity_demand_residences,
                                          future_electricity_demand_utility)
 
-    # Save classified neighbourhoods (i.e., the objects with the assigned
-    # heating option and source included)
-    save_objects('classified_neighbourhoods', sorted_neighbourhoods)
 
-    # Save and export bookkeeper results
-    bookkeeper.save_bookkeeper()
-    bookkeeper.export_heat_demand_to_csv()
+def result_tables(neighbourhoods, heat_sources, bookkeeper, region_names,
+                  names=None, context=None):
+    """
+    Returns the result tables of an allocation (see allocate) as DataFrames,
+    by the name of their output file (all tables, or the given names)
+    """
 
-    # Save assigned HT and LT sources
-    save_objects('assigned_ht_sources', heat_sources['HT'])
-    save_objects('assigned_lt_sources', heat_sources['LT'])
+    builders = {
+        'demands': bookkeeper.heat_demand_table,
+        'distance_from_neighbourhood_to_source': lambda: distance_table(
+            neighbourhoods, heat_sources),
+        'heat_network_clusters': lambda: heat_network_clusters_table(
+            cluster_heat_networks(neighbourhoods, bookkeeper)),
+        'neighbourhoods_output': lambda: neighbourhood_results_table(
+            neighbourhoods, context),
+        **{
+            f'{heat_type}_sources_output':
+            lambda heat_type=heat_type: heat_source_results_table(
+                heat_sources, heat_type)
+            for heat_type in ['HT', 'LT']
+        },
+        **{
+            f'regional_demands_{grouping}':
+            lambda grouping=grouping: bookkeeper.regional_heat_demand_tables(
+                region_names)[grouping]
+            for grouping in bookkeeper.region_mappings
+        },
+        **{
+            f'regional_assignments_{grouping}':
+            lambda grouping=grouping: regional_assignment_tables(
+                bookkeeper, region_names)[grouping]
+            for grouping in bookkeeper.region_mappings
+        }
+    }
+
+    if names is None:
+        names = builders.keys()
+
+    unknown = set(names) - set(builders)
+
+    if unknown:
+        raise KeyError(f"Unknown result tables {sorted(unknown)}, choose "
+                       f"from {list(builders)}")
+
+    return {name: builders[name]() for name in names}
+
+
+def summarise_run(neighbourhoods, heat_sources, results, context=None):
+    """
+    Returns a summary of the run of the scenario of the run context (or the
+    current one): the number of neighbourhoods per assigned heating option,
+    the used renewable gas and residual heat, and the number of failed checks
+    """
 
-    # Run tests (let's use another script for that, separately from this one)
-    run_all_tests(config.current_project.current_scenario_name)
+    context = config.context_of_run(context)
 
-    # Determine distance from each "W" neighbourhood to the used heat source
-    determine_distance_from_neighbourhood_to_source(sorted_neighbourhoods, heat_sources)
+    summary = {
+        'scenario': context.scenario_name,
+        'neighbourhoods': len(neighbourhoods)
+    }
 
-    # Export the results to a CSV file
-    export_neighbourhood_results_to_csv(sorted_neighbourhoods)
-    export_heat_source_results_to_csv(heat_sources)
+    for option in OPTIONS:
+        summary[option] = sum(
+            neighbourhood.assigned_heating_option == option
+            for neighbourhood in neighbourhoods.values())
+
+    summary.update(context.counters)
+    summary['renewable_gas_budget'] = context.scenario['renewable_gas_budget']
+
+    for heat_temperature in ['HT', 'LT']:
+        summary[f'used_{heat_temperature}_heat'] = math.fsum(
+            source.used_heat
+            for source in heat_sources[heat_temperature].values())
+
+    summary['failed_checks'] = sum(not check.passed
+                                   for checks in results.values()
+                                   for check in checks)
+
+    return summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,616 @@
+"""
+Monte Carlo mode: instead of the point estimates in ASSUMPTIONS, SPECS and the
+scenario, draw the uncertain parameters from distributions and run the
+allocation for each draw, to find per neighbourhood the probability of each
+assigned heating option and heat source.
+
+The distributions are given per scenario, e.g.:
+
+    'monte_carlo': {
+        'draws': 1000,
+        'seed': 42,
+        'parameters': {
+            'SPECS.efficiency_of_heat_network': ('uniform', 0.8, 0.9),
+            'SPECS.share_of_HT_heat': ('normal', 0.8, 0.05),
+            'ASSUMPTIONS.desired_epi.E': ('triangular', 0.5, 0.7, 0.9),
+            'SCENARIO.renewable_gas_budget': ('uniform', 1.E7, 3.E7)
+        }
+    }
+
+A parameter is named by its section (ASSUMPTIONS, SPECS or SCENARIO) and its
+key(s), a distribution by a method of numpy.random.Generator and its
+arguments (see DISTRIBUTIONS). Parameters that are not drawn keep their point
+estimate. The parameters of the preferences (linear heat density offset,
+heat network coverage thresholds and favour, LT eligibility threshold), the
+demands (desired EPIs and efficiencies), the shares of residual heat and the
+gas budget affect the allocation; other parameters only affect the
+bookkeeping and are ignored.
+
+The preference and demand stages are computed for batches of draws at once
+(along a sample axis) from the stock of the neighbourhoods, and each draw is
+allocated with the allocation kernel (compiled with Numba if installed). The
+draws are divided over a pool of worker processes that share the project
+arrays (see SharedSnapshot).
+
+Run python3 monte_carlo.py <project_name> <scenario_name> <optional: draws>
+after load_data.py to write monte_carlo_options, monte_carlo_sources and
+monte_carlo_draws to the output data directory of the scenario.
+"""
+
+# system modules
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+
+# external modules
+import numpy as np
+
+# project modules
+from allocation_kernel import kernel_arrays, residual_heat_shares, run_kernel
+from CandidateIndex import CandidateIndex
+from DecisionTree import (OPTION_INDEX, OPTIONS, ROUTE_INDEX, ROUTES,
+                          decision_tree_of_project)
+from lt_matrix import LTMatrix
+from main import load_ht_sources, load_lt_sources, load_neighbourhoods
+from Matrix import Matrix
+from ProjectSnapshot import DEMAND_OPTIONS, HEAT_TEMPERATURES, ProjectSnapshot
+from RunContext import RunContext
+from SharedSnapshot import SharedSnapshot, map_on_snapshot
+from StageCache import STAGE_SETTINGS
+from source_selection import source_selection_of_scenario
+from table_export import write_table
+import config
+
+# Distributions of the parameters (methods of numpy.random.Generator)
+DISTRIBUTIONS = ['uniform', 'normal', 'triangular', 'lognormal', 'beta',
+                 'gamma']
+
+# Sections of the parameters
+SECTIONS = ['ASSUMPTIONS', 'SPECS', 'SCENARIO']
+
+# Parameters of the preference stage
+PREFERENCE_PARAMETERS = [
+    'ASSUMPTIONS.linear_heat_density_max_offset',
+    'ASSUMPTIONS.heat_network_coverage_threshold_high',
+    'ASSUMPTIONS.heat_network_coverage_threshold_low',
+    'ASSUMPTIONS.heat_network_coverage_favour',
+    'ASSUMPTIONS.lt_eligibility_threshold'
+]
+
+# Parameters of the demand stage
+DEMAND_PARAMETERS = [
+    'SPECS.efficiency_of_heat_network',
+    'SPECS.efficiency_of_LT_heat_network',
+    'SPECS.efficiency_gas_to_heat_ccb',
+    'SPECS.efficiency_gas_to_heat_hhp',
+    'SPECS.efficiency_electricity_to_heat'
+] + [f'ASSUMPTIONS.desired_epi.{option}' for option in DEMAND_OPTIONS]
+
+# Parameters of the allocation: the shares of residual heat, the maximum
+# distance to a heat source and the gas budget
+ALLOCATION_PARAMETERS = [
+    name for name in STAGE_SETTINGS['allocation']
+    if name.startswith('SPECS.share_of_')
+] + ['SCENARIO.max_source_distance', 'SCENARIO.renewable_gas_budget']
+
+# Parameters per stage of a run (each a subset of the settings of the stage,
+# see StageCache.STAGE_SETTINGS)
+PARAMETER_STAGES = {
+    'preferences': PREFERENCE_PARAMETERS,
+    'demands': DEMAND_PARAMETERS,
+    'allocation': ALLOCATION_PARAMETERS
+}
+
+# Parameters of the preference and demand stages
+STAGE_PARAMETERS = PREFERENCE_PARAMETERS + DEMAND_PARAMETERS
+
+# Options of the unsorted preference vector (see Matrix.sorted_preference)
+PREFERENCE_OPTIONS = np.array(
+    [OPTION_INDEX['W_MTHT'], OPTION_INDEX['H'], OPTION_INDEX['E']])
+
+# Arrays of the kernel that do not depend on the parameters
+FIXED_KERNEL_ARRAYS = [
+    'rules', 'number_of_rules', 'requires_lt_elegibility',
+    'geothermal_available', 'teo_available'
+] + [f'{heat_temperature.lower()}_{name}'
+     for heat_temperature in HEAT_TEMPERATURES
+     for name in ['indptr', 'indices', 'distances', 'available_heat',
+                  'used_heat']]
+
+# Number of draws of which the stages are computed at once
+BATCH_SIZE = 32
+
+
+def point_estimate(name):
+    """
+    Returns the point estimate of a parameter (e.g. 'SPECS.share_of_HT_heat'
+    or 'ASSUMPTIONS.desired_epi.E') in the current project and scenario
+    """
+
+    section, *keys = name.split('.')
+
+    if section not in SECTIONS or not keys:
+        raise KeyError(f"Unknown parameter '{name}', a parameter is named "
+                       f"<section>.<key> with a section in {SECTIONS}")
+
+    if section == 'SCENARIO':
+        value = config.current_project.current_scenario
+    else:
+        value = getattr(config.current_project, section)
+
+    for key in keys:
+        if not isinstance(value, dict) or key not in value:
+            raise KeyError(f"Unknown parameter '{name}'")
+
+        value = value[key]
+
+    return value
+
+
+def stage_of_parameter(name):
+    """
+    Returns the stage of a run the parameter affects (see PARAMETER_STAGES):
+    'preferences', 'demands' or 'allocation' (the shares of residual heat,
+    the maximum distance to a heat source and the gas budget), or None if it
+    is not a parameter of these stages
+    """
+
+    for stage, names in PARAMETER_STAGES.items():
+        if name in names:
+            return stage
+
+    return None
+
+
+def sample_parameters(parameters, draws, seed=None):
+    """
+    Returns the draws of the parameters (by name) from their distributions
+    """
+
+    generator = np.random.default_rng(seed)
+    samples = {}
+
+    for name, (distribution, *arguments) in parameters.items():
+        point_estimate(name)
+
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}' of "
+                             f"'{name}', choose one of {DISTRIBUTIONS}")
+
+        samples[name] = getattr(generator, distribution)(*arguments,
+                                                         size=draws)
+
+    return samples
+
+
+def parameter_values(samples, names, draws):
+    """
+    Returns the values of the parameters for each draw: the samples, or the
+    point estimate if the parameter has not been drawn
+    """
+
+    return {
+        name: np.asarray(samples[name], dtype=float) if name in samples else
+        np.full(draws, float(point_estimate(name)))
+        for name in names
+    }
+
+
+def residual_heat_shares_of_draws(decision_tree, samples, draws):
+    """
+    Returns the shares of residual heat per draw (see residual_heat_shares)
+    """
+
+    specs = config.current_project.SPECS
+    names = [name for name in samples if name.startswith('SPECS.')]
+
+    if not names:
+        return np.repeat(residual_heat_shares(decision_tree)[np.newaxis],
+                         draws, axis=0)
+
+    return np.array([
+        residual_heat_shares(decision_tree, {
+            **specs,
+            **{name.split('.', 1)[1]: samples[name][draw] for name in names}
+        }) for draw in range(draws)
+    ])
+
+
+def base_arrays(neighbourhoods, heat_sources):
+    """
+    Returns the arrays of the project that do not depend on the parameters:
+    the normalised preference vectors (before the linear heat density offset
+    and existing heat networks), the stock and present demands of the
+    neighbourhoods, the EPI reduction tables and the fixed arrays of the
+    kernel (candidate heat sources, capacities and decision trees)
+    """
+
+    snapshot = ProjectSnapshot(neighbourhoods, heat_sources)
+    arrays = {
+        name: array for name, array in kernel_arrays(snapshot).items()
+        if name in FIXED_KERNEL_ARRAYS
+    }
+    arrays['number_of_houses'] = snapshot.number_of_houses
+    arrays['m2_of_utility'] = snapshot.m2_of_utility
+
+    # The matrices have already warned about inconsistent stock when loading
+    with redirect_stdout(io.StringIO()):
+        arrays['preference_vector'] = np.array([
+            Matrix().determine_normalised_vector(neighbourhood)
+            for neighbourhood in neighbourhoods.values()
+        ], dtype=float).reshape(-1, 3)
+        arrays['lt_share'] = np.array([
+            LTMatrix().determine_normalised_vector(neighbourhood)[0]
+            for neighbourhood in neighbourhoods.values()
+        ], dtype=float)
+
+    attributes = {
+        'linear_heat_density': lambda n: n.linear_heat_density(),
+        'existing_heat_network_share': lambda n: n.existing_heat_network_share,
+        'space_heating_residences':
+        lambda n: n.total_space_heating_demand_of_residences(),
+        'hot_water_residences':
+        lambda n: n.total_hot_water_demand_of_residences(),
+        'space_heating_utility':
+        lambda n: n.total_space_heating_demand_of_utility(),
+        'hot_water_utility': lambda n: n.total_hot_water_demand_of_utility(),
+        'epi_residences': lambda n: n.weighted_epi_of_residences(),
+        'epi_utility': lambda n: n.weighted_epi_of_utility(),
+        'fraction_of_small_houses': lambda n: n.fraction_of_small_houses()
+    }
+
+    for name, attribute in attributes.items():
+        arrays[name] = np.array(
+            [attribute(neighbourhood)
+             for neighbourhood in neighbourhoods.values()], dtype=float)
+
+    for building_type in ['residences', 'utility']:
+        arrays[f'epi_reduction_table_{building_type}'] = np.array(
+            list(zip(*config.current_project.KEY_FIGURES[
+                'epi_reduction_table'][building_type])), dtype=float)
+
+    return arrays
+
+
+def preference_stage(arrays, values):
+    """
+    Returns the preferences of the neighbourhoods for a batch of draws (see
+    Matrix.sorted_preference and LTMatrix): the preferred options and their
+    values (draws x neighbourhoods x 3), and whether the neighbourhoods are
+    undecided, LT eligible and forced to a heat network (draws x
+    neighbourhoods)
+    """
+
+    # Linear heat density offset
+    offset = (
+        values['ASSUMPTIONS.linear_heat_density_max_offset'][:, np.newaxis] *
+        np.clip(arrays['linear_heat_density'] - 1., 0., 1.))
+
+    vector = arrays['preference_vector'] * (1. - offset)[..., np.newaxis]
+    vector[..., 0] += offset
+
+    # Existing heat networks
+    share = arrays['existing_heat_network_share']
+    force_heat_network = share > values[
+        'ASSUMPTIONS.heat_network_coverage_threshold_high'][:, np.newaxis]
+    favour = ~force_heat_network & (share > values[
+        'ASSUMPTIONS.heat_network_coverage_threshold_low'][:, np.newaxis])
+
+    favoured = vector.copy()
+    favoured[..., 0] += values[
+        'ASSUMPTIONS.heat_network_coverage_favour'][:, np.newaxis]
+    total = favoured[..., 0] + favoured[..., 1] + favoured[..., 2]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        favoured = np.where(total[..., np.newaxis] > 0.,
+                            favoured / total[..., np.newaxis], favoured)
+
+    vector = np.where(favour[..., np.newaxis], favoured, vector)
+    vector[force_heat_network] = [1., 0., 0.]
+
+    # Sort by value (stable, as sorted)
+    order = np.argsort(-vector, axis=-1, kind='stable')
+    preference_values = np.take_along_axis(vector, order, axis=-1)
+
+    undecided = (preference_values[..., 0] + preference_values[..., 1] +
+                 preference_values[..., 2]) == 0.
+    lt_elegible = arrays['lt_share'] > values[
+        'ASSUMPTIONS.lt_eligibility_threshold'][:, np.newaxis]
+
+    return (PREFERENCE_OPTIONS[order], preference_values, undecided,
+            lt_elegible, force_heat_network)
+
+
+def relative_heat_reduction(epi, desired_epi, table):
+    """
+    Returns the fraction of heat reduction for the desired EPIs (draws x 1)
+    relative to the present heat demand (see
+    Neighbourhood.relative_heat_reduction_of_residences)
+    """
+
+    xp, fp = table
+
+    current_reduction = np.interp(epi, xp, fp)
+    desired_reduction = np.interp(desired_epi, xp, fp)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reduction = ((desired_reduction - current_reduction) /
+                     (1.0 - current_reduction))
+
+    return np.where(desired_epi >= epi, 0.0, reduction)
+
+
+def demand_stage(arrays, values):
+    """
+    Returns the demand tensor for a batch of draws: draws x neighbourhoods x
+    heating options (DEMAND_OPTIONS) x HeatDemands fields (see
+    Neighbourhood.future_heat_demand_of_residences)
+    """
+
+    number_of_draws = len(values['SPECS.efficiency_of_heat_network'])
+    fraction_of_small_houses = arrays['fraction_of_small_houses']
+
+    efficiencies = {
+        'W_MTHT': values['SPECS.efficiency_of_heat_network'][:, np.newaxis],
+        'W_LT': values['SPECS.efficiency_of_LT_heat_network'][:, np.newaxis],
+        'E': values['SPECS.efficiency_electricity_to_heat'][:, np.newaxis],
+        'H': ((fraction_of_small_houses *
+               values['SPECS.efficiency_gas_to_heat_ccb'][:, np.newaxis]) +
+              ((1. - fraction_of_small_houses) *
+               values['SPECS.efficiency_gas_to_heat_hhp'][:, np.newaxis]))
+    }
+
+    demands = np.empty((number_of_draws, len(fraction_of_small_houses),
+                        len(DEMAND_OPTIONS), 6))
+
+    for index, option in enumerate(DEMAND_OPTIONS):
+        desired_epi = values[f'ASSUMPTIONS.desired_epi.{option}'][:,
+                                                                  np.newaxis]
+
+        for sector, building_type in enumerate(['residences', 'utility']):
+            space_heating = arrays[f'space_heating_{building_type}']
+            heat_reduction = space_heating * relative_heat_reduction(
+                arrays[f'epi_{building_type}'], desired_epi,
+                arrays[f'epi_reduction_table_{building_type}'])
+            useful_demand = ((space_heating - heat_reduction) +
+                             arrays[f'hot_water_{building_type}'])
+
+            demands[:, :, index, 3 * sector] = (useful_demand /
+                                                efficiencies[option])
+            demands[:, :, index, 3 * sector + 1] = useful_demand
+            demands[:, :, index, 3 * sector + 2] = heat_reduction
+
+    return demands
+
+
+def iteration_orders_of(preference_values):
+    """
+    Returns the iteration orders for the preference values of a draw (see
+    allocation_kernel.iteration_orders)
+    """
+
+    first = np.argsort(-preference_values[:, 0], kind='stable')
+    second = first[np.argsort(
+        -(preference_values[first, 0] + preference_values[first, 1]),
+        kind='stable')]
+
+    return np.array([first, second], dtype=np.int64)
+
+
+def candidate_positions(arrays, heat_temperature):
+    """
+    Returns the sorted keys (neighbourhood x number of sources + source) of
+    the candidate lists of the heat temperature and their positions
+    """
+
+    prefix = heat_temperature.lower()
+    indptr = arrays[f'{prefix}_indptr']
+    number_of_sources = len(arrays[f'{prefix}_available_heat'])
+
+    keys = (np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)) *
+            number_of_sources + arrays[f'{prefix}_indices'])
+    positions = np.argsort(keys, kind='stable')
+
+    return keys[positions], positions, number_of_sources
+
+
+def run_draws(arrays, values, shares, strategy, max_distance):
+    """
+    Run the allocation for draws of the parameters (values by name, and the
+    shares of residual heat per draw) on the arrays of the project (see
+    base_arrays). Returns the number of draws in which each neighbourhood got
+    each heating option (neighbourhoods x OPTIONS) and route (neighbourhoods
+    x ROUTES) and each candidate heat source (per heat temperature, in the
+    order of the candidate lists), and the used renewable gas per draw.
+    """
+
+    number_of_neighbourhoods = len(arrays['linear_heat_density'])
+    number_of_draws = len(shares)
+
+    option_counts = np.zeros((number_of_neighbourhoods, len(OPTIONS)),
+                             dtype=np.int64)
+    route_counts = np.zeros((number_of_neighbourhoods, len(ROUTES)),
+                            dtype=np.int64)
+    source_counts = {
+        heat_temperature: np.zeros(
+            len(arrays[f'{heat_temperature.lower()}_indices']),
+            dtype=np.int64)
+        for heat_temperature in HEAT_TEMPERATURES
+    }
+    positions = {
+        heat_temperature: candidate_positions(arrays, heat_temperature)
+        for heat_temperature in HEAT_TEMPERATURES
+    }
+    used_renewable_gas = np.zeros(number_of_draws)
+
+    fixed = {name: arrays[name] for name in FIXED_KERNEL_ARRAYS}
+    neighbourhoods = np.arange(number_of_neighbourhoods)
+
+    for start in range(0, number_of_draws, BATCH_SIZE):
+        batch = slice(start, min(start + BATCH_SIZE, number_of_draws))
+        batch_values = {name: value[batch] for name, value in values.items()}
+
+        (preference_options, preference_values, undecided, lt_elegible,
+         force_heat_network) = preference_stage(arrays, batch_values)
+        demands = demand_stage(arrays, batch_values)
+
+        for index, draw in enumerate(range(batch.start, batch.stop)):
+            (options, routes, sources, _, _, used_renewable_gas[draw]), _ = (
+                run_kernel({
+                    **fixed,
+                    'orders': iteration_orders_of(preference_values[index]),
+                    'undecided': undecided[index],
+                    'preference_options': preference_options[index],
+                    'lt_elegible': lt_elegible[index],
+                    'force_heat_network': force_heat_network[index],
+                    'demands': demands[index],
+                    'shares': shares[draw]
+                }, strategy, max_distance,
+                           values['SCENARIO.renewable_gas_budget'][draw],
+                           values['SCENARIO.used_renewable_gas'][draw]))
+
+            assigned = options >= 0
+            option_counts[neighbourhoods[assigned], options[assigned]] += 1
+            route_counts[neighbourhoods[assigned], routes[assigned]] += 1
+
+            for heat_temperature in HEAT_TEMPERATURES:
+                keys, key_positions, number_of_sources = positions[
+                    heat_temperature]
+                supplied = np.flatnonzero(
+                    routes == ROUTE_INDEX[heat_temperature])
+                source_counts[heat_temperature][key_positions[np.searchsorted(
+                    keys, supplied * number_of_sources +
+                    sources[supplied])]] += 1
+
+    return option_counts, route_counts, source_counts, used_renewable_gas
+
+
+def run_monte_carlo(neighbourhoods, heat_sources, parameters, draws,
+                    seed=None, processes=None):
+    """
+    Run the allocation for draws of the parameters (distributions by name) in
+    a pool of worker processes. Returns the samples of the parameters and the
+    counts of the draws (see run_draws), summed over the workers.
+    """
+
+    samples = sample_parameters(parameters, draws, seed)
+    values = parameter_values(samples, STAGE_PARAMETERS + [
+        'SCENARIO.renewable_gas_budget', 'SCENARIO.used_renewable_gas'
+    ], draws)
+    shares = residual_heat_shares_of_draws(decision_tree_of_project(),
+                                           samples, draws)
+
+    strategy, max_distance = source_selection_of_scenario()
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    # Divide the draws over the workers in chunks of whole batches
+    number_of_chunks = min(max(1, -(-draws // BATCH_SIZE)), 4 * processes)
+    chunks = np.array_split(np.arange(draws), number_of_chunks)
+
+    with SharedSnapshot(base_arrays(neighbourhoods, heat_sources)) as shared:
+        results = map_on_snapshot(run_draws, shared, [
+            ({name: value[chunk] for name, value in values.items()},
+             shares[chunk], strategy, max_distance) for chunk in chunks
+        ], processes)
+
+    option_counts = sum(result[0] for result in results)
+    route_counts = sum(result[1] for result in results)
+    source_counts = {
+        heat_temperature: sum(result[2][heat_temperature]
+                              for result in results)
+        for heat_temperature in HEAT_TEMPERATURES
+    }
+    samples['used_renewable_gas'] = np.concatenate(
+        [result[3] for result in results])
+
+    return samples, option_counts, route_counts, source_counts
+
+
+def export_monte_carlo_results(neighbourhoods, heat_sources, samples,
+                               option_counts, route_counts, source_counts):
+    """
+    Export the probabilities of the heating options (monte_carlo_options) and
+    heat sources (monte_carlo_sources) per neighbourhood, and the draws of the
+    parameters (monte_carlo_draws)
+    """
+
+    draws = len(samples['used_renewable_gas'])
+    codes = list(neighbourhoods.keys())
+    probabilities = option_counts / draws
+
+    write_table({
+        'neighbourhood_code': codes,
+        'name': [neighbourhood.name
+                 for neighbourhood in neighbourhoods.values()],
+        **{f'probability_{option}': probabilities[:, index]
+           for index, option in enumerate(OPTIONS)},
+        'most_likely_option': np.array(OPTIONS)[probabilities.argmax(axis=1)],
+        'probability_of_most_likely_option': probabilities.max(axis=1)
+    }, "monte_carlo_options")
+
+    # Residual heat sources (from the candidate lists) and the other heat
+    # network routes
+    rows = {'neighbourhood_code': [], 'heat_source': [], 'probability': []}
+
+    for heat_temperature in HEAT_TEMPERATURES:
+        candidate_index = CandidateIndex(neighbourhoods,
+                                         heat_sources[heat_temperature],
+                                         heat_temperature)
+        neighbourhood_of_candidate = np.repeat(
+            np.arange(len(codes)), np.diff(candidate_index.indptr))
+
+        for position in np.flatnonzero(source_counts[heat_temperature]):
+            rows['neighbourhood_code'].append(
+                codes[neighbourhood_of_candidate[position]])
+            rows['heat_source'].append(candidate_index.source_codes[
+                candidate_index.indices[position]])
+            rows['probability'].append(
+                source_counts[heat_temperature][position] / draws)
+
+    for route in ['geothermal', 'TEO', 'undefined']:
+        for index in np.flatnonzero(route_counts[:, ROUTE_INDEX[route]]):
+            rows['neighbourhood_code'].append(codes[index])
+            rows['heat_source'].append(route)
+            rows['probability'].append(
+                route_counts[index, ROUTE_INDEX[route]] / draws)
+
+    write_table(rows, "monte_carlo_sources")
+
+    write_table({'draw': np.arange(draws), **samples}, "monte_carlo_draws")
+
+
+def main(args):
+    """
+    Run the Monte Carlo mode for the project and scenario given on the
+    command line, see the module docstring
+    """
+
+    if len(args) < 2:
+        print('The following arguments were expected: monte_carlo.py '
+              '<PROJECT> <SCENARIO> <optional: DRAWS>')
+        return
+
+    with RunContext(args[0], args[1]).activate():
+        settings = config.current_project.current_scenario.get(
+            'monte_carlo', {})
+        draws = int(args[2]) if len(args) > 2 else settings.get('draws', 1000)
+
+        neighbourhoods = load_neighbourhoods()
+        heat_sources = {'HT': load_ht_sources(), 'LT': load_lt_sources()}
+
+        print(f'\nRunning {draws} draws of '
+              f'{list(settings.get("parameters", {}))}..')
+
+        results = run_monte_carlo(neighbourhoods, heat_sources,
+                                  settings.get('parameters', {}), draws,
+                                  settings.get('seed'))
+        export_monte_carlo_results(neighbourhoods, heat_sources, *results)
+
+        print('Done!')
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,32 @@
+"""
+Normalisation of the settings of a project to JSON-serialisable data, so the
+settings can be keyed (the result cache, the stage cache, the compiled
+decision trees, etc.) independently of the order of their dicts and sets.
+"""
+
+# external modules
+import numpy as np
+
+
+def normalised(value):
+    """
+    Returns the value (settings of a project) as JSON-serialisable data that
+    does not depend on the order of dicts and sets
+    """
+
+    if isinstance(value, dict):
+        return {repr(key): normalised(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [normalised(item) for item in value]
+
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(item) for item in value)
+
+    if isinstance(value, np.ndarray):
+        return normalised(value.tolist())
+
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+
+    return repr(value)
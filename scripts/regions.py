@@ -0,0 +1,147 @@
+"""
+Regions of the neighbourhoods: the municipality (from neighbourhoods_geo.csv)
+and any custom grouping given in the project configuration as REGION_CSVS, a
+CSV file per grouping with the columns neighbourhood_code, region_code and
+(optionally) region_name. The bookkeeper sums the heat demand per region
+from the heat demand of its neighbourhoods (see Bookkeeper), the regional
+demands and assignments are exported to the regional_demands_<grouping> and
+regional_assignments_<grouping> tables (see table_export).
+"""
+
+# system modules
+from pathlib import Path
+
+# external modules
+import numpy as np
+import pandas as pd
+
+# project modules
+from DecisionTree import OPTIONS
+import config
+from table_export import table_of_records, write_table
+
+
+def region_mappings(neighbourhoods):
+    """
+    Returns the region of each neighbourhood per grouping, and the names of
+    the regions per grouping
+    """
+
+    mappings = {'municipality': {}}
+    names = {'municipality': {}}
+
+    for neighbourhood in neighbourhoods.values():
+        code = getattr(neighbourhood, 'municipality_code', None)
+
+        if isinstance(code, str):
+            mappings['municipality'][neighbourhood.code] = code
+            names['municipality'][code] = getattr(neighbourhood,
+                                                  'municipality_name', code)
+
+    for grouping, csv_file in getattr(config.current_project, 'REGION_CSVS',
+                                      {}).items():
+        path = (Path(__file__).resolve().parents[1] / "input_data" /
+                f"{config.current_project_name}" / csv_file)
+        data = pd.read_csv(path, dtype=str)
+
+        mappings[grouping] = dict(
+            zip(data['neighbourhood_code'], data['region_code']))
+        names[grouping] = dict(
+            zip(data['region_code'],
+                data.get('region_name', data['region_code'])))
+
+    return mappings, names
+
+
+def export_regional_assignments_to_csv(bookkeeper, region_names=None,
+                                       context=None):
+    """
+    Export the assigned heating options per region to a table per grouping
+    (in the output format of the scenario of the run context, or the current
+    one): the number of neighbourhoods, houses and m2 of utility per heating
+    option. The assignments and regions of the neighbourhoods are taken from
+    the bookkeeper.
+    """
+
+    for grouping, table in regional_assignment_tables(
+            bookkeeper, region_names).items():
+        write_table(table, f"regional_assignments_{grouping}",
+                    context=context)
+
+
+def regional_assignment_tables(bookkeeper, region_names=None):
+    """
+    Returns the table of the assigned heating options per region per grouping
+    (see export_regional_assignments_to_csv)
+    """
+
+    tables = {}
+
+    for grouping, rows in regional_assignment_rows(bookkeeper,
+                                                   region_names).items():
+        columns = assignment_columns(grouping)
+        tables[grouping] = table_of_records(
+            [dict(zip(columns, row)) for row in rows], columns)
+
+    return tables
+
+
+def assignment_columns(grouping):
+    """
+    Returns the columns of the table of the assigned heating options per
+    region of the grouping
+    """
+
+    return [
+        grouping, 'name', 'heating_option', 'number_of_neighbourhoods',
+        'number_of_houses', 'm2_of_utility'
+    ]
+
+
+def regional_assignment_rows(bookkeeper, region_names=None):
+    """
+    Returns the rows of the table of the assigned heating options per region
+    per grouping: the number of neighbourhoods, houses and m2 of utility per
+    region and heating option (if any), counted from the assignments kept by
+    the bookkeeper (see Bookkeeper.add_assignments). Neighbourhoods that have
+    not been assigned are skipped.
+    """
+
+    region_names = region_names or {}
+
+    # The rows of the assigned neighbourhoods
+    options = bookkeeper.assigned_options[:len(bookkeeper.neighbourhood_codes)]
+    rows = np.flatnonzero(options >= 0)
+    options = options[rows]
+    houses = bookkeeper.number_of_houses[rows]
+    utility = bookkeeper.m2_of_utility[rows]
+
+    rows_per_grouping = {}
+
+    for grouping in bookkeeper.region_mappings:
+        regions = bookkeeper.regions[grouping]
+        names = region_names.get(grouping, {})
+
+        # Group the neighbourhoods per region and heating option
+        groups = bookkeeper.region_of[grouping][rows] * len(OPTIONS) + options
+        size = len(regions) * len(OPTIONS)
+
+        number_of_neighbourhoods = np.bincount(
+            groups, minlength=size).reshape(len(regions), len(OPTIONS))
+        number_of_houses = np.bincount(
+            groups, weights=houses, minlength=size).reshape(
+                len(regions), len(OPTIONS))
+        m2_of_utility = np.bincount(
+            groups, weights=utility, minlength=size).reshape(
+                len(regions), len(OPTIONS))
+
+        rows_per_grouping[grouping] = [[
+            region, names.get(region, region), option,
+            int(number_of_neighbourhoods[region_index, option_index]),
+            float(number_of_houses[region_index, option_index]),
+            float(m2_of_utility[region_index, option_index])
+        ] for region_index, region in enumerate(regions)
+          for option_index, option in enumerate(OPTIONS)
+          if number_of_neighbourhoods[region_index, option_index]]
+
+    return rows_per_grouping
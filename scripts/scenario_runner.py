@@ -0,0 +1,187 @@
+"""
+Run several scenarios of a project concurrently, each in its own process and
+run context (see RunContext), from one snapshot of the project settings.
+
+Run python3 scenario_runner.py <project_name> <optional: scenario names>
+<optional: 'refresh'> in your terminal to run all SCENARIOS of the project (or
+the given ones). With 'refresh' the neighbourhoods and heat sources are
+initialised first (as load_data.py does). The output of each scenario is
+written to run.log in its output data directory, a combined summary of the
+runs is printed at the end.
+
+If scenarios use the kernel or LP allocation engine, the demand tensor of the
+neighbourhoods (which does not depend on the scenario, see ProjectSnapshot) is
+computed once and published in shared memory (see SharedSnapshot), which the
+processes attach to instead of computing it per scenario.
+"""
+
+# system modules
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+import os
+import sys
+from pathlib import Path
+
+# external modules
+import numpy as np
+
+# project modules
+from load_data import build_stock, determine_preferences
+from main import load_neighbourhoods, run_scenario
+from ProjectSnapshot import demand_tensor
+from RunContext import ProjectSettings, RunContext
+from SharedSnapshot import SharedSnapshot, SnapshotDescriptor, attach
+import config
+
+# Allocation engines that read the demand tensor of the neighbourhoods
+ARRAY_ENGINES = ['kernel', 'lp']
+
+# Columns of the combined summary (see main.summarise_run)
+SUMMARY_COLUMNS = [
+    'scenario', 'neighbourhoods', 'W_MTHT', 'W_LT', 'H', 'E', 'undecided',
+    'used_renewable_gas', 'renewable_gas_budget', 'used_HT_heat',
+    'used_LT_heat', 'failed_checks'
+]
+
+
+def run_scenario_with_log(project_name, scenario_name, settings,
+                          refresh=False, shared_demands=None):
+    """
+    Run a scenario in a new run context, with its output written to run.log
+    in the output data directory of the scenario. Returns the summary of the
+    run.
+
+    The shared demands (see shared_demand_arrays) are given as arrays, or as
+    the descriptor of the shared snapshot they are published in.
+    """
+
+    context = RunContext(project_name, scenario_name, settings)
+
+    if isinstance(shared_demands, SnapshotDescriptor):
+        shared_demands = attach(shared_demands)
+
+    context.shared_demands = shared_demands
+
+    path = (Path(__file__).resolve().parents[1] / "output_data" /
+            f"{project_name}" / f"{scenario_name}" / "run.log")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as log, redirect_stdout(log):
+        return run_scenario(context, refresh)
+
+
+def shared_demand_arrays(project_name, scenario_names, settings, refresh):
+    """
+    Returns the codes and the demand tensor of the neighbourhoods of the
+    project (see ProjectSnapshot.demand_tensor), or None if none of the
+    scenarios uses an allocation engine that reads them. The neighbourhoods
+    are built as load_data.py does with refresh, and loaded from the first
+    scenario otherwise.
+    """
+
+    if not any(settings.SCENARIOS[scenario_name].get('allocation_engine')
+               in ARRAY_ENGINES for scenario_name in scenario_names):
+        return None
+
+    if refresh:
+        with RunContext(project_name, None, settings).activate():
+            neighbourhoods = build_stock()
+            determine_preferences(neighbourhoods)
+            demands = demand_tensor(neighbourhoods)
+    else:
+        with RunContext(project_name, scenario_names[0],
+                        settings).activate():
+            neighbourhoods = load_neighbourhoods()
+            demands = demand_tensor(neighbourhoods)
+
+    return {'codes': np.array(list(neighbourhoods.keys())),
+            'demands': demands}
+
+
+def run_scenarios(project_name, scenario_names=None, refresh=False,
+                  processes=None, settings=None):
+    """
+    Run the scenarios of a project (all SCENARIOS by default) concurrently in
+    a pool of processes (or one after the other if processes is 1), from one
+    snapshot of the project settings (read from its config file by default).
+    Returns the summaries of the runs, in the order of the scenarios.
+    """
+
+    if settings is None:
+        settings = ProjectSettings(config.project_module(project_name))
+
+    # Each scenario is run once
+    scenario_names = list(dict.fromkeys(scenario_names or settings.SCENARIOS))
+
+    for scenario_name in scenario_names:
+        if scenario_name not in settings.SCENARIOS:
+            raise KeyError(f"Unknown scenario '{scenario_name}' in project "
+                           f"'{project_name}'")
+
+    if processes is None:
+        processes = min(len(scenario_names), os.cpu_count() or 1)
+
+    arguments = [(project_name, scenario_name, settings, refresh)
+                 for scenario_name in scenario_names]
+
+    arrays = shared_demand_arrays(project_name, scenario_names, settings,
+                                  refresh)
+
+    with (nullcontext() if arrays is None else
+          SharedSnapshot(arrays)) as shared:
+        if processes <= 1:
+            shared_demands = None if shared is None else shared.arrays
+
+            return [run_scenario_with_log(*argument, shared_demands)
+                    for argument in arguments]
+
+        # The processes attach to the shared snapshot by its descriptor
+        shared_demands = None if shared is None else shared.descriptor
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(run_scenario_with_log, *argument,
+                                       shared_demands)
+                       for argument in arguments]
+
+            return [future.result() for future in futures]
+
+
+def print_summary(summaries, columns=SUMMARY_COLUMNS):
+    """
+    Print the summaries of the runs (or other rows with the columns) as one
+    table
+    """
+
+    rows = [columns] + [[
+        summary[column] if isinstance(summary[column], (str, int)) else
+        '{:.4g}'.format(summary[column]) for column in columns
+    ] for summary in summaries]
+
+    widths = [max(len(str(row[index])) for row in rows)
+              for index in range(len(columns))]
+
+    print()
+    for row in rows:
+        print('  '.join(str(value).rjust(width)
+                        for value, width in zip(row, widths)))
+
+
+def main(args):
+    """
+    Run the scenarios given on the command line, see the module docstring
+    """
+
+    if not args:
+        print('The following arguments were expected: scenario_runner.py '
+              '<PROJECT> <optional: SCENARIOS> <optional: refresh>')
+        return
+
+    refresh = 'refresh' in args[1:]
+    scenario_names = [name for name in args[1:] if name != 'refresh'] or None
+
+    print_summary(run_scenarios(args[0], scenario_names, refresh))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,311 @@
+"""
+Server mode: keep the heat module of a project warm (loaded once, see
+HeatModule) and answer scenario requests over a local HTTP socket with JSON.
+
+Run python3 server.py <project_name> <optional: port> <optional: processes>
+and send requests to http://127.0.0.1:<port> (8050 by default):
+
+    GET  /scenarios  the scenarios of the project
+    POST /run        run a scenario, e.g.
+                     {"scenario": "scenario_1",
+                      "overrides": {"SCENARIO.renewable_gas_budget": 1.0E7,
+                                    "SCENARIO.ht_heat": "ht_sources.csv",
+                                    "SPECS.share_of_HT_heat": 0.8},
+                      "tables": ["neighbourhoods_output"]}
+                     returns the summary of the run and the requested result
+                     tables (as lists of records), see HeatModule.run
+    POST /reload     reload the config file and input data of the project
+
+The requests are accepted by an asyncio front end and run by a pool of
+worker processes (or a worker thread if processes is 1), which each keep
+their own loaded HeatModule. The responses of recent requests are cached, so
+repeated requests are answered without running the scenario again.
+"""
+
+# system modules
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import sys
+
+# project modules
+from DecisionTree import compiled_decision_trees
+from HeatModule import HeatModule
+from RunContext import ProjectSettings
+import config
+
+# Address of the server (local only)
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+
+# Number of responses the front end keeps
+RESPONSE_CACHE_SIZE = 128
+
+# Reasons of the HTTP status codes of the responses
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# The heat module of the current worker (process or thread)
+worker_module = None
+
+
+def initialise_worker(project_name, settings):
+    """
+    Load the heat module of the project in the current worker, forgetting
+    the decision trees compiled for the previous config file
+    """
+
+    global worker_module
+
+    compiled_decision_trees.clear()
+
+    with redirect_stdout(io.StringIO()):
+        worker_module = HeatModule(project_name, settings).load()
+
+
+def run_request(scenario_name, overrides, tables):
+    """
+    Run a scenario request in the current worker, returns the response body
+    """
+
+    with redirect_stdout(io.StringIO()):
+        results = worker_module.run(scenario_name, tables=tables,
+                                    overrides=overrides)
+
+    return ('{"summary": ' + json.dumps(results.summary, default=float) +
+            ', "tables": {' + ', '.join(
+                f'{json.dumps(name)}: {table.to_json(orient="records")}'
+                for name, table in results.tables.items()) + '}}').encode()
+
+
+class HeatModuleServer:
+    """
+    Class to describe the server of a project: the asyncio front end, the
+    pool of workers and the cache of responses
+    """
+
+    def __init__(self, project_name, processes=1):
+        self.project_name = project_name
+        self.processes = processes
+        self.settings = None
+        self.executor = None
+        self.generation = 0
+        self.responses = OrderedDict()
+
+
+    async def reload(self):
+        """
+        Reload the config file of the project and let the workers load the
+        heat module with it (after the requests they are running). The cached
+        responses are dropped, as they belong to the previous config file.
+        """
+
+        self.settings = ProjectSettings(
+            config.project_module(self.project_name,
+                                  reload=self.executor is not None))
+        self.generation += 1
+        self.responses.clear()
+
+        if self.processes > 1:
+            # Start a new pool, the old one finishes its requests
+            previous = self.executor
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes, initializer=initialise_worker,
+                initargs=(self.project_name, self.settings))
+
+            if previous is not None:
+                previous.shutdown(wait=False)
+
+            await self.warm_up()
+
+        else:
+            # A single worker thread, as the modules get the current project
+            # from config: reload in the worker thread after its requests
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, initialise_worker, self.project_name,
+                self.settings)
+
+
+    async def warm_up(self):
+        """
+        Wait for the workers to load the heat module
+        """
+
+        loop = asyncio.get_running_loop()
+
+        await asyncio.gather(*[
+            loop.run_in_executor(self.executor, os.getpid)
+            for _ in range(self.processes)
+        ])
+
+
+    async def handle_request(self, method, path, body):
+        """
+        Returns the status and body of the response to a request
+        """
+
+        if path == '/scenarios':
+            if method != 'GET':
+                return 405, {'error': 'Use GET'}
+
+            return 200, {'scenarios': list(self.settings.SCENARIOS)}
+
+        if path == '/reload':
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}
+
+            await self.reload()
+
+            return 200, {'reloaded': self.project_name}
+
+        if path != '/run':
+            return 404, {'error': f'Unknown path {path}'}
+
+        if method != 'POST':
+            return 405, {'error': 'Use POST'}
+
+        try:
+            request = json.loads(body or b'{}')
+            scenario_name = request['scenario']
+            overrides = request.get('overrides', {})
+            tables = request.get('tables', [])
+
+        except (ValueError, KeyError, TypeError):
+            return 400, {'error': 'Expected a JSON object with a scenario, '
+                                  'and optionally overrides and tables'}
+
+        if scenario_name not in self.settings.SCENARIOS:
+            return 400, {'error': f"Unknown scenario '{scenario_name}'"}
+
+        key = json.dumps([scenario_name, overrides, tables], sort_keys=True)
+
+        if key in self.responses:
+            self.responses.move_to_end(key)
+
+            return 200, self.responses[key]
+
+        generation = self.generation
+
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(
+                self.executor, run_request, scenario_name, overrides, tables)
+
+        except (KeyError, ValueError, OSError) as error:
+            # Unknown settings or tables, or missing input files
+            return 400, {'error': str(error).strip('"')}
+
+        # Do not cache the responses of a heat module that has been reloaded
+        if generation == self.generation:
+            self.responses[key] = response
+
+            if len(self.responses) > RESPONSE_CACHE_SIZE:
+                self.responses.popitem(last=False)
+
+        return 200, response
+
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answer the HTTP requests on a connection (kept alive unless the
+        client closes it)
+        """
+
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line.strip():
+                    break
+
+                method, path, version = request_line.decode().split()
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(
+                    int(headers.get('content-length', 0)))
+
+                try:
+                    status, response = await self.handle_request(
+                        method, path.split('?')[0], body)
+
+                except Exception as error:
+                    status, response = 500, {'error': repr(error)}
+
+                if not isinstance(response, bytes):
+                    response = json.dumps(response).encode()
+
+                keep_alive = (headers.get('connection', '').lower() !=
+                              'close' and version == 'HTTP/1.1')
+
+                writer.write(
+                    (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                     'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(response)}\r\n'
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}"
+                     '\r\n\r\n').encode() + response)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+
+        except (ValueError, asyncio.IncompleteReadError,
+                ConnectionResetError):
+            pass
+
+        finally:
+            writer.close()
+
+
+    async def serve(self, port=DEFAULT_PORT):
+        """
+        Serve requests on the local port until interrupted
+        """
+
+        print(f'Loading {self.project_name}..')
+        await self.reload()
+
+        server = await asyncio.start_server(self.handle_connection, HOST,
+                                            port)
+
+        print(f'Serving {self.project_name} on http://{HOST}:{port}')
+
+        async with server:
+            await server.serve_forever()
+
+
+def main(args):
+    """
+    Run the server given on the command line, see the module docstring
+    """
+
+    if not 1 <= len(args) <= 3:
+        print('The following arguments were expected: server.py <PROJECT> '
+              '<optional: PORT> <optional: PROCESSES>')
+        return
+
+    port = int(args[1]) if len(args) > 1 else DEFAULT_PORT
+    processes = int(args[2]) if len(args) > 2 else 1
+
+    try:
+        asyncio.run(HeatModuleServer(args[0], processes).serve(port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,318 @@
+"""
+Strategies to select a heat source for a neighbourhood among its candidate heat
+sources (the sources in range, sorted by distance; see CandidateIndex):
+
+- nearest: the closest source with sufficient remaining heat (default)
+- best_fit: the source with the smallest sufficient remaining heat
+- largest_remaining: the source with the largest remaining heat
+- distance_capped: the closest source with sufficient remaining heat within
+  the maximum distance ('max_source_distance' in the scenario, in m)
+
+Ties are broken by distance. The strategy is selected per scenario with
+'source_selection'.
+
+The remaining heat of the candidates is kept in a capacity index shared by all
+neighbourhoods: a segment tree with the largest remaining heat over the
+candidate lists of all neighbourhoods (the candidates of a neighbourhood are a
+range of its leaves), which is updated when heat is assigned. A source is
+selected in logarithmic time in the number of candidates (best_fit only visits
+the subtrees that hold a source with sufficient remaining heat).
+"""
+
+# external modules
+import numpy as np
+
+# project modules
+from compilation import jit
+import config
+
+STRATEGIES = ['nearest', 'best_fit', 'largest_remaining', 'distance_capped']
+NEAREST, BEST_FIT, LARGEST_REMAINING, DISTANCE_CAPPED = range(len(STRATEGIES))
+
+
+def source_selection_of_scenario():
+    """
+    Returns the source selection strategy (index in STRATEGIES) and the
+    maximum distance to a heat source of the current scenario
+    """
+
+    scenario = config.current_project.current_scenario
+    strategy = scenario.get('source_selection', 'nearest')
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown source selection strategy '{strategy}', "
+                         f"choose one of {STRATEGIES}")
+
+    return (STRATEGIES.index(strategy),
+            float(scenario.get('max_source_distance', np.inf)))
+
+
+@jit
+def select_candidate(remaining_heat, distances, demand, strategy,
+                     max_distance):
+    """
+    Returns the position of the selected candidate heat source, i.e. with more
+    remaining heat than the demand, or -1 if there is none. The candidates are
+    sorted by distance.
+    """
+
+    number_of_candidates = len(remaining_heat)
+
+    # Only the candidates up to the maximum distance are considered
+    if strategy == DISTANCE_CAPPED:
+        number_of_candidates = np.searchsorted(distances, max_distance,
+                                               side='right')
+
+    selected = -1
+
+    for position in range(number_of_candidates):
+        if not remaining_heat[position] > demand:
+            continue
+
+        if strategy == NEAREST or strategy == DISTANCE_CAPPED:
+            return position
+
+        if (selected < 0 or
+                (strategy == BEST_FIT and
+                 remaining_heat[position] < remaining_heat[selected]) or
+                (strategy == LARGEST_REMAINING and
+                 remaining_heat[position] > remaining_heat[selected])):
+            selected = position
+
+    return selected
+
+
+@jit
+def capacity_index(indices, number_of_sources, remaining_heat):
+    """
+    Returns the capacity index of the candidate lists (see CandidateIndex):
+    the segment tree with the largest remaining heat, of which the leaves are
+    the candidates in the order of indices, and the positions of the
+    candidates of each heat source (as compressed sparse rows) to update it
+    """
+
+    number_of_candidates = len(indices)
+    size = 1
+
+    while size < number_of_candidates:
+        size *= 2
+
+    tree = np.full(2 * size, -np.inf)
+
+    for position in range(number_of_candidates):
+        tree[size + position] = remaining_heat[indices[position]]
+
+    for node in range(size - 1, 0, -1):
+        tree[node] = max(tree[2 * node], tree[2 * node + 1])
+
+    # The candidates per heat source (a counting sort of the positions)
+    source_indptr = np.zeros(number_of_sources + 1, dtype=np.int64)
+
+    for position in range(number_of_candidates):
+        source_indptr[indices[position] + 1] += 1
+
+    for source in range(number_of_sources):
+        source_indptr[source + 1] += source_indptr[source]
+
+    source_positions = np.empty(number_of_candidates, dtype=np.int64)
+    next_position = source_indptr[:-1].copy()
+
+    for position in range(number_of_candidates):
+        source = indices[position]
+        source_positions[next_position[source]] = position
+        next_position[source] += 1
+
+    return tree, source_indptr, source_positions
+
+
+@jit
+def update_capacity(tree, source_indptr, source_positions, source,
+                    remaining_heat):
+    """
+    Set the remaining heat of the heat source in the capacity index
+    """
+
+    size = len(tree) // 2
+
+    for position in source_positions[source_indptr[source]:
+                                     source_indptr[source + 1]]:
+        node = size + position
+        tree[node] = remaining_heat
+        node //= 2
+
+        # The nodes above are unchanged once a node is
+        while node >= 1:
+            largest = max(tree[2 * node], tree[2 * node + 1])
+
+            if tree[node] == largest:
+                break
+
+            tree[node] = largest
+            node //= 2
+
+
+@jit
+def covering_nodes(size, start, end):
+    """
+    Returns the nodes of the segment tree (with size leaves) that cover the
+    leaves start:end, from left to right
+    """
+
+    left = np.empty(64, dtype=np.int64)
+    right = np.empty(64, dtype=np.int64)
+    number_of_left = 0
+    number_of_right = 0
+
+    start += size
+    end += size
+
+    while start < end:
+        if start & 1:
+            left[number_of_left] = start
+            number_of_left += 1
+            start += 1
+
+        if end & 1:
+            end -= 1
+            right[number_of_right] = end
+            number_of_right += 1
+
+        start //= 2
+        end //= 2
+
+    nodes = np.empty(number_of_left + number_of_right, dtype=np.int64)
+    nodes[:number_of_left] = left[:number_of_left]
+
+    for number in range(number_of_right):
+        nodes[number_of_left + number] = right[number_of_right - 1 - number]
+
+    return nodes
+
+
+@jit
+def first_leaf(tree, nodes, threshold, inclusive):
+    """
+    Returns the first leaf under the nodes (from left to right) with more
+    remaining heat than the threshold (or as much if inclusive), or -1
+    """
+
+    size = len(tree) // 2
+
+    for node in nodes:
+        if not (tree[node] > threshold or
+                (inclusive and tree[node] == threshold)):
+            continue
+
+        while node < size:
+            node *= 2
+
+            if not (tree[node] > threshold or
+                    (inclusive and tree[node] == threshold)):
+                node += 1
+
+        return node - size
+
+    return -1
+
+
+@jit
+def smallest_leaf(tree, nodes, threshold):
+    """
+    Returns the first leaf under the nodes with the smallest remaining heat
+    that is more than the threshold, or -1
+    """
+
+    size = len(tree) // 2
+    stack = np.empty(len(nodes) + 2 * 64, dtype=np.int64)
+    top = 0
+
+    for number in range(len(nodes) - 1, -1, -1):
+        stack[top] = nodes[number]
+        top += 1
+
+    selected = -1
+
+    while top > 0:
+        top -= 1
+        node = stack[top]
+
+        if not tree[node] > threshold:
+            continue
+
+        if node >= size:
+            if selected < 0 or tree[node] < tree[size + selected]:
+                selected = node - size
+
+            continue
+
+        # The left child first
+        stack[top] = 2 * node + 1
+        stack[top + 1] = 2 * node
+        top += 2
+
+    return selected
+
+
+@jit
+def select_from_capacity_index(tree, start, end, distances, demand, strategy,
+                               max_distance):
+    """
+    Returns the position of the selected candidate heat source among the
+    candidates start:end (of a neighbourhood, sorted by distance) in the
+    capacity index, as select_candidate, or -1 if there is none
+    """
+
+    # Only the candidates up to the maximum distance are considered
+    if strategy == DISTANCE_CAPPED:
+        end = start + np.searchsorted(distances[start:end], max_distance,
+                                      side='right')
+
+    nodes = covering_nodes(len(tree) // 2, start, end)
+
+    if strategy == NEAREST or strategy == DISTANCE_CAPPED:
+        leaf = first_leaf(tree, nodes, demand, False)
+
+    elif strategy == LARGEST_REMAINING:
+        largest = -np.inf
+
+        for node in nodes:
+            largest = max(largest, tree[node])
+
+        if not largest > demand:
+            return -1
+
+        leaf = first_leaf(tree, nodes, largest, True)
+
+    else:
+        leaf = smallest_leaf(tree, nodes, demand)
+
+    if leaf < 0:
+        return -1
+
+    return leaf - start
+
+
+@jit
+def claim_source(indptr, indices, distances, available_heat, used_heat, tree,
+                 source_indptr, source_positions, neighbourhood, demand,
+                 strategy, max_distance):
+    """
+    Selects a candidate heat source of the neighbourhood (in the candidate
+    index, with the capacity index of its candidates) and claims the demand.
+    Returns the index of the source, or -1 if there is none.
+    """
+
+    start = indptr[neighbourhood]
+    position = select_from_capacity_index(
+        tree, start, indptr[neighbourhood + 1], distances, demand, strategy,
+        max_distance)
+
+    if position < 0:
+        return -1
+
+    source = indices[start + position]
+    used_heat[source] += demand
+    update_capacity(tree, source_indptr, source_positions, source,
+                    available_heat[source] - used_heat[source])
+
+    return source
@@ -0,0 +1,329 @@
+"""
+Parameter sweeps: run the allocation for every point of a grid of parameter
+values, e.g. renewable_gas_budget x share_of_HT_heat x
+lt_eligibility_threshold, and collect the results in one table.
+
+A sweep is defined in a JSON file (in the input data directory of the project,
+or any path), with a list of values per parameter (named as in the Monte Carlo
+mode, see monte_carlo.point_estimate):
+
+    {
+        "parameters": {
+            "SCENARIO.renewable_gas_budget": [1.0E7, 2.0E7, 3.0E7],
+            "SPECS.share_of_HT_heat": [0.7, 0.8, 0.9],
+            "ASSUMPTIONS.lt_eligibility_threshold": [0.3, 0.5, 0.7]
+        }
+    }
+
+Each parameter affects a stage of the allocation (see
+monte_carlo.stage_of_parameter): the preferences, the demands, or only the
+allocation itself (the shares of residual heat, the maximum distance to a
+heat source and the gas budget). The grid points are grouped by their values
+of the preference and demand parameters, so each preference and demand stage
+is computed once per group and reused for all allocations in it. The groups
+are run on a local pool of worker processes that share the project arrays
+(see SharedSnapshot).
+
+Run python3 sweep.py <project_name> <scenario_name> <sweep_file> after
+load_data.py to write sweep_results to the output data directory of the
+scenario: one row per grid point with its parameter values, the number of
+neighbourhoods, houses and m2 of utility per assigned heating option, and the
+used renewable gas and residual heat.
+"""
+
+# system modules
+from collections import Counter, OrderedDict
+import itertools
+import json
+import os
+import sys
+from pathlib import Path
+import uuid
+
+# external modules
+import numpy as np
+
+# project modules
+from allocation_kernel import residual_heat_shares, run_kernel
+from DecisionTree import OPTIONS, decision_tree_of_project
+from main import load_ht_sources, load_lt_sources, load_neighbourhoods
+from monte_carlo import (DEMAND_PARAMETERS, FIXED_KERNEL_ARRAYS,
+                         PREFERENCE_PARAMETERS, base_arrays, demand_stage,
+                         iteration_orders_of, point_estimate,
+                         preference_stage, stage_of_parameter)
+from ProjectSnapshot import HEAT_TEMPERATURES
+from RunContext import RunContext
+from SharedSnapshot import SharedSnapshot, map_on_snapshot
+from source_selection import source_selection_of_scenario
+from table_export import write_table
+import config
+
+# Number of preference and demand stages a worker keeps
+STAGE_CACHE_SIZE = 8
+
+# Stages computed by the current (worker) process, by sweep, stage and values
+stage_cache = OrderedDict()
+
+
+def read_sweep(sweep_file):
+    """
+    Returns the values per parameter of a sweep file (a path, or a file in
+    the input data directory of the project)
+    """
+
+    path = Path(sweep_file)
+
+    if not path.exists():
+        path = (Path(__file__).resolve().parents[1] / "input_data" /
+                f"{config.current_project_name}" / sweep_file)
+
+    with open(path) as input:
+        parameters = json.load(input)['parameters']
+
+    for name, values in parameters.items():
+        if stage_of_parameter(name) is None:
+            raise ValueError(f"The parameter '{name}' does not affect the "
+                             "assigned heating options, choose one of the "
+                             "preferences, demands, allocation or gas budget")
+
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"The values of '{name}' should be a non-empty "
+                             "list")
+
+    return parameters
+
+
+def grid_points(parameters):
+    """
+    Returns the points of the grid of the parameters (the values by name)
+    """
+
+    names = list(parameters.keys())
+
+    return [dict(zip(names, values))
+            for values in itertools.product(*parameters.values())]
+
+
+def stage_values(point, names):
+    """
+    Returns the values of the parameters of a stage at a grid point, as
+    arrays of one draw (see monte_carlo.parameter_values)
+    """
+
+    return {
+        name: np.array([float(point.get(name, point_estimate(name)))])
+        for name in names
+    }
+
+
+def cached_stage(key, compute):
+    """
+    Returns the stage with the key from the stage cache of the process, or
+    computes it
+    """
+
+    if key not in stage_cache:
+        if len(stage_cache) >= STAGE_CACHE_SIZE:
+            stage_cache.popitem(last=False)
+
+        stage_cache[key] = compute()
+
+    stage_cache.move_to_end(key)
+
+    return stage_cache[key]
+
+
+def run_allocations(arrays, sweep, preference_values, demand_values,
+                    allocations, strategy):
+    """
+    Run the allocations (the shares of residual heat, gas budget, used gas
+    and maximum distance to a heat source of each grid point) on the
+    preference and demand stages of a group of grid points. The stages are
+    computed once per process. Returns the results of each allocation and the
+    stages that have been computed (not taken from the stage cache).
+    """
+
+    preference_key = (sweep, 'preferences', tuple(preference_values.items()))
+    demand_key = (sweep, 'demands', tuple(demand_values.items()))
+    computed = [stage for stage, key in [('preferences', preference_key),
+                                         ('demands', demand_key)]
+                if key not in stage_cache]
+
+    (preference_options, preference_values, undecided, lt_elegible,
+     force_heat_network) = cached_stage(
+         preference_key,
+         lambda: preference_stage(arrays, {
+             name: np.array([value])
+             for name, value in preference_values.items()
+         }))
+    demands = cached_stage(
+        demand_key,
+        lambda: demand_stage(arrays, {
+            name: np.array([value])
+            for name, value in demand_values.items()
+        }))
+
+    kernel_arrays = {
+        **{name: arrays[name] for name in FIXED_KERNEL_ARRAYS},
+        'orders': iteration_orders_of(preference_values[0]),
+        'undecided': undecided[0],
+        'preference_options': preference_options[0],
+        'lt_elegible': lt_elegible[0],
+        'force_heat_network': force_heat_network[0],
+        'demands': demands[0]
+    }
+
+    results = []
+
+    for shares, renewable_gas_budget, used_renewable_gas, max_distance in \
+            allocations:
+        (options, _, _, _, _, used_renewable_gas), used_heat = run_kernel(
+            {**kernel_arrays, 'shares': shares}, strategy, max_distance,
+            renewable_gas_budget, used_renewable_gas)
+
+        assigned = options >= 0
+        result = {}
+
+        for name, weights in [('neighbourhoods', None),
+                              ('houses', arrays['number_of_houses']),
+                              ('m2_of_utility', arrays['m2_of_utility'])]:
+            totals = np.bincount(
+                options[assigned], minlength=len(OPTIONS),
+                weights=None if weights is None else weights[assigned])
+
+            for index, option in enumerate(OPTIONS):
+                result[f'{name}_{option}'] = (int(totals[index])
+                                              if weights is None else
+                                              float(totals[index]))
+
+        result['used_renewable_gas'] = float(used_renewable_gas)
+
+        for heat_temperature in HEAT_TEMPERATURES:
+            result[f'used_{heat_temperature}_heat'] = float(
+                used_heat[heat_temperature].sum())
+
+        results.append(result)
+
+    return results, computed
+
+
+def run_sweep(neighbourhoods, heat_sources, parameters, processes=None):
+    """
+    Run the allocation for each point of the grid of the parameters, in a
+    pool of worker processes. Returns a row per grid point with its
+    parameter values and results.
+    """
+
+    points = grid_points(parameters)
+    decision_tree = decision_tree_of_project()
+    strategy, max_distance = source_selection_of_scenario()
+    scenario = config.current_project.current_scenario
+
+    # Group the grid points by the values of their preference and demand
+    # stages
+    groups = {}
+
+    for index, point in enumerate(points):
+        preference_values = {
+            name: value[0] for name, value in stage_values(
+                point, PREFERENCE_PARAMETERS).items()
+        }
+        demand_values = {
+            name: value[0] for name, value in stage_values(
+                point, DEMAND_PARAMETERS).items()
+        }
+        specs = {
+            **config.current_project.SPECS,
+            **{name.split('.', 1)[1]: value for name, value in point.items()
+               if name.startswith('SPECS.')}
+        }
+        allocation = (residual_heat_shares(decision_tree, specs),
+                      float(point.get('SCENARIO.renewable_gas_budget',
+                                      scenario['renewable_gas_budget'])),
+                      float(scenario['used_renewable_gas']),
+                      float(point.get('SCENARIO.max_source_distance',
+                                      max_distance)))
+
+        key = (tuple(preference_values.values()),
+               tuple(demand_values.values()))
+        groups.setdefault(key, (preference_values, demand_values, []))[
+            2].append((index, allocation))
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    # Split the groups into jobs, so that there are enough jobs for the
+    # workers (the jobs of a group reuse the stages of the group if they are
+    # run by the same worker)
+    jobs_per_group = max(1, -(-2 * processes // len(groups)))
+    jobs = []
+
+    for preference_values, demand_values, allocations in groups.values():
+        for chunk in np.array_split(np.arange(len(allocations)),
+                                    min(jobs_per_group, len(allocations))):
+            jobs.append((preference_values, demand_values,
+                         [allocations[position] for position in chunk]))
+
+    print(f'\nRunning {len(points)} grid points: '
+          f'{len({key[0] for key in groups})} different preference stages, '
+          f'{len({key[1] for key in groups})} different demand stages and '
+          f'{len(points)} allocations in {len(jobs)} jobs..')
+
+    sweep = uuid.uuid4().hex
+
+    with SharedSnapshot(base_arrays(neighbourhoods, heat_sources)) as shared:
+        results = map_on_snapshot(run_allocations, shared, [
+            (sweep, preference_values, demand_values,
+             [allocation for _, allocation in allocations], strategy)
+            for preference_values, demand_values, allocations in jobs
+        ], processes)
+
+    # A stage is computed once per worker that runs a job of its group
+    computed = Counter(stage for _, job_computed in results
+                       for stage in job_computed)
+    print(f"Computed {computed['preferences']} preference stages and "
+          f"{computed['demands']} demand stages")
+
+    rows = [None] * len(points)
+
+    for (_, _, allocations), (job_results, _) in zip(jobs, results):
+        for (index, _), result in zip(allocations, job_results):
+            rows[index] = {'grid_point': index, **points[index], **result}
+
+    return rows
+
+
+def export_sweep_results(rows):
+    """
+    Export the results of the grid points to sweep_results
+    """
+
+    write_table({
+        name: [row[name] for row in rows] for name in rows[0]
+    }, "sweep_results")
+
+
+def main(args):
+    """
+    Run the sweep given on the command line, see the module docstring
+    """
+
+    if len(args) != 3:
+        print('The following arguments were expected: sweep.py <PROJECT> '
+              '<SCENARIO> <SWEEP_FILE>')
+        return
+
+    with RunContext(args[0], args[1]).activate():
+        parameters = read_sweep(args[2])
+
+        neighbourhoods = load_neighbourhoods()
+        heat_sources = {'HT': load_ht_sources(), 'LT': load_lt_sources()}
+
+        export_sweep_results(run_sweep(neighbourhoods, heat_sources,
+                                       parameters))
+
+        print('Done!')
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
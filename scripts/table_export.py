@@ -0,0 +1,197 @@
+"""
+Columnar export of result tables. A table is built from records (dictionaries)
+into typed columns, flattening nested attributes (e.g. the housing stock
+matrix becomes a column per housing type, construction year and property),
+and written in a single call as CSV, Parquet or Arrow IPC.
+
+The format is set per scenario with 'output_format' ('csv' (default),
+'parquet' or 'arrow') and 'output_compression' (e.g. 'zstd'). Parquet and
+Arrow IPC require PyArrow (an optional dependency).
+"""
+
+# external modules
+import math
+import numpy as np
+import pandas as pd
+
+# project modules
+import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Compression per output format (and the file extension of compressed CSV)
+COMPRESSIONS = {
+    'csv': {'zstd': '.zst', 'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'},
+    'parquet': {'zstd': '', 'gzip': '', 'snappy': '', 'brotli': '', 'lz4': ''},
+    'arrow': {'zstd': '', 'lz4': ''}
+}
+
+# Lists of numbers that are flattened into named columns
+NAMED_LIST_COLUMNS = {'geo_coordinate': ['x', 'y']}
+
+
+def output_format_of_scenario(context=None):
+    """
+    Returns the output format and compression (or None) of the scenario of the
+    run context (or the current one)
+    """
+
+    scenario = config.context_of_run(context).scenario
+    output_format = scenario.get('output_format', 'csv')
+    compression = scenario.get('output_compression')
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', choose one "
+                         f"of {list(OUTPUT_FORMATS)}")
+
+    if compression is not None and compression not in COMPRESSIONS[
+            output_format]:
+        raise ValueError(f"Unknown compression '{compression}' for output "
+                         f"format '{output_format}', choose one of "
+                         f"{list(COMPRESSIONS[output_format])}")
+
+    return output_format, compression
+
+
+def flatten(attributes, prefix=''):
+    """
+    Returns the attributes as a flat dictionary of scalars: nested
+    dictionaries (and lists of (key, value) pairs) get a column per key
+    ('<attribute>.<key>'), lists of numbers a column per element, and other
+    lists are joined into a comma separated string
+    """
+
+    flat = {}
+
+    for key, value in attributes.items():
+        name = f'{prefix}{key}'
+
+        if isinstance(value, (list, tuple)) and value and all(
+                isinstance(item, tuple) and len(item) == 2 and
+                isinstance(item[0], str) for item in value):
+            value = dict(value)
+
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+
+        elif isinstance(value, (list, tuple)):
+            if value and all(is_number(item) for item in value):
+                suffixes = NAMED_LIST_COLUMNS.get(key, range(len(value)))
+
+                for suffix, item in zip(suffixes, value):
+                    flat[f'{name}_{suffix}'] = item
+            else:
+                flat[name] = ','.join(str(item) for item in value)
+
+        else:
+            flat[name] = value
+
+    return flat
+
+
+def is_number(value):
+    return (isinstance(value, (int, float, np.integer, np.floating)) and
+            not isinstance(value, (bool, np.bool_)))
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def typed_column(values):
+    """
+    Returns the values as a typed column: booleans, integers, floats or
+    strings (values of mixed types are converted to strings). Missing values
+    (None) are kept as missing values.
+    """
+
+    present = [value for value in values if not is_missing(value)]
+    complete = len(present) == len(values)
+
+    if present and all(isinstance(value, (bool, np.bool_))
+                       for value in present):
+        return pd.array(values, dtype='bool' if complete else 'boolean')
+
+    if all(is_number(value) for value in present):
+        if present and complete and all(
+                isinstance(value, (int, np.integer)) for value in present):
+            return np.array(values, dtype=np.int64)
+
+        return np.array([np.nan if is_missing(value) else value
+                         for value in values], dtype=float)
+
+    if all(isinstance(value, str) for value in present):
+        return np.array(values, dtype=object)
+
+    return np.array([None if is_missing(value) else str(value)
+                     for value in values], dtype=object)
+
+
+def table_of_records(records, columns=None):
+    """
+    Returns the typed columns of the records (flattened): the given columns
+    (e.g. of a table without records), or all columns ordered by their first
+    occurrence
+    """
+
+    records = [flatten(record) for record in records]
+    names = columns or list(dict.fromkeys(name for record in records
+                                          for name in record))
+
+    return pd.DataFrame({
+        name: typed_column([record.get(name) for record in records])
+        for name in names
+    })
+
+
+def write_table(table, name, output_format=None, compression=None,
+                context=None):
+    """
+    Write the table (a DataFrame, or a dictionary of columns) to the output
+    data directory of the scenario of the run context (or the current one) in
+    the output format of the scenario (or the given output format), returns
+    the path
+    """
+
+    context = config.context_of_run(context)
+
+    if output_format is None:
+        output_format, compression = output_format_of_scenario(context)
+
+    if not isinstance(table, pd.DataFrame):
+        table = pd.DataFrame(table)
+
+    path = (context.output_directory() /
+            f"{name}{OUTPUT_FORMATS[output_format]}")
+
+    if output_format == 'csv':
+        if compression is not None:
+            path = path.with_name(path.name +
+                                  COMPRESSIONS['csv'][compression])
+
+        table.to_csv(path, index=False, compression=compression)
+
+        return path
+
+    if pa is None:
+        raise ImportError(f"The output format '{output_format}' requires "
+                          "PyArrow, install it with: pip install pyarrow")
+
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+
+    if output_format == 'parquet':
+        pq.write_table(arrow_table, path, compression=compression or 'none')
+    else:
+        with pa.OSFile(str(path), 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema,
+                                 options=pa.ipc.IpcWriteOptions(
+                                     compression=compression)) as writer:
+                writer.write_table(arrow_table)
+
+    return path
@@ -0,0 +1,415 @@
+"""
+Tiled mode: load and allocate a large (e.g. national) project with bounded
+memory. Instead of loading the stock of all neighbourhoods at once (see
+load_data.py), the neighbourhoods are loaded per tile: the neighbourhoods of
+whole municipalities, up to TILE_SIZE neighbourhoods (a larger municipality is
+split over several tiles). The stock and property inputs of a tile are
+streamed from the CSV files, its neighbourhoods are built and their
+preferences determined, and only their compact arrays (the preferences, flags,
+demand tensor and candidate heat sources, see ProjectSnapshot) are kept
+before the next tile is loaded. The peak memory is thereby set by the tile
+size (TILE_SIZE in the config file, 1000 neighbourhoods by default).
+
+The heat sources are mapped to all neighbourhoods at once, from their codes,
+municipalities and adjacent neighbourhoods only. The allocation is run on the
+arrays of all neighbourhoods with the allocation kernel, which gives the same
+heating options and heat sources as the decision trees.
+
+The decisions of the kernel are then replayed per tile: the neighbourhoods of
+the tile are loaded again and their demands are added to a bookkeeper of the
+tile (in a pool of processes if given, each holding one tile at a time). The
+bookkeepers of the tiles are merged (see Bookkeeper.merge_bookkeepers), so the
+totals do not depend on the tiles or the number of processes. The heat is
+assigned to the heat sources in the order of assignment of all
+neighbourhoods, as in main.py.
+
+Run python3 tiled.py <project_name> <scenario_name> <optional: processes>
+(without load_data.py) to write the standard result tables of main.py
+(neighbourhoods_output, HT_sources_output, LT_sources_output, demands, and the
+regional demands and assignments) to the output data directory of the scenario, and run the
+checks on the results (see verification).
+"""
+
+# system modules
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
+import sys
+from types import SimpleNamespace
+
+# external modules
+import numpy as np
+
+# project modules
+from allocation_kernel import (assign_heat_source, kernel_arrays,
+                               replay_assignments, run_kernel)
+from Bookkeeper import Bookkeeper, merge_bookkeepers
+from DecisionTree import OPTIONS, ROUTES, decision_tree_of_project
+from load_data import (build_stock, determine_preferences, map_heat_sources,
+                       read_data, set_attributes)
+from main import (add_electricity_demand_of_appliances,
+                  export_heat_source_results_to_csv,
+                  neighbourhood_result_records)
+from ProjectSnapshot import HEAT_TEMPERATURES, ProjectSnapshot
+from regions import export_regional_assignments_to_csv, region_mappings
+from ResultCache import output_directory
+from RunContext import RunContext
+from source_selection import source_selection_of_scenario
+from table_export import table_of_records, write_table
+from verification import (check_present_demands, print_verification,
+                          verify_sources)
+import config
+
+# Number of neighbourhoods per tile if the project does not set TILE_SIZE
+DEFAULT_TILE_SIZE = 1000
+
+# Columns of the input data needed to form the tiles, map the heat sources
+# and name the regions
+INDEX_COLUMNS = ['neighbourhood_code', 'municipality_code',
+                 'municipality_name', 'adjacent_neighbourhoods']
+
+
+def index_of_neighbourhoods():
+    """
+    Returns the neighbourhoods (in the order of the list of neighbourhoods)
+    as light objects with only their code, municipality and adjacent
+    neighbourhoods, read without the rest of the input data
+    """
+
+    csvs = config.current_project.NEIGHBOURHOOD_CSVS
+
+    neighbourhoods = {
+        code: SimpleNamespace(code=code) for code in read_data(
+            csvs['list'], columns=['neighbourhood_code'])['neighbourhood_code']
+    }
+
+    for csv in csvs['properties']:
+        for row in read_data(csv, columns=INDEX_COLUMNS).to_dict(
+                orient='records'):
+            if row['neighbourhood_code'] in neighbourhoods:
+                vars(neighbourhoods[row.pop('neighbourhood_code')]).update(
+                    row)
+
+    return neighbourhoods
+
+
+def tiles_of(neighbourhoods, tile_size):
+    """
+    Returns the codes of the neighbourhoods per tile: the neighbourhoods of
+    whole municipalities, up to tile_size neighbourhoods (the neighbourhoods
+    of a larger municipality, or without a municipality, are split over
+    tiles)
+    """
+
+    municipalities = {}
+
+    for code, neighbourhood in neighbourhoods.items():
+        municipality = getattr(neighbourhood, 'municipality_code', None)
+        municipalities.setdefault(
+            municipality if isinstance(municipality, str) else None,
+            []).append(code)
+
+    tiles = [[]]
+
+    for codes in municipalities.values():
+        for start in range(0, len(codes), tile_size):
+            part = codes[start:start + tile_size]
+
+            if len(tiles[-1]) + len(part) > tile_size:
+                tiles.append([])
+
+            tiles[-1].extend(part)
+
+    return [tile for tile in tiles if tile]
+
+
+def neighbourhoods_of_tile(codes, sources):
+    """
+    Returns the neighbourhoods of a tile: their stock and preferences, with
+    the heat sources mapped to them (sources, see load_data.map_heat_sources)
+    """
+
+    neighbourhoods = build_stock(codes)
+    determine_preferences(neighbourhoods)
+    set_attributes(neighbourhoods, sources)
+
+    return neighbourhoods
+
+
+def tiled_snapshot(neighbourhoods, tiles, sources, heat_sources):
+    """
+    Returns the snapshot of all neighbourhoods of the current project (see
+    ProjectSnapshot), loaded tile by tile
+    """
+
+    positions = {code: position
+                 for position, code in enumerate(neighbourhoods)}
+    decision_tree = decision_tree_of_project()
+    snapshots = []
+
+    for number, codes in enumerate(tiles):
+        print(f'\nTILE {number + 1}/{len(tiles)}: {len(codes)} '
+              'neighbourhoods')
+
+        snapshot = ProjectSnapshot(neighbourhoods_of_tile(codes, sources),
+                                   heat_sources, decision_tree=decision_tree)
+        snapshots.append((np.array([positions[code]
+                                    for code in snapshot.codes],
+                                   dtype=np.int64), snapshot))
+
+    return ProjectSnapshot.of_tiles(snapshots, neighbourhoods.keys())
+
+
+def run_tiled(snapshot):
+    """
+    Assign the heating options to the neighbourhoods of the snapshot with the
+    allocation kernel. Returns the results of the kernel (see
+    allocation_kernel.allocate) and the used heat per heat temperature.
+    """
+
+    scenario = config.current_project.current_scenario
+    strategy, max_distance = source_selection_of_scenario()
+
+    return run_kernel(kernel_arrays(snapshot), strategy, max_distance,
+                      scenario['renewable_gas_budget'],
+                      scenario['used_renewable_gas'])
+
+
+def replay_tile(codes, sources, heat_sources, regions, options, routes,
+                source_indices, stages, events):
+    """
+    Replay the decisions of the kernel on the neighbourhoods of a tile (with
+    the codes, loaded again): the options, routes, source indices and stages
+    of the neighbourhoods in the order of the codes, and the neighbourhoods
+    (their positions in the codes) in order of assignment. Returns the
+    bookkeeper of the tile, and per neighbourhood (in the order of the codes)
+    its result record (see main.neighbourhood_result_records), the keys of
+    main.allocate to sort it and its present heat demand.
+    """
+
+    neighbourhoods = neighbourhoods_of_tile(codes, sources)
+    snapshot = ProjectSnapshot(neighbourhoods, heat_sources)
+    bookkeeper = Bookkeeper(neighbourhoods.keys(), regions)
+
+    # Positions of the neighbourhoods of the codes in the snapshot
+    positions = np.array([snapshot.index[code] for code in codes],
+                         dtype=np.int64)
+    arrays = []
+
+    for values in [options, routes, source_indices, stages]:
+        array = np.empty_like(values)
+        array[positions] = values
+        arrays.append(array)
+
+    # The heat of all tiles is assigned to the heat sources in the order of
+    # assignment afterwards (see assign_heat_sources), so the tile assigns it
+    # to a copy of them
+    replay_assignments(snapshot, neighbourhoods,
+                       pickle.loads(pickle.dumps(heat_sources,
+                                                 pickle.HIGHEST_PROTOCOL)),
+                       bookkeeper, *arrays, positions[events])
+    add_electricity_demand_of_appliances(neighbourhoods, bookkeeper)
+    bookkeeper.add_assignments(neighbourhoods.values())
+
+    neighbourhoods = {code: neighbourhoods[code] for code in codes}
+
+    return (bookkeeper, neighbourhood_result_records(neighbourhoods),
+            [(neighbourhood.heating_option_preference[0][1],
+              neighbourhood.fraction_of_lt_eligible_houses())
+             for neighbourhood in neighbourhoods.values()],
+            [neighbourhood.total_heat_demand()
+             for neighbourhood in neighbourhoods.values()])
+
+
+def replay_tile_in_context(context, *arguments):
+    """
+    Replay the decisions of the kernel on a tile (see replay_tile) in a worker
+    process, in the run context of the scenario
+    """
+
+    with context.activate():
+        return replay_tile(*arguments)
+
+
+def replay_tiles(snapshot, tiles, sources, heat_sources, regions, results,
+                 processes=1):
+    """
+    Replay the decisions of the kernel (results, see run_tiled) tile by tile,
+    in a pool of processes if processes is more than 1. Returns the results
+    of replay_tile per tile.
+    """
+
+    options, routes, source_indices, stages, events, _ = results
+
+    # The neighbourhoods of each tile in the snapshot, and the tile and
+    # position in the tile of each neighbourhood
+    indices = [np.array([snapshot.index[code] for code in codes],
+                        dtype=np.int64) for codes in tiles]
+    tile_of = np.empty(len(snapshot), dtype=np.int64)
+    position_in_tile = np.empty(len(snapshot), dtype=np.int64)
+
+    for number, tile in enumerate(indices):
+        tile_of[tile] = number
+        position_in_tile[tile] = np.arange(len(tile))
+
+    arguments = [(
+        codes, {code: sources[code] for code in codes}, heat_sources, regions,
+        options[tile], routes[tile], source_indices[tile], stages[tile],
+        # The neighbourhoods of the tile in order of assignment
+        position_in_tile[events[tile_of[events] == number]]
+    ) for number, (codes, tile) in enumerate(zip(tiles, indices))]
+
+    if processes <= 1:
+        return [replay_tile(*argument) for argument in arguments]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(replay_tile_in_context,
+                                   config.current_context, *argument)
+                   for argument in arguments]
+
+        return [future.result() for future in futures]
+
+
+def assign_heat_sources(snapshot, heat_sources, results):
+    """
+    Assign the heat of the residual heat sources to the neighbourhoods
+    supplied by them, in order of assignment (see run_tiled)
+    """
+
+    options, routes, source_indices, _, events, _ = results
+
+    for index in events:
+        route = ROUTES[routes[index]]
+
+        if route in HEAT_TEMPERATURES:
+            assign_heat_source(snapshot, heat_sources, index,
+                               OPTIONS[options[index]], route,
+                               source_indices[index])
+
+
+def run_tiled_scenario(tile_size, processes=1):
+    """
+    Load and allocate the neighbourhoods of the current scenario tile by tile
+    (see the module docstring). Returns the snapshot of the neighbourhoods,
+    the heat sources, the merged bookkeeper, the names of the regions and
+    per neighbourhood (in the order of the snapshot) its result record, sort
+    keys and present heat demand (see replay_tile).
+    """
+
+    neighbourhoods = index_of_neighbourhoods()
+    sources, ht_sources, lt_sources = map_heat_sources(neighbourhoods)
+    heat_sources = {'HT': ht_sources, 'LT': lt_sources}
+    regions, region_names = region_mappings(neighbourhoods)
+
+    tiles = tiles_of(neighbourhoods, tile_size)
+    snapshot = tiled_snapshot(neighbourhoods, tiles, sources, heat_sources)
+    results, _ = run_tiled(snapshot)
+
+    print(f'\nReplaying the assignments of {len(tiles)} tiles..')
+
+    replays = replay_tiles(snapshot, tiles, sources, heat_sources, regions,
+                           results, processes)
+
+    bookkeeper = merge_bookkeepers([bookkeeper for bookkeeper, _, _, _ in
+                                    replays], snapshot.codes, regions)
+    assign_heat_sources(snapshot, heat_sources, results)
+
+    # The used renewable gas of the kernel (the replays in this process used
+    # the renewable gas again)
+    *_, used_renewable_gas = results
+    config.current_project.current_scenario['used_renewable_gas'] = float(
+        used_renewable_gas)
+
+    # The records, sort keys and present demands in the order of the snapshot
+    records = [None] * len(snapshot)
+    keys = [None] * len(snapshot)
+    present_demands = [None] * len(snapshot)
+
+    for codes, (_, tile_records, tile_keys, tile_present_demands) in zip(
+            tiles, replays):
+        for code, record, key, present_demand in zip(
+                codes, tile_records, tile_keys, tile_present_demands):
+            index = snapshot.index[code]
+            records[index] = record
+            keys[index] = key
+            present_demands[index] = present_demand
+
+    return (snapshot, heat_sources, bookkeeper, region_names, records, keys,
+            present_demands)
+
+
+def export_tiled_results(snapshot, heat_sources, bookkeeper, region_names,
+                         records, keys):
+    """
+    Export the standard result tables of main.py: the neighbourhoods (in the
+    order of main.allocate), the heat sources, the heat demands of the
+    neighbourhoods and regions, and the assigned heating options per region
+    """
+
+    os.makedirs(output_directory(), exist_ok=True)
+
+    # Sort the neighbourhoods on first preference, and then on LT
+    # eligibility (as main.allocate)
+    order = sorted(range(len(snapshot)), key=lambda index: keys[index][0],
+                   reverse=True)
+    order = sorted(order, key=lambda index: keys[index][1], reverse=True)
+
+    write_table(table_of_records([records[index] for index in order]),
+                "neighbourhoods_output")
+    export_heat_source_results_to_csv(heat_sources)
+
+    bookkeeper.export_heat_demand_to_csv()
+    bookkeeper.export_regional_heat_demand_to_csv(region_names)
+    export_regional_assignments_to_csv(bookkeeper, region_names)
+
+
+def run_tiled_checks(snapshot, heat_sources, bookkeeper, present_demands):
+    """
+    Run all checks on the results of the tiled mode (see
+    run_tests.run_checks), returns the results of the checks
+    """
+
+    print('\n# houses: {}'.format(snapshot.number_of_houses.sum()))
+    print('m2 of utility: {}'.format(snapshot.m2_of_utility.sum()))
+
+    bookkeeper.print_heat_demand()
+
+    results = {
+        'demands': [check_present_demands(snapshot.codes, present_demands,
+                                          bookkeeper)],
+        **verify_sources(heat_sources, bookkeeper)
+    }
+    print_verification(results)
+
+    return results
+
+
+def main(args):
+    """
+    Run the tiled mode for the scenario given on the command line, see the
+    module docstring
+    """
+
+    if len(args) not in [2, 3]:
+        print('The following arguments were expected: tiled.py <PROJECT> '
+              '<SCENARIO> <optional: PROCESSES>')
+        return
+
+    processes = int(args[2]) if len(args) > 2 else 1
+
+    with RunContext(args[0], args[1]).activate():
+        tile_size = int(getattr(config.current_project, 'TILE_SIZE',
+                                DEFAULT_TILE_SIZE))
+
+        (snapshot, heat_sources, bookkeeper, region_names, records, keys,
+         present_demands) = run_tiled_scenario(tile_size, processes)
+
+        export_tiled_results(snapshot, heat_sources, bookkeeper,
+                             region_names, records, keys)
+        run_tiled_checks(snapshot, heat_sources, bookkeeper, present_demands)
+
+        print('Done!')
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,265 @@
+"""
+In-memory verification of the results of an allocation, on the (array-backed)
+bookkeeper, the heat sources and the neighbourhoods:
+
+- present useful heat demand = future useful heat demand + heat reduction (per
+  neighbourhood)
+- used heat of a heat source = sum of the heat of its assignments (per source)
+- used heat <= available heat (per source, and in total)
+- assigned heat of the heat sources = used heat in the bookkeeper (in total,
+  and per neighbourhood)
+- used renewable gas <= gas budget, and = used gas in the bookkeeper
+
+Each check gives a CheckResult with the offending neighbourhoods or heat
+sources. Use verify to run all checks and print_verification to print them.
+"""
+
+# external modules
+from collections import namedtuple
+import math
+import numpy as np
+
+# project modules
+from Bookkeeper import CARRIER_INDEX
+import config
+
+# Result of a check: value <relation> expected, and the offending entries as
+# (code, value, expected)
+CheckResult = namedtuple('CheckResult', [
+    'name', 'value', 'relation', 'expected_name', 'expected', 'passed',
+    'offenders'
+])
+
+# Relative tolerance of the equality checks (as math.isclose)
+RELATIVE_TOLERANCE = 1e-9
+
+
+def is_close(values, expected):
+    """
+    Elementwise math.isclose of two arrays
+    """
+
+    return np.abs(values - expected) <= RELATIVE_TOLERANCE * np.maximum(
+        np.abs(values), np.abs(expected))
+
+
+def holds(value, relation, expected):
+    """
+    Checks if value <relation> expected holds for the totals
+    """
+
+    if relation == '==':
+        return math.isclose(value, expected, rel_tol=RELATIVE_TOLERANCE)
+
+    return value <= expected
+
+
+def check_result(name, value, relation, expected_name, expected, codes=(),
+                 values=None, expected_values=None):
+    """
+    Returns the CheckResult of the totals and (optionally) of the values per
+    neighbourhood or heat source
+    """
+
+    offenders = []
+
+    if values is not None:
+        if relation == '==':
+            wrong = ~is_close(values, expected_values)
+        else:
+            wrong = ~(values <= expected_values)
+
+        offenders = [(codes[index], float(values[index]),
+                      float(expected_values[index]))
+                     for index in np.flatnonzero(wrong)]
+
+    return CheckResult(name, value, relation, expected_name, expected,
+                       holds(value, relation, expected) and not offenders,
+                       offenders)
+
+
+def check_present_demand(neighbourhoods, bookkeeper):
+    """
+    Checks if the present useful heat demand of each neighbourhood is equal to
+    the bookkeeped future useful heat demand plus the heat reduction
+    """
+
+    return check_present_demands(
+        list(neighbourhoods.keys()),
+        [neighbourhood.total_heat_demand()
+         for neighbourhood in neighbourhoods.values()], bookkeeper)
+
+
+def check_present_demands(codes, present_demands, bookkeeper):
+    """
+    Checks the present useful heat demands of the neighbourhoods with the
+    codes (see check_present_demand), without the neighbourhood objects
+    """
+
+    present = np.array(present_demands, dtype=float)
+
+    demands = bookkeeper_demands(bookkeeper, codes)
+    future = (demands[:, :, CARRIER_INDEX['useful_heat']].sum(axis=1) +
+              demands[:, :, CARRIER_INDEX['heat_reduction']].sum(axis=1))
+
+    return check_result('present useful heat demand', math.fsum(present),
+                        '==',
+                        'bookkeeped future useful heat demand + heat reduction',
+                        math.fsum(future), codes, present, future)
+
+
+def check_source_assignments(heat_sources, heat_temperature):
+    """
+    Checks if the used heat of each heat source is equal to the heat of its
+    assignments
+    """
+
+    sources = list(heat_sources[heat_temperature].values())
+    used = np.array([source.used_heat for source in sources], dtype=float)
+    assigned = np.array([
+        math.fsum(heat for _, _, heat in source.assignments)
+        for source in sources
+    ], dtype=float)
+
+    return check_result(f'{heat_temperature} used heat', math.fsum(used),
+                        '==', 'heat of the assignments', math.fsum(assigned),
+                        [source.code for source in sources], used, assigned)
+
+
+def check_capacities(heat_sources, heat_temperature):
+    """
+    Checks if no heat source has assigned more heat than is available
+    """
+
+    sources = list(heat_sources[heat_temperature].values())
+    used = np.array([source.used_heat for source in sources], dtype=float)
+    available = np.array([source.available_heat for source in sources],
+                         dtype=float)
+
+    return check_result('total assigned heat', math.fsum(used), '<=',
+                        'total available heat', math.fsum(available),
+                        [source.code for source in sources], used, available)
+
+
+def check_heat_balance(heat_sources, bookkeeper, heat_temperature):
+    """
+    Checks if the heat assigned by the heat sources is equal to the heat
+    received by the neighbourhoods in the bookkeeper (in total and per
+    neighbourhood)
+    """
+
+    assigned_heat = {}
+
+    for source in heat_sources[heat_temperature].values():
+        for code, _, heat in source.assignments:
+            assigned_heat.setdefault(code, []).append(heat)
+
+    codes = list(assigned_heat.keys())
+    assigned = np.array([math.fsum(assigned_heat[code]) for code in codes],
+                        dtype=float)
+    used = bookkeeper_demands(bookkeeper, codes)[
+        :, :, CARRIER_INDEX[heat_temperature]].sum(axis=1)
+
+    totals = bookkeeper.totals()[:, CARRIER_INDEX[heat_temperature]]
+
+    return check_result(
+        'total assigned heat',
+        math.fsum(source.used_heat
+                  for source in heat_sources[heat_temperature].values()),
+        '==', 'total used heat', math.fsum(totals), codes, assigned, used)
+
+
+def check_gas_budget(bookkeeper, context=None):
+    """
+    Checks if no more renewable gas has been used than available in the
+    scenario of the run context (or the current one), and if the used gas is
+    equal to the gas received by the neighbourhoods
+    """
+
+    scenario = config.context_of_run(context).scenario
+    used_gas = math.fsum(bookkeeper.totals()[:, CARRIER_INDEX['H']])
+
+    return [
+        check_result('total assigned gas', scenario['used_renewable_gas'],
+                     '<=', 'total available gas',
+                     scenario['renewable_gas_budget']),
+        check_result('total assigned gas', scenario['used_renewable_gas'],
+                     '==', 'total used gas', used_gas)
+    ]
+
+
+def bookkeeper_demands(bookkeeper, codes):
+    """
+    Returns the demands (neighbourhoods x sectors x carriers) of the
+    neighbourhoods in the bookkeeper (zero if they have none)
+    """
+
+    rows = np.array([bookkeeper.neighbourhood_index.get(code, -1)
+                     for code in codes], dtype=np.int64)
+
+    demands = bookkeeper.demands[np.maximum(rows, 0)].copy()
+    demands[rows < 0] = 0.
+
+    return demands
+
+
+def verify(neighbourhoods, heat_sources, bookkeeper, context=None):
+    """
+    Run all checks on the results of an allocation (in the run context, or
+    the current one), returns the CheckResults per group of checks
+    """
+
+    return {'demands': [check_present_demand(neighbourhoods, bookkeeper)],
+            **verify_sources(heat_sources, bookkeeper, context)}
+
+
+def verify_sources(heat_sources, bookkeeper, context=None):
+    """
+    Run the checks of the heat sources and gas budget (all checks but those of
+    the demands of the neighbourhoods), returns the CheckResults per group of
+    checks
+    """
+
+    results = {}
+
+    for heat_temperature in ['HT', 'LT']:
+        results[f'{heat_temperature} sources'] = [
+            check_source_assignments(heat_sources, heat_temperature),
+            check_capacities(heat_sources, heat_temperature),
+            check_heat_balance(heat_sources, bookkeeper, heat_temperature)
+        ]
+
+    results['gas budgets'] = check_gas_budget(bookkeeper, context)
+
+    return results
+
+
+def print_verification(results, max_offenders=10):
+    """
+    Print the results of the checks, with (at most max_offenders of) the
+    offending neighbourhoods or heat sources
+    """
+
+    for group, checks in results.items():
+        print('\nChecking {}..'.format(group))
+
+        for check in checks:
+            # Relation of the totals
+            if holds(check.value, check.relation, check.expected):
+                relation = check.relation
+            else:
+                relation = {'==': '!=', '<=': '>'}[check.relation]
+
+            print('  {}: {} ({}) {} {} ({})'.format(
+                'CORRECT' if check.passed else 'ERROR', check.name,
+                round(check.value, 1), relation, check.expected_name,
+                round(check.expected, 1)))
+
+            for code, value, expected in check.offenders[:max_offenders]:
+                print('    - {}: {} {} {}'.format(
+                    code, round(value, 1), {'==': '!=', '<=': '>'}[
+                        check.relation], round(expected, 1)))
+
+            if len(check.offenders) > max_offenders:
+                print('    - ... and {} more'.format(
+                    len(check.offenders) - max_offenders))
@@ -0,0 +1,237 @@
+# system modules
+import csv
+import pickle
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# external modules
+import pytest
+
+# The scripts read the input data and write their results next to the
+# scripts directory, so the tests run on a copy of the scripts and the input
+# data in a temporary directory
+ROOT = Path(__file__).resolve().parents[1]
+WORKSPACE = Path(tempfile.mkdtemp(prefix='heat-module-tests-'))
+
+for name in ['scripts', 'input_data']:
+    shutil.copytree(ROOT / name, WORKSPACE / name,
+                    ignore=shutil.ignore_patterns('__pycache__'))
+
+sys.path.insert(0, str(WORKSPACE / 'scripts'))
+
+SCENARIOS = ['scenario_1', 'scenario_2', 'scenario_3']
+
+# Variants of the sample project in the reference assignments (computed with
+# the original decision trees): the preferences of the neighbourhoods
+# ('default', 'no_coverage' without the preference for existing heat
+# networks, 'prefer_H' with all residences preferring H) and the renewable
+# gas budget ('default' for the budget of the scenario)
+VARIANTS = [
+    (preferences, budget)
+    for preferences in ['default', 'no_coverage', 'prefer_H']
+    for budget in ['default', '1.E5', '0.']
+]
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(WORKSPACE, ignore_errors=True)
+
+
+def overrides_of_variant(preferences, budget):
+    """
+    Returns the overrides (see RunContext.override) of a variant of the sample
+    project
+    """
+
+    import config
+
+    overrides = {}
+
+    if preferences in ['no_coverage', 'prefer_H']:
+        overrides['ASSUMPTIONS.heat_network_coverage_threshold_high'] = 1.E9
+        overrides['ASSUMPTIONS.heat_network_coverage_threshold_low'] = 1.E9
+
+    if preferences == 'prefer_H':
+        matrix = config.project_module('sample').DEFAULT_MATRIX_RESIDENCES
+
+        for house_type, periods in matrix.items():
+            overrides[f'DEFAULT_MATRIX_RESIDENCES.{house_type}'] = {
+                period: [0., 1., 0.] for period in periods}
+
+    if budget != 'default':
+        overrides['SCENARIO.renewable_gas_budget'] = float(budget)
+
+    return overrides
+
+
+def assignments_of(neighbourhoods):
+    """
+    Returns the assigned heating option and heat source of the neighbourhoods,
+    by code
+    """
+
+    return {
+        code: (neighbourhood.assigned_heating_option,
+               neighbourhood.assigned_heat_source or '')
+        for code, neighbourhood in neighbourhoods.items()
+    }
+
+
+def outcome_of(neighbourhoods, heat_sources, bookkeeper):
+    """
+    Returns the outcome of an allocation: the assignments of the
+    neighbourhoods, the used heat of the heat sources and the totals of the
+    bookkeeper
+    """
+
+    return (assignments_of(neighbourhoods),
+            {code: source.used_heat
+             for heat_temperature in ['HT', 'LT']
+             for code, source in heat_sources[heat_temperature].items()},
+            bookkeeper.totals().tolist())
+
+
+@pytest.fixture(scope='session')
+def workspace():
+    return WORKSPACE
+
+
+@pytest.fixture(scope='session')
+def variant_overrides():
+    return overrides_of_variant
+
+
+@pytest.fixture(scope='session')
+def assignments():
+    return assignments_of
+
+
+@pytest.fixture(scope='session')
+def outcome():
+    return outcome_of
+
+
+@pytest.fixture(scope='session')
+def reference_assignments():
+    """
+    The reference assignments of the variants, by (preferences, budget,
+    scenario)
+    """
+
+    reference = {}
+
+    with open(Path(__file__).parent / 'data' /
+              'reference_assignments.csv') as file:
+        for row in csv.DictReader(file):
+            key = (row['preferences'], row['renewable_gas_budget'],
+                   row['scenario'])
+            reference.setdefault(key, {})[row['neighbourhood_code']] = (
+                row['assigned_heating_option'], row['assigned_heat_source'])
+
+    return reference
+
+
+@pytest.fixture(scope='session')
+def heat_module():
+    from HeatModule import HeatModule
+
+    return HeatModule('sample').load()
+
+
+@pytest.fixture(scope='session')
+def stock():
+    """
+    The stock of the neighbourhoods of the sample project (see
+    load_data.build_stock)
+    """
+
+    from load_data import build_stock
+    from RunContext import RunContext
+
+    with RunContext('sample', None).activate():
+        return build_stock()
+
+
+@pytest.fixture(scope='session')
+def variant_context():
+    """
+    Returns a function that returns the run context (see RunContext) of a
+    scenario of a variant, with further overrides if given
+    """
+
+    from RunContext import RunContext
+
+    def variant_context(scenario_name, preferences='default',
+                        budget='default', overrides=None):
+        context = RunContext('sample', scenario_name)
+        context.override({**overrides_of_variant(preferences, budget),
+                          **(overrides or {})})
+
+        return context
+
+    return variant_context
+
+
+@pytest.fixture(scope='session')
+def prepare_variant(stock):
+    """
+    Returns a function that returns a copy of the stock with the preferences
+    and heat sources of the current run context (see load_data), and the heat
+    sources
+    """
+
+    from load_data import determine_preferences, map_heat_sources
+
+    def prepare_variant():
+        neighbourhoods = pickle.loads(pickle.dumps(stock))
+        determine_preferences(neighbourhoods)
+        _, ht_sources, lt_sources = map_heat_sources(neighbourhoods)
+
+        return neighbourhoods, {'HT': ht_sources, 'LT': lt_sources}
+
+    return prepare_variant
+
+
+@pytest.fixture(scope='session')
+def allocate_variant(variant_context, prepare_variant):
+    """
+    Returns a function to allocate (see main.allocate) a copy of the stock in
+    a scenario of a variant, with further overrides if given. It returns the
+    neighbourhoods, heat sources, bookkeeper and the results of the checks.
+    """
+
+    from main import allocate
+    from run_tests import run_checks
+
+    def allocate_variant(scenario_name, preferences='default',
+                         budget='default', overrides=None):
+        with variant_context(scenario_name, preferences, budget,
+                             overrides).activate() as context:
+            neighbourhoods, heat_sources = prepare_variant()
+            neighbourhoods, bookkeeper, _ = allocate(
+                neighbourhoods, heat_sources, context=context)
+            checks = run_checks(neighbourhoods, heat_sources, bookkeeper,
+                                context)
+
+        return neighbourhoods, heat_sources, bookkeeper, checks
+
+    return allocate_variant
+
+
+@pytest.fixture(scope='session')
+def loaded_project():
+    """
+    Load the data of the scenarios of the sample project (as load_data.py
+    does). Returns the output data directory of the project.
+    """
+
+    from load_data import initialise_neighbourhoods_and_heat_sources
+    from RunContext import RunContext
+
+    for scenario_name in SCENARIOS:
+        with RunContext('sample', scenario_name).activate():
+            initialise_neighbourhoods_and_heat_sources()
+
+    return WORKSPACE / 'output_data' / 'sample'
@@ -0,0 +1,56 @@
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS, VARIANTS
+
+
+def passed_checks(results):
+    return {group: [check.passed for check in checks]
+            for group, checks in results.items()}
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', VARIANTS)
+def test_kernel_equals_decision_trees(allocate_variant, outcome,
+                                      scenario_name, preferences, budget):
+    decision_trees = allocate_variant(scenario_name, preferences, budget)
+    kernel = allocate_variant(scenario_name, preferences, budget,
+                              {'SCENARIO.allocation_engine': 'kernel'})
+
+    assert outcome(*kernel[:3]) == outcome(*decision_trees[:3])
+    assert passed_checks(kernel[3]) == passed_checks(decision_trees[3])
+
+
+@pytest.mark.parametrize('preferences, budget', VARIANTS)
+def test_compiled_kernel_equals_pure_python(variant_context, prepare_variant,
+                                            preferences, budget):
+    from allocation_kernel import kernel_arrays, run_kernel
+    from Bookkeeper import Bookkeeper
+    from ProjectSnapshot import ProjectSnapshot
+    from source_selection import source_selection_of_scenario
+
+    context = variant_context('scenario_3', preferences, budget)
+
+    with context.activate():
+        neighbourhoods, heat_sources = prepare_variant()
+        arrays = kernel_arrays(ProjectSnapshot(
+            neighbourhoods, heat_sources, Bookkeeper(neighbourhoods.keys())))
+        strategy, max_distance = source_selection_of_scenario()
+
+        results = [
+            run_kernel(arrays, strategy, max_distance,
+                       context.scenario['renewable_gas_budget'], 0.,
+                       compiled)
+            for compiled in [True, False]
+        ]
+
+    (compiled, compiled_heat), (pure, pure_heat) = results
+
+    for compiled_result, pure_result in zip(compiled, pure):
+        np.testing.assert_array_equal(compiled_result, pure_result)
+
+    for heat_temperature in ['HT', 'LT']:
+        np.testing.assert_array_equal(compiled_heat[heat_temperature],
+                                      pure_heat[heat_temperature])
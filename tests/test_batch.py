@@ -0,0 +1,116 @@
+# system modules
+import shutil
+
+# external modules
+import pandas as pd
+import pytest
+
+
+# A project of which the snapshot job fails (a missing properties file)
+BROKEN_PROJECT = '''
+from .sample import *
+
+NEIGHBOURHOOD_CSVS = {
+    **NEIGHBOURHOOD_CSVS,
+    'properties': NEIGHBOURHOOD_CSVS['properties'] + ['missing.csv']
+}
+'''
+
+
+@pytest.fixture
+def broken_project(workspace):
+    """
+    The name of a copy of the sample project with a missing input file,
+    removed after the test
+    """
+
+    config_file = workspace / 'scripts' / 'config_files' / 'broken.py'
+    config_file.write_text(BROKEN_PROJECT)
+    shutil.copytree(workspace / 'input_data' / 'sample',
+                    workspace / 'input_data' / 'broken')
+
+    yield 'broken'
+
+    config_file.unlink()
+    shutil.rmtree(workspace / 'input_data' / 'broken')
+    shutil.rmtree(workspace / 'output_data' / 'broken', ignore_errors=True)
+
+
+def test_jobs_share_the_snapshot_of_their_project():
+    import config
+    from batch import WORKER_MEMORY, jobs_of_batch
+    from RunContext import ProjectSettings
+
+    settings = {'sample': ProjectSettings(config.project_module('sample'))}
+    jobs = jobs_of_batch([('sample', 'scenario_1'), ('sample', 'scenario_3')],
+                         settings)
+
+    assert [(job.name, job.dependencies) for job in jobs] == [
+        ('snapshot sample', []),
+        ('load sample:scenario_1', ['snapshot sample']),
+        ('allocate sample:scenario_1', ['load sample:scenario_1']),
+        ('load sample:scenario_3', ['snapshot sample']),
+        ('allocate sample:scenario_3', ['load sample:scenario_3'])
+    ]
+    assert all(job.memory > WORKER_MEMORY for job in jobs)
+
+
+def test_runs_of_arguments():
+    from batch import runs_of_arguments
+
+    assert runs_of_arguments(['sample:scenario_2', 'sample']) == [
+        ('sample', 'scenario_2'), ('sample', 'scenario_1'),
+        ('sample', 'scenario_2'), ('sample', 'scenario_3')]
+
+
+def test_unknown_scenarios_are_refused():
+    from batch import run_batch
+
+    with pytest.raises(KeyError, match='scenario_9'):
+        run_batch([('sample', 'scenario_9')])
+
+
+def test_batch_runs_the_scenarios_and_skips_the_jobs_of_failed_jobs(
+        loaded_project, broken_project, workspace, capsys):
+    from batch import report_batch, run_batch
+    from main import run_scenario
+    from RunContext import RunContext
+
+    records = run_batch([('sample', 'scenario_1'), ('sample', 'scenario_2'),
+                         (broken_project, 'scenario_1')], processes=2)
+
+    assert [(record['job'], record['status']) for record in records] == [
+        ('snapshot sample', 'done'),
+        ('load sample:scenario_1', 'done'),
+        ('allocate sample:scenario_1', 'done'),
+        ('load sample:scenario_2', 'done'),
+        ('allocate sample:scenario_2', 'done'),
+        ('snapshot broken', 'failed'),
+        ('load broken:scenario_1', 'skipped'),
+        ('allocate broken:scenario_1', 'skipped')
+    ]
+    assert 'missing.csv' in records[5]['error']
+
+    # The runs of the batch equal the runs of main.py on the loaded data
+    for record in records[2:5:2]:
+        outputs = (loaded_project / record['scenario'] /
+                   'neighbourhoods_output.csv').read_bytes()
+
+        assert record['summary'] == run_scenario(
+            RunContext('sample', record['scenario']))
+        assert (loaded_project / record['scenario'] /
+                'neighbourhoods_output.csv').read_bytes() == outputs
+
+    capsys.readouterr()
+    report_batch(records)
+    output = capsys.readouterr().out
+
+    assert 'ERROR in snapshot broken' in output
+
+    report = pd.read_csv(workspace / 'output_data' / 'batch_report.csv')
+
+    assert report['status'].tolist() == [record['status']
+                                         for record in records]
+    assert report.loc[2, 'scenario'] == 'scenario_1'
+    assert report.loc[2, 'used_renewable_gas'] == (
+        records[2]['summary']['used_renewable_gas'])
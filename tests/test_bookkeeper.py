@@ -0,0 +1,113 @@
+# system modules
+import csv
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+@pytest.fixture(scope='module')
+def reference_demands():
+    """
+    The reference demand tables of the original (dictionary) bookkeeper, by
+    (preferences, budget, scenario)
+    """
+
+    reference = {}
+
+    with open(Path(__file__).parent / 'data' /
+              'reference_demands.csv') as file:
+        for row in csv.DictReader(file):
+            key = (row.pop('preferences'), row.pop('renewable_gas_budget'),
+                   row.pop('scenario'))
+            reference.setdefault(key, []).append(list(row.values()))
+
+    return reference
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', [('default', 'default'),
+                                                 ('prefer_H', '1.E5')])
+def test_demands_equal_reference(allocate_variant, reference_demands,
+                                 scenario_name, preferences, budget):
+    _, _, bookkeeper, _ = allocate_variant(scenario_name, preferences, budget)
+
+    rows = bookkeeper.heat_demand_rows(missing='')
+    expected = reference_demands[(preferences, budget, scenario_name)]
+
+    assert [row[:2] for row in rows] == [row[:2] for row in expected]
+
+    for row, expected_row in zip(rows, expected):
+        # The same carriers have been added
+        assert [value == '' for value in row[2:]] == [
+            value == '' for value in expected_row[2:]]
+        assert [value for value in row[2:] if value != ''] == pytest.approx(
+            [float(value) for value in expected_row[2:] if value != ''],
+            rel=1e-12)
+
+
+def test_bookkeeper_grows_and_keeps_regions():
+    from Bookkeeper import CARRIER_INDEX, Bookkeeper
+
+    regions = {'municipality': {'A': 'GM1', 'B': 'GM2', 'C': 'GM1'}}
+    bookkeeper = Bookkeeper(['A'], regions)
+
+    rows = bookkeeper.rows_of(
+        [SimpleNamespace(code=code) for code in 'ABCA'],
+        [CARRIER_INDEX['E']])
+    bookkeeper.add_demands(rows, 0, CARRIER_INDEX['E'], [1., 2., 4., 8.])
+
+    assert bookkeeper.neighbourhood_codes == ['A', 'B', 'C']
+    assert bookkeeper.heat_demand['A']['residences']['E'] == 9.
+    assert bookkeeper.heat_demand['all_residences']['E'] == 15.
+
+    regions, demands = bookkeeper.region_totals('municipality')
+
+    assert regions == ['GM1', 'GM2']
+    assert demands[:, 0, CARRIER_INDEX['E']].tolist() == [13., 2.]
+
+    copy = pickle.loads(pickle.dumps(bookkeeper))
+
+    np.testing.assert_array_equal(copy.totals(), bookkeeper.totals())
+
+
+def test_single_demands_equal_batch_demands():
+    from Bookkeeper import Bookkeeper
+
+    regions = {'municipality': {'A': 'GM1', 'B': 'GM2', 'C': 'GM1'}}
+    neighbourhoods = [SimpleNamespace(code=code) for code in 'ABCA']
+    demands = [(0.1, 0.2, 0.3, 0.4), (1.E6, 3.3, 0.7, 0.), (2., 1.E-3, 5., 6.),
+               (0.7, 0.9, 1.1, 1.3)]
+
+    single = Bookkeeper([], regions)
+    batch = Bookkeeper([], regions)
+
+    for neighbourhood, values in zip(neighbourhoods, demands):
+        single.add_final_heat_demand(neighbourhood, 'HT', *values[:2])
+        single.add_useful_heat_demand(neighbourhood, *values)
+
+    # The totals are kept until the next demand is added
+    totals = single.totals()
+    single.add_final_heat_demand(neighbourhoods[1], 'E', 1., 2.)
+
+    assert single.heat_demand['all_residences']['E'] == 1.
+    assert single.totals()[0].tolist() != totals[0].tolist()
+
+    columns = list(zip(*demands))
+    batch.add_final_heat_demands(neighbourhoods, 'HT', *columns[:2])
+    batch.add_useful_heat_demands(neighbourhoods, *columns)
+    batch.add_final_heat_demands(neighbourhoods[1:2], 'E', [1.], [2.])
+
+    assert single.neighbourhood_codes == batch.neighbourhood_codes
+    assert single.order_of_neighbourhoods == batch.order_of_neighbourhoods
+    np.testing.assert_array_equal(single.added, batch.added)
+    np.testing.assert_array_equal(single.demands, batch.demands)
+    np.testing.assert_array_equal(single.totals(), batch.totals())
+    np.testing.assert_array_equal(single.region_totals('municipality')[1],
+                                  batch.region_totals('municipality')[1])
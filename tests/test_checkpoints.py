@@ -0,0 +1,157 @@
+# system modules
+import pickle
+
+# external modules
+import pytest
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(monkeypatch, saves):
+    """
+    Interrupt the allocations after the given number of checkpoints
+    """
+
+    from Checkpoints import Checkpoints
+
+    save_allocation = Checkpoints.save_allocation
+    count = [0]
+
+    def interrupted_save_allocation(self, progress=None):
+        save_allocation(self, progress)
+        count[0] += 1
+
+        if count[0] == saves:
+            raise Interrupted
+
+    monkeypatch.setattr(Checkpoints, 'save_allocation',
+                        interrupted_save_allocation)
+
+
+@pytest.mark.parametrize('saves', [1, 14, 20])
+def test_resumed_allocation_equals_uninterrupted_allocation(
+        variant_context, prepare_variant, outcome, monkeypatch, tmp_path,
+        saves):
+    from Checkpoints import Checkpoints
+    from main import allocate
+
+    def allocation(checkpoints=None):
+        # Each run in its own context, so the resumed run only has the used
+        # renewable gas of the checkpoint
+        with variant_context('scenario_1', 'prefer_H', '1.E5').activate():
+            neighbourhoods, heat_sources = prepare_variant()
+            neighbourhoods, bookkeeper, _ = allocate(
+                neighbourhoods, heat_sources, checkpoints)
+
+            return outcome(neighbourhoods, heat_sources, bookkeeper)
+
+    uninterrupted = allocation()
+
+    # A checkpoint is due at every neighbourhood
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, saves)
+
+        with pytest.raises(Interrupted):
+            allocation(Checkpoints(tmp_path, 1.E-9))
+
+    assert allocation(Checkpoints(tmp_path, 1.E-9, resume=True)) == (
+        uninterrupted)
+
+
+def test_scenarios_opt_in_to_checkpoints():
+    import config
+    from Checkpoints import Checkpoints
+    from RunContext import ProjectSettings, RunContext
+
+    with RunContext('sample', 'scenario_1').activate():
+        assert Checkpoints.of_current_run() is None
+
+    settings = ProjectSettings(config.project_module('sample'))
+    settings.CHECKPOINT_INTERVAL = 60.
+
+    with RunContext('sample', 'scenario_1', settings).activate():
+        checkpoints = Checkpoints.of_current_run()
+
+    assert checkpoints.interval == 60.
+    assert checkpoints.path.parts[-2:] == ('.checkpoints', 'scenario_1')
+
+
+def test_stages_are_resumed_from_their_checkpoints(tmp_path):
+    from Checkpoints import Checkpoints
+
+    Checkpoints(tmp_path, 60.).run('stock', 'key', lambda: {'a': 1})
+
+    def compute():
+        raise AssertionError('The stage should have been resumed')
+
+    resumed = Checkpoints(tmp_path, 60., resume=True)
+
+    assert resumed.run('stock', 'key', compute) == {'a': 1}
+    assert Checkpoints(tmp_path, 60.).run('stock', 'key', lambda: 2) == 2
+
+    # Another key computes the stage again
+    assert resumed.run('stock', 'other key', lambda: 3) == 3
+
+
+def test_corrupt_or_other_checkpoints_are_ignored(tmp_path, capsys):
+    from Checkpoints import Checkpoints
+
+    checkpoints = Checkpoints(tmp_path, 60.)
+    checkpoints.save('stock', 'key', {'a': 1})
+
+    assert checkpoints.restore('stock', 'key') == {'a': 1}
+    assert checkpoints.restore('stock', 'other key') is None
+    assert checkpoints.restore('preferences', 'key') is None
+
+    path = tmp_path / 'stock.pkl'
+    path.write_bytes(path.read_bytes()[:-1])
+
+    assert checkpoints.restore('stock', 'key') is None
+    assert 'stock checkpoint is corrupt' in capsys.readouterr().out
+
+    checkpoints.remove(['stock', 'preferences'])
+
+    assert not path.exists()
+
+
+def test_resumed_run_writes_the_same_outputs(loaded_project, monkeypatch):
+    import config
+    from main import run_scenario
+    from RunContext import ProjectSettings, RunContext
+
+    settings = ProjectSettings(config.project_module('sample'))
+    settings.CHECKPOINT_INTERVAL = 1.E-9
+    scenario = loaded_project / 'scenario_2'
+    names = ['neighbourhoods_output.csv', 'HT_sources_output.csv',
+             'LT_sources_output.csv', 'demands.csv']
+
+    def run(resume=False):
+        return run_scenario(RunContext('sample', 'scenario_2', settings),
+                            resume=resume)
+
+    summary = run()
+    outputs = {name: (scenario / name).read_bytes() for name in names}
+
+    for name in names:
+        (scenario / name).unlink()
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 10)
+
+        with pytest.raises(Interrupted):
+            run()
+
+    checkpoint = (loaded_project / '.checkpoints' / 'scenario_2' /
+                  'allocation.pkl')
+
+    assert checkpoint.exists()
+    assert not (scenario / 'neighbourhoods_output.csv').exists()
+
+    assert run(resume=True) == summary
+    assert {name: (scenario / name).read_bytes()
+            for name in names} == outputs
+
+    # The run is complete, so its checkpoints are removed
+    assert not checkpoint.parent.exists()
@@ -0,0 +1,100 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS, VARIANTS
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', VARIANTS)
+def test_decision_trees_reproduce_reference_assignments(
+        allocate_variant, assignments, reference_assignments, scenario_name,
+        preferences, budget):
+    neighbourhoods, _, _, _ = allocate_variant(scenario_name, preferences,
+                                               budget)
+
+    assert assignments(neighbourhoods) == reference_assignments[
+        (preferences, budget, scenario_name)]
+
+
+def test_fallback_in_bulk_equals_fallback_per_neighbourhood(
+        variant_context, prepare_variant):
+    from Bookkeeper import Bookkeeper
+    from DecisionTree import decision_tree_of_project
+    from ExhaustionTracker import ExhaustionTracker
+
+    with variant_context('scenario_3', 'prefer_H', '0.').activate():
+        results = []
+
+        for in_bulk in [False, True]:
+            neighbourhoods, heat_sources = prepare_variant()
+            bookkeeper = Bookkeeper(neighbourhoods.keys())
+            tracker = ExhaustionTracker(heat_sources, bookkeeper,
+                                        decision_tree_of_project())
+            tracker.start_iteration(neighbourhoods, 1)
+
+            # Without a gas budget, H is never granted in the second
+            # iteration
+            assert tracker.is_exhausted('gas', 0.)
+
+            if in_bulk:
+                tracker.assign_fallback_in_bulk(
+                    list(neighbourhoods.values()))
+            else:
+                for neighbourhood in neighbourhoods.values():
+                    tracker.assign_fallback(neighbourhood)
+
+            results.append((
+                {code: neighbourhood.assigned_heating_option
+                 for code, neighbourhood in neighbourhoods.items()},
+                bookkeeper.totals().tolist()))
+
+        assert results[0] == results[1]
+
+
+def test_floors_are_determined_per_checked_resource(variant_context,
+                                                   prepare_variant):
+    from Bookkeeper import Bookkeeper
+    from DecisionTree import decision_tree_of_project
+    from ExhaustionTracker import ExhaustionTracker
+
+    with variant_context('scenario_1', 'prefer_H', '1.E5').activate():
+        neighbourhoods, heat_sources = prepare_variant()
+        tracker = ExhaustionTracker(heat_sources,
+                                    Bookkeeper(neighbourhoods.keys()),
+                                    decision_tree_of_project())
+        tracker.start_iteration(neighbourhoods, 0)
+
+        assert 'gas' in tracker.live_resources
+        assert tracker.floors == {} and tracker.requests == {}
+
+        neighbourhood = next(neighbourhood for neighbourhood in
+                             neighbourhoods.values()
+                             if 'gas' in tracker.resources[neighbourhood.code])
+
+        assert not tracker.nothing_available(neighbourhood, 1.E5)
+        assert list(tracker.requests) == [neighbourhood.code]
+
+        # Only the demands of the neighbourhoods that may claim gas
+        assert not tracker.is_exhausted('gas', 1.E5)
+        assert list(tracker.floors) == ['gas']
+        assert len(tracker.floors['gas']) == sum(
+            'gas' in resources for resources in tracker.resources.values())
+        assert tracker.is_exhausted('gas', 0.)
+
+
+def test_changed_decision_trees_are_used_in_the_same_process(
+        allocate_variant, assignments):
+    def options(overrides=None):
+        neighbourhoods, _, _, _ = allocate_variant(
+            'scenario_1', 'prefer_H', overrides=overrides)
+
+        return set(option for option, _ in
+                   assignments(neighbourhoods).values())
+
+    assert 'H' in options()
+    assert 'H' not in options({
+        'DECISION_TREES.H.first_time': [('E', 'electricity')],
+        'DECISION_TREES.H.second_time': [('E', 'electricity')]
+    })
+    assert 'H' in options()
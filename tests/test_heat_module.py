@@ -0,0 +1,56 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS, VARIANTS
+
+
+NO_H_TREES = {
+    'DECISION_TREES.H.first_time': [('E', 'electricity')],
+    'DECISION_TREES.H.second_time': [('E', 'electricity')]
+}
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', VARIANTS)
+def test_runs_reproduce_reference_assignments(
+        heat_module, variant_overrides, assignments, reference_assignments,
+        scenario_name, preferences, budget):
+    results = heat_module.run(scenario_name, tables=[],
+                              overrides=variant_overrides(preferences, budget))
+
+    assert assignments(results.neighbourhoods) == reference_assignments[
+        (preferences, budget, scenario_name)]
+
+
+def test_runs_do_not_change_the_loaded_preferences(heat_module,
+                                                   variant_overrides):
+    def preferences():
+        return {code: (neighbourhood.force_heat_network,
+                       dict(neighbourhood.heating_option_preference))
+                for code, neighbourhood in heat_module.neighbourhoods.items()}
+
+    loaded = preferences()
+    heat_module.run('scenario_1', tables=[],
+                    overrides=variant_overrides('no_coverage', 'default'))
+
+    assert preferences() == loaded
+
+
+def test_changed_decision_trees_are_used_by_a_warm_module(
+        heat_module, variant_overrides, assignments):
+    def options(overrides=None):
+        results = heat_module.run('scenario_1', tables=[], overrides={
+            **variant_overrides('prefer_H', 'default'), **(overrides or {})})
+
+        return set(option for option, _ in
+                   assignments(results.neighbourhoods).values())
+
+    assert 'H' in options()
+    assert 'H' not in options(NO_H_TREES)
+
+    # A second, different override in the same process
+    assert options({
+        'DECISION_TREES.H.first_time': [('W_MTHT', 'HT'), ('H', 'gas')]
+    }) == {'W_MTHT', 'H', 'W_LT'}
+    assert 'H' in options()
@@ -0,0 +1,54 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences', ['default', 'no_coverage'])
+def test_clusters_are_the_components_of_the_heat_networks(
+        allocate_variant, variant_context, scenario_name, preferences):
+    from heat_network_clusters import (HEAT_NETWORK_OPTIONS,
+                                       cluster_heat_networks)
+    from NeighbourhoodGraph import NeighbourhoodGraph
+
+    neighbourhoods, _, bookkeeper, _ = allocate_variant(scenario_name,
+                                                        preferences)
+
+    with variant_context(scenario_name, preferences).activate():
+        clusters = cluster_heat_networks(neighbourhoods, bookkeeper)
+
+    graph = NeighbourhoodGraph(neighbourhoods)
+
+    def key(code):
+        neighbourhood = neighbourhoods[code]
+
+        return (neighbourhood.assigned_heating_option,
+                neighbourhood.assigned_heat_source)
+
+    cluster_of = {code: number for number, cluster in enumerate(clusters)
+                  for code in cluster['neighbourhoods']}
+
+    # Each neighbourhood with a heat network is in exactly one cluster
+    assert sorted(cluster_of) == sorted(
+        code for code, neighbourhood in neighbourhoods.items()
+        if neighbourhood.assigned_heating_option in HEAT_NETWORK_OPTIONS)
+    assert sum(len(cluster['neighbourhoods'])
+               for cluster in clusters) == len(cluster_of)
+
+    for cluster in clusters:
+        assert set(key(code) for code in cluster['neighbourhoods']) == {
+            (cluster['heating_option'], cluster['heat_source'])}
+        assert cluster['useful_heat_demand'] == pytest.approx(sum(
+            bookkeeper.heat_demand[code][sector]['useful_heat']
+            for code in cluster['neighbourhoods']
+            for sector in ['residences', 'utility']))
+
+    # Adjacent neighbourhoods with the same heat network option and source
+    # are in the same cluster
+    for i, j in graph.edges().tolist():
+        code_i, code_j = graph.codes[i], graph.codes[j]
+
+        if code_i in cluster_of and key(code_i) == key(code_j):
+            assert cluster_of[code_i] == cluster_of[code_j]
@@ -0,0 +1,46 @@
+# external modules
+import math
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('engine', ['decision_trees', 'kernel', 'lp'])
+def test_assignments_are_the_inverse_of_the_assigned_sources(
+        allocate_variant, scenario_name, engine):
+    if engine == 'lp':
+        pytest.importorskip('scipy')
+
+    neighbourhoods, heat_sources, _, _ = allocate_variant(
+        scenario_name, 'no_coverage',
+        overrides={'SCENARIO.allocation_engine': engine})
+
+    for heat_temperature in ['HT', 'LT']:
+        for code, source in heat_sources[heat_temperature].items():
+            assert sorted(neighbourhood_code for neighbourhood_code, _, _
+                          in source.assignments) == sorted(
+                neighbourhood.code
+                for neighbourhood in neighbourhoods.values()
+                if neighbourhood.assigned_heat_source == code)
+            assert math.isclose(source.used_heat, math.fsum(
+                heat for _, _, heat in source.assignments))
+
+            summary = source.utilisation_summary()
+
+            assert summary['number_of_neighbourhoods_served'] == len(
+                source.assignments)
+            assert summary['max_distance_in_m'] >= (
+                summary['weighted_mean_distance_in_m'] * (1. - 1e-12))
+
+
+def test_assignments_survive_pickling(allocate_variant):
+    import pickle
+
+    _, heat_sources, _, _ = allocate_variant('scenario_1')
+    source = next(source for source in heat_sources['HT'].values()
+                  if source.assignments)
+
+    assert pickle.loads(pickle.dumps(source)).assignments == (
+        source.assignments)
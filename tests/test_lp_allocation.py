@@ -0,0 +1,41 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS, VARIANTS
+
+pytest.importorskip('scipy')
+
+
+def passed_checks(results):
+    return set((group, check.name) for group, checks in results.items()
+               for check in checks if check.passed)
+
+
+def total_confidence(neighbourhoods):
+    return sum(neighbourhood.confidence
+               for neighbourhood in neighbourhoods.values())
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', VARIANTS)
+def test_lp_allocation_is_feasible_and_at_least_as_confident(
+        allocate_variant, scenario_name, preferences, budget):
+    decision_trees = allocate_variant(scenario_name, preferences, budget)
+    neighbourhoods, heat_sources, bookkeeper, checks = allocate_variant(
+        scenario_name, preferences, budget,
+        {'SCENARIO.allocation_engine': 'lp'})
+
+    assert all(neighbourhood.assigned_heating_option not in [None,
+                                                             'undecided']
+               for neighbourhood in neighbourhoods.values())
+
+    # The LP allocation respects the capacities and the gas budget wherever
+    # the decision trees do
+    assert passed_checks(checks) >= passed_checks(decision_trees[3])
+
+    # The assignment of the decision trees is a feasible solution of the
+    # integer program, so the optimum is at least as confident (up to the
+    # relative gap of the solver)
+    assert total_confidence(neighbourhoods) >= (
+        total_confidence(decision_trees[0]) * (1. - 1e-4))
@@ -0,0 +1,130 @@
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+# Parameters of the stages with a draw at their point estimate
+POINT_ESTIMATES = [
+    'ASSUMPTIONS.heat_network_coverage_threshold_high',
+    'SPECS.efficiency_of_heat_network',
+    'ASSUMPTIONS.desired_epi.E',
+    'SCENARIO.renewable_gas_budget'
+]
+
+
+def run_variant(variant_context, prepare_variant, scenario_name,
+                preferences, budget, parameters, draws, seed=None,
+                processes=1):
+    from monte_carlo import point_estimate, run_monte_carlo
+
+    with variant_context(scenario_name, preferences, budget).activate():
+        neighbourhoods, heat_sources = prepare_variant()
+        parameters = {
+            name: ('uniform', point_estimate(name), point_estimate(name))
+            for name in POINT_ESTIMATES
+        } if parameters is None else parameters
+
+        return neighbourhoods, heat_sources, run_monte_carlo(
+            neighbourhoods, heat_sources, parameters, draws, seed, processes)
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('preferences, budget', [
+    ('default', 'default'), ('no_coverage', '1.E5'), ('prefer_H', '1.E5'),
+    ('prefer_H', '0.')])
+def test_draws_at_the_point_estimates_equal_the_decision_trees(
+        variant_context, prepare_variant, allocate_variant, assignments,
+        scenario_name, preferences, budget):
+    from DecisionTree import OPTIONS
+
+    draws = 5
+    neighbourhoods, _, (samples, option_counts, _, _) = run_variant(
+        variant_context, prepare_variant, scenario_name, preferences, budget,
+        None, draws)
+    allocated, _, _, _ = allocate_variant(scenario_name, preferences, budget)
+
+    expected = assignments(allocated)
+
+    for index, code in enumerate(neighbourhoods):
+        assert option_counts[index].sum() == draws
+        assert option_counts[index, OPTIONS.index(expected[code][0])] == draws
+
+    assert len(samples['used_renewable_gas']) == draws
+    assert len(set(samples['used_renewable_gas'])) == 1
+
+
+def test_draws_are_reproducible_over_processes(variant_context,
+                                               prepare_variant):
+    parameters = {
+        'ASSUMPTIONS.heat_network_coverage_favour': ('uniform', 0., 0.5),
+        'SPECS.efficiency_gas_to_heat_hhp': ('normal', 1.5, 0.3),
+        'SCENARIO.renewable_gas_budget': ('uniform', 0., 2.E5)
+    }
+
+    def run(processes, seed=1):
+        _, _, (samples, *counts) = run_variant(
+            variant_context, prepare_variant, 'scenario_3', 'prefer_H',
+            'default', parameters, 70, seed, processes)
+
+        return samples, counts
+
+    samples, (option_counts, route_counts, source_counts) = run(1)
+    other_samples, (other_options, other_routes, other_sources) = run(3)
+
+    for name, sample in samples.items():
+        np.testing.assert_array_equal(other_samples[name], sample)
+
+    np.testing.assert_array_equal(other_options, option_counts)
+    np.testing.assert_array_equal(other_routes, route_counts)
+
+    for heat_temperature, counts in source_counts.items():
+        np.testing.assert_array_equal(other_sources[heat_temperature],
+                                      counts)
+
+    # The uncertain gas budget gives both H and E
+    from DecisionTree import OPTIONS
+
+    assert option_counts[:, OPTIONS.index('H')].any()
+    assert option_counts[:, OPTIONS.index('E')].any()
+    assert not np.array_equal(run(1, seed=2)[1][0], option_counts)
+
+
+def test_unknown_parameters_and_distributions(variant_context):
+    from monte_carlo import sample_parameters
+
+    with variant_context('scenario_1').activate():
+        with pytest.raises(KeyError):
+            sample_parameters({'SPECS.unknown': ('uniform', 0., 1.)}, 2)
+
+        with pytest.raises(KeyError):
+            sample_parameters({'KEY_FIGURES.x': ('uniform', 0., 1.)}, 2)
+
+        with pytest.raises(ValueError):
+            sample_parameters({'SPECS.share_of_HT_heat': ('cauchy', 0.)}, 2)
+
+
+def test_export_of_the_probabilities(loaded_project, variant_context,
+                                     prepare_variant):
+    import pandas as pd
+    from monte_carlo import export_monte_carlo_results
+
+    draws = 4
+
+    neighbourhoods, heat_sources, results = run_variant(
+        variant_context, prepare_variant, 'scenario_1', 'default', 'default',
+        None, draws)
+
+    with variant_context('scenario_1').activate():
+        export_monte_carlo_results(neighbourhoods, heat_sources, *results)
+
+    directory = loaded_project / 'scenario_1'
+    options = pd.read_csv(directory / 'monte_carlo_options.csv')
+    sources = pd.read_csv(directory / 'monte_carlo_sources.csv')
+
+    assert list(options['neighbourhood_code']) == list(neighbourhoods)
+    assert (options['probability_of_most_likely_option'] == 1.).all()
+    assert (sources['probability'] == 1.).all()
+    assert set(sources['neighbourhood_code']) <= set(neighbourhoods)
+    assert len(pd.read_csv(directory / 'monte_carlo_draws.csv')) == draws
@@ -0,0 +1,80 @@
+# system modules
+from types import SimpleNamespace
+
+# external modules
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def graph():
+    from NeighbourhoodGraph import NeighbourhoodGraph
+
+    # A path A - B - C - D and an isolated E (with a self reference and a
+    # neighbour outside the project)
+    adjacent_neighbourhoods = {
+        'A': 'B', 'B': 'A, C', 'C': 'B,D', 'D': 'C,X', 'E': 'E'
+    }
+
+    return NeighbourhoodGraph({
+        code: SimpleNamespace(adjacent_neighbourhoods=adjacent)
+        for code, adjacent in adjacent_neighbourhoods.items()
+    })
+
+
+def test_graph_is_undirected_without_outside_neighbours(graph):
+    assert graph.edges().tolist() == [[0, 1], [1, 2], [2, 3]]
+
+
+@pytest.mark.parametrize('hops, expected', [
+    (0, [(0, 'A'), (1, 'D')]),
+    (1, [(0, 'A'), (0, 'B'), (1, 'C'), (1, 'D')]),
+    (2, [(0, 'A'), (0, 'B'), (0, 'C'), (1, 'B'), (1, 'C'), (1, 'D')])
+])
+def test_reach_per_source(graph, hops, expected):
+    sources, reached = graph.reach_per_source([0, 1], [0, 3], hops)
+
+    assert sorted(zip(sources.tolist(),
+                      [graph.codes[index] for index in reached])) == expected
+
+
+def test_connected_components():
+    from NeighbourhoodGraph import connected_components
+
+    components = connected_components(5, np.array([[3, 4], [0, 2]]))
+
+    assert components.tolist() == [0, 1, 0, 2, 2]
+
+
+def mapped_sources(neighbourhoods):
+    return {code: (neighbourhood.ht_sources_available,
+                   neighbourhood.lt_sources_available)
+            for code, neighbourhood in neighbourhoods.items()}
+
+
+def test_graph_is_only_built_to_extend_the_reach(
+        variant_context, monkeypatch):
+    import load_data
+
+    def no_graph(neighbourhoods):
+        raise AssertionError('The graph is built without extended reach')
+
+    with variant_context('scenario_1').activate():
+        neighbourhoods = load_data.build_stock()
+        monkeypatch.setattr(load_data, 'NeighbourhoodGraph', no_graph)
+        load_data.map_heat_sources(neighbourhoods)
+        in_range = mapped_sources(neighbourhoods)
+
+        monkeypatch.undo()
+
+    with variant_context('scenario_1', overrides={
+            'SCENARIO.source_reach_hops': 1}).activate():
+        load_data.map_heat_sources(neighbourhoods)
+        within_hops = mapped_sources(neighbourhoods)
+
+    # The extended reach keeps the sources in range, and adds sources of
+    # adjacent neighbourhoods
+    assert all(set(in_range[code][0]) <= set(within_hops[code][0]) and
+               set(in_range[code][1]) <= set(within_hops[code][1])
+               for code in neighbourhoods)
+    assert in_range != within_hops
@@ -0,0 +1,61 @@
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+def test_regional_demands_add_up_to_the_totals(allocate_variant,
+                                               scenario_name):
+    _, _, bookkeeper, _ = allocate_variant(scenario_name, 'no_coverage')
+
+    for grouping in bookkeeper.region_mappings:
+        _, demands = bookkeeper.region_totals(grouping)
+
+        np.testing.assert_allclose(demands.sum(axis=0), bookkeeper.totals(),
+                                   rtol=1e-12)
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+def test_regional_assignments_add_up_to_the_neighbourhoods(
+        allocate_variant, scenario_name):
+    from regions import regional_assignment_rows
+
+    neighbourhoods, _, bookkeeper, _ = allocate_variant(scenario_name,
+                                                        'no_coverage')
+    rows = regional_assignment_rows(bookkeeper)
+
+    for grouping, grouping_rows in rows.items():
+        assert sum(row[3] for row in grouping_rows) == len(neighbourhoods)
+        assert sum(row[4] for row in grouping_rows) == pytest.approx(sum(
+            neighbourhood.number_of_houses()
+            for neighbourhood in neighbourhoods.values()))
+
+        for option in set(row[2] for row in grouping_rows):
+            assert sum(row[3] for row in grouping_rows
+                       if row[2] == option) == sum(
+                neighbourhood.assigned_heating_option == option
+                for neighbourhood in neighbourhoods.values())
+
+
+def test_regional_assignments_skip_unassigned_neighbourhoods(
+        allocate_variant):
+    from Bookkeeper import Bookkeeper
+    from regions import regional_assignment_rows
+
+    neighbourhoods, _, bookkeeper, _ = allocate_variant('scenario_1')
+    rows = regional_assignment_rows(bookkeeper)
+
+    # A bookkeeper of the same neighbourhoods (and an unknown one) that has
+    # not kept their assignments yet
+    partial = Bookkeeper(bookkeeper.neighbourhood_codes + ['BU999'],
+                         bookkeeper.region_mappings)
+
+    assert all(grouping_rows == [] for grouping_rows in
+               regional_assignment_rows(partial).values())
+
+    partial.add_assignments(neighbourhoods.values())
+
+    assert regional_assignment_rows(partial) == rows
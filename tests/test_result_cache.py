@@ -0,0 +1,103 @@
+# system modules
+import shutil
+
+# external modules
+import pytest
+
+
+@pytest.fixture
+def cached_settings(loaded_project):
+    """
+    The settings of the sample project with a result cache (emptied first)
+    """
+
+    import config
+    from RunContext import ProjectSettings
+
+    shutil.rmtree(loaded_project / '.result_cache', ignore_errors=True)
+
+    settings = ProjectSettings(config.project_module('sample'))
+    settings.RESULT_CACHE_SIZE = 1.E9
+
+    return settings
+
+
+def run(settings, scenario_name='scenario_3', overrides=None):
+    from main import run_scenario
+    from RunContext import RunContext
+
+    context = RunContext('sample', scenario_name, settings)
+    context.override(overrides or {})
+
+    return run_scenario(context), context
+
+
+def checks_of_output(output):
+    return [line for line in output.splitlines()
+            if line.startswith(('Checking', '  CORRECT', '  ERROR',
+                                '    - '))]
+
+
+def test_sample_project_has_no_result_cache():
+    import config
+
+    assert config.project_module('sample').RESULT_CACHE_SIZE == 0
+
+
+def test_identical_run_restores_the_results_and_checks(
+        cached_settings, loaded_project, capsys):
+    overrides = {'SCENARIO.renewable_gas_budget': 1.E5}
+    summary, context = run(cached_settings, overrides=overrides)
+    output = capsys.readouterr().out
+
+    results = loaded_project / 'scenario_3' / 'neighbourhoods_output.csv'
+    content = results.read_bytes()
+    results.unlink()
+
+    restored, restored_context = run(cached_settings, overrides=overrides)
+    restored_output = capsys.readouterr().out
+
+    assert 'Restored the results of an identical run' in restored_output
+    assert 'Restored' not in output
+    assert restored == summary
+    assert restored['failed_checks'] > 0
+    assert checks_of_output(restored_output) == checks_of_output(output)
+    assert results.read_bytes() == content
+    assert (restored_context.scenario['used_renewable_gas'] ==
+            context.scenario['used_renewable_gas'])
+
+
+def test_other_settings_are_not_restored(cached_settings, capsys):
+    run(cached_settings)
+    capsys.readouterr()
+
+    for overrides in [{'SCENARIO.renewable_gas_budget': 0.},
+                      {'SPECS.efficiency_of_heat_network': 0.8}]:
+        run(cached_settings, overrides=overrides)
+
+        assert 'Restored' not in capsys.readouterr().out
+
+    run(cached_settings)
+
+    assert 'Restored' in capsys.readouterr().out
+
+
+def test_least_recently_used_runs_are_evicted(cached_settings,
+                                              loaded_project, capsys):
+    cache = loaded_project / '.result_cache'
+
+    run(cached_settings, 'scenario_1')
+    entry_size = sum(path.stat().st_size for path in cache.rglob('*')
+                     if path.is_file())
+
+    # Room for one run only
+    cached_settings.RESULT_CACHE_SIZE = 1.5 * entry_size
+    run(cached_settings, 'scenario_2')
+    run(cached_settings, 'scenario_1')
+    capsys.readouterr()
+
+    assert len(list(cache.iterdir())) == 1
+
+    run(cached_settings, 'scenario_1')
+
+    assert 'Restored' in capsys.readouterr().out
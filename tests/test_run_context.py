@@ -0,0 +1,137 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+def current():
+    import config
+
+    return (config.current_context, config.current_project,
+            config.current_project_name)
+
+
+def test_activate_is_the_only_writer_of_the_current_project():
+    import config
+    from RunContext import RunContext
+
+    assert not hasattr(config, 'set_current_project')
+    assert current() == (None, None, None)
+
+    context = RunContext('sample', 'scenario_1')
+
+    with context.activate():
+        assert current() == (context, context.project, 'sample')
+        assert context.project.current_scenario is context.scenario
+        assert context.project.current_scenario_name == 'scenario_1'
+
+    assert current() == (None, None, None)
+    assert context.project.current_scenario is None
+
+
+def test_nested_contexts_restore_the_previous_one():
+    from RunContext import RunContext
+
+    outer = RunContext('sample', 'scenario_1')
+    inner = RunContext('sample', 'scenario_2', outer.project)
+
+    with outer.activate():
+        with inner.activate():
+            assert current()[0] is inner
+            assert outer.project.current_scenario_name == 'scenario_2'
+
+        assert current()[0] is outer
+        assert outer.project.current_scenario is outer.scenario
+
+    assert current() == (None, None, None)
+
+
+def test_activate_is_not_reentrant():
+    from RunContext import RunContext
+
+    context = RunContext('sample', 'scenario_1')
+
+    with context.activate():
+        with pytest.raises(RuntimeError):
+            with context.activate():
+                pass
+
+        assert current()[0] is context
+
+    # It can be activated again afterwards, also after an error in the run
+    with pytest.raises(ZeroDivisionError):
+        with context.activate():
+            1 / 0
+
+    assert current() == (None, None, None)
+
+    with context.activate():
+        assert current()[0] is context
+
+
+def test_given_contexts_are_used_instead_of_the_current_one():
+    import config
+    from main import summarise_run
+    from RunContext import RunContext
+    from table_export import output_format_of_scenario
+
+    given = RunContext('sample', 'scenario_2')
+    given.override({'SCENARIO.output_format': 'parquet'})
+
+    with pytest.raises(RuntimeError):
+        config.context_of_run()
+
+    with RunContext('sample', 'scenario_1').activate():
+        assert output_format_of_scenario() == ('csv', None)
+        assert output_format_of_scenario(given) == ('parquet', None)
+        assert summarise_run({}, {'HT': {}, 'LT': {}}, {}, given)[
+            'scenario'] == 'scenario_2'
+
+    assert given.output_directory().parts[-3:] == (
+        'output_data', 'sample', 'scenario_2')
+
+
+def test_overrides_do_not_change_other_runs():
+    import config
+    from RunContext import RunContext
+
+    budget = config.project_module('sample').SCENARIOS['scenario_1'][
+        'renewable_gas_budget']
+    share = config.project_module('sample').SPECS['share_of_HT_heat']
+
+    context = RunContext('sample', 'scenario_1')
+    context.override({'SCENARIO.renewable_gas_budget': budget + 1.,
+                      'SPECS.share_of_HT_heat': share / 2})
+
+    with pytest.raises(KeyError):
+        context.override({'SPECS.unknown_setting': 1.})
+
+    other = RunContext('sample', 'scenario_1')
+
+    assert context.scenario['renewable_gas_budget'] == budget + 1.
+    assert context.project.SPECS['share_of_HT_heat'] == share / 2
+    assert other.scenario['renewable_gas_budget'] == budget
+    assert other.project.SPECS['share_of_HT_heat'] == share
+    assert config.project_module('sample').SPECS['share_of_HT_heat'] == share
+
+
+def test_runner_in_processes_equals_one_after_the_other(loaded_project):
+    from scenario_runner import run_scenarios
+
+    sequential = run_scenarios('sample', SCENARIOS, processes=1)
+    concurrent = run_scenarios('sample', SCENARIOS, processes=3)
+
+    assert [summary['scenario'] for summary in sequential] == SCENARIOS
+    assert concurrent == sequential
+    assert current() == (None, None, None)
+
+    for scenario_name in SCENARIOS:
+        assert (loaded_project / scenario_name / 'run.log').stat().st_size
+
+
+def test_runner_rejects_unknown_scenarios():
+    from scenario_runner import run_scenarios
+
+    with pytest.raises(KeyError):
+        run_scenarios('sample', ['scenario_1', 'scenario_9'])
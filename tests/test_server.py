@@ -0,0 +1,93 @@
+# system modules
+import asyncio
+import json
+
+# external modules
+import pytest
+
+
+NO_H_TREES = '''
+
+DECISION_TREES = {
+    'E': {
+        'first_time': [('W_LT', 'LT'), ('W_LT', 'TEO'), ('E', 'electricity')],
+        'second_time': [('E', 'electricity')]
+    },
+    'W_MTHT': {
+        'first_time': [('W_MTHT', 'HT'), ('W_MTHT', 'geothermal'),
+                       ('W_MTHT', 'LT'), ('W_MTHT', 'undefined')],
+        'second_time': [('W_MTHT', 'HT'), ('W_MTHT', 'geothermal'),
+                        ('W_MTHT', 'LT'), ('W_MTHT', 'undefined'),
+                        ('E', 'electricity')]
+    },
+    'H': {
+        'first_time': [('E', 'electricity')],
+        'second_time': [('E', 'electricity')]
+    }
+}
+'''
+
+
+@pytest.fixture
+def config_file(workspace):
+    """
+    The config file of the sample project, restored (and reloaded) after the
+    test
+    """
+
+    import config
+
+    path = workspace / 'scripts' / 'config_files' / 'sample.py'
+    original = path.read_text()
+
+    yield path
+
+    path.write_text(original)
+    module = config.project_module('sample')
+
+    if hasattr(module, 'DECISION_TREES'):
+        # Reloading a module keeps the names it no longer defines
+        del module.DECISION_TREES
+
+    config.project_module('sample', reload=True)
+
+
+def test_reload_uses_the_changed_config_file(config_file, variant_overrides):
+    from DecisionTree import compiled_decision_trees
+    from server import HeatModuleServer
+
+    server = HeatModuleServer('sample')
+    body = json.dumps({
+        'scenario': 'scenario_1',
+        'overrides': variant_overrides('prefer_H', 'default'),
+        'tables': ['neighbourhoods_output']
+    }).encode()
+
+    def options(response):
+        return set(row['assigned_heating_option'] for row in json.loads(
+            response)['tables']['neighbourhoods_output'])
+
+    async def requests():
+        await server.reload()
+        _, before = await server.handle_request('POST', '/run', body)
+        _, cached = await server.handle_request('POST', '/run', body)
+
+        config_file.write_text(config_file.read_text() + NO_H_TREES)
+        await server.reload()
+        _, after = await server.handle_request('POST', '/run', body)
+
+        # The single worker thread runs in this process: only the trees of
+        # the reloaded config file are left
+        assert len(compiled_decision_trees) == 1
+
+        return before, cached, after
+
+    try:
+        before, cached, after = asyncio.run(requests())
+
+    finally:
+        server.executor.shutdown()
+
+    assert cached is before
+    assert 'H' in options(before)
+    assert 'H' not in options(after)
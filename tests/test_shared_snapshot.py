@@ -0,0 +1,104 @@
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+def sum_of_rows(arrays, first, last):
+    return float(arrays['values'][first:last].sum())
+
+
+def test_shared_snapshot_views_are_read_only():
+    from SharedSnapshot import SharedSnapshot, attach, map_on_snapshot
+
+    values = np.arange(100.)
+
+    with SharedSnapshot({'values': values,
+                         'codes': np.array(['BU01', 'BU02'])}) as shared:
+        attached = attach(shared.descriptor)
+
+        np.testing.assert_array_equal(attached['values'], values)
+        assert attached['codes'].tolist() == ['BU01', 'BU02']
+
+        with pytest.raises(ValueError):
+            attached['values'][0] = 1.
+
+        arguments = [(first, first + 10) for first in range(0, 100, 10)]
+
+        assert (map_on_snapshot(sum_of_rows, shared, arguments,
+                                processes=3) ==
+                map_on_snapshot(sum_of_rows, shared, arguments,
+                                processes=1))
+
+
+def test_snapshot_takes_the_shared_demands(variant_context,
+                                           prepare_variant):
+    from ProjectSnapshot import ProjectSnapshot, demand_tensor
+
+    with variant_context('scenario_1', 'no_coverage').activate() as context:
+        neighbourhoods, heat_sources = prepare_variant()
+        codes = list(neighbourhoods.keys())
+        own = ProjectSnapshot(neighbourhoods, heat_sources)
+
+        # The shared demands are in another order, and have all options
+        shared = {'codes': np.array(codes[::-1]),
+                  'demands': demand_tensor(neighbourhoods)[::-1]}
+        context.shared_demands = shared
+        snapshot = ProjectSnapshot(neighbourhoods, heat_sources)
+
+        # Without some of the neighbourhoods, the demands are computed
+        context.shared_demands = {'codes': shared['codes'][1:],
+                                  'demands': shared['demands'][1:]}
+        computed = ProjectSnapshot(neighbourhoods, heat_sources)
+
+    requested = ~np.isnan(own.demands)
+
+    assert requested.any()
+    np.testing.assert_array_equal(snapshot.demands[requested],
+                                  own.demands[requested])
+    np.testing.assert_array_equal(computed.demands, own.demands)
+
+
+def test_runner_shares_the_demands_of_the_kernel(loaded_project,
+                                                 monkeypatch):
+    import config
+    import scenario_runner
+    from RunContext import ProjectSettings
+
+    # Without the result cache, so every scenario is run
+    settings = ProjectSettings(config.project_module('sample'))
+    settings.RESULT_CACHE_SIZE = 0
+    by_decision_trees = scenario_runner.run_scenarios(
+        'sample', SCENARIOS, processes=1, settings=settings)
+
+    assert scenario_runner.shared_demand_arrays('sample', SCENARIOS,
+                                                settings, False) is None
+
+    for scenario in settings.SCENARIOS.values():
+        scenario['allocation_engine'] = 'kernel'
+
+    arrays = scenario_runner.shared_demand_arrays('sample', SCENARIOS,
+                                                  settings, False)
+
+    assert arrays['codes'].shape == arrays['demands'].shape[:1]
+
+    concurrent = scenario_runner.run_scenarios('sample', SCENARIOS,
+                                               processes=3, settings=settings)
+    sequential = scenario_runner.run_scenarios('sample', SCENARIOS,
+                                               processes=1, settings=settings)
+
+    assert concurrent == sequential == by_decision_trees
+
+    # The processes use the shared demands: with twice the demands, the
+    # heat sources supply twice the heat
+    monkeypatch.setattr(scenario_runner, 'shared_demand_arrays',
+                        lambda *arguments: {**arrays,
+                                            'demands': 2 * arrays['demands']})
+
+    doubled = scenario_runner.run_scenarios('sample', SCENARIOS,
+                                            processes=3, settings=settings)
+
+    for summary, doubled_summary in zip(sequential, doubled):
+        assert doubled_summary['used_HT_heat'] > summary['used_HT_heat']
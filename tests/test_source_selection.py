@@ -0,0 +1,101 @@
+# external modules
+import numpy as np
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+# Remaining heat and distances of four candidate heat sources (sorted by
+# distance), for a demand of 10
+REMAINING_HEAT = np.array([5., 40., 20., 60.])
+DISTANCES = np.array([100., 200., 300., 400.])
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+@pytest.mark.parametrize('strategy, max_distance, expected', [
+    ('nearest', np.inf, 1),
+    ('best_fit', np.inf, 2),
+    ('largest_remaining', np.inf, 3),
+    ('distance_capped', 250., 1),
+    ('distance_capped', 150., -1)
+])
+def test_select_candidate(strategy, max_distance, expected, compiled):
+    from source_selection import STRATEGIES, select_candidate
+
+    select = select_candidate if compiled else select_candidate.py_func
+
+    assert select(REMAINING_HEAT, DISTANCES, 10., STRATEGIES.index(strategy),
+                  max_distance) == expected
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_capacity_index_selects_as_select_candidate(compiled):
+    import source_selection
+    from source_selection import STRATEGIES, select_candidate
+
+    def function(name):
+        function = getattr(source_selection, name)
+
+        return function if compiled else function.py_func
+
+    # Candidate lists of 50 neighbourhoods with 12 heat sources, with ties in
+    # the remaining heat
+    generator = np.random.default_rng(1)
+    indptr = np.concatenate(
+        [[0], np.cumsum(generator.integers(0, 9, 50))]).astype(np.int64)
+    indices = generator.integers(0, 12, indptr[-1]).astype(np.int64)
+    distances = np.concatenate([
+        np.sort(generator.uniform(0., 1000., end - start))
+        for start, end in zip(indptr[:-1], indptr[1:])])
+    available_heat = generator.integers(0, 8, 12) * 10.
+    used_heat = np.zeros(12)
+
+    tree, source_indptr, source_positions = function('capacity_index')(
+        indices, 12, available_heat - used_heat)
+
+    for step in range(500):
+        neighbourhood = generator.integers(0, 50)
+        start, end = indptr[neighbourhood], indptr[neighbourhood + 1]
+        demand = generator.integers(0, 6) * 5.
+        strategy = generator.integers(0, len(STRATEGIES))
+        remaining_heat = (available_heat - used_heat)[indices[start:end]]
+
+        position = function('select_from_capacity_index')(
+            tree, start, end, distances, demand, strategy, 500.)
+
+        assert position == select_candidate(
+            remaining_heat, distances[start:end], demand, strategy, 500.)
+
+        if position >= 0:
+            source = indices[start + position]
+            used_heat[source] += demand
+            function('update_capacity')(
+                tree, source_indptr, source_positions, source,
+                available_heat[source] - used_heat[source])
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('strategy', ['best_fit', 'largest_remaining',
+                                      'distance_capped'])
+def test_kernel_equals_decision_trees_for_each_strategy(
+        allocate_variant, outcome, scenario_name, strategy):
+    overrides = {'SCENARIO.source_selection': strategy,
+                 'SCENARIO.max_source_distance': 2000.}
+    decision_trees = allocate_variant(scenario_name, 'no_coverage',
+                                      overrides=overrides)
+    kernel = allocate_variant(scenario_name, 'no_coverage', overrides={
+        **overrides, 'SCENARIO.allocation_engine': 'kernel'})
+
+    assert outcome(*kernel[:3]) == outcome(*decision_trees[:3])
+
+
+def test_distance_capped_without_distance_assigns_no_residual_heat(
+        allocate_variant):
+    _, heat_sources, _, _ = allocate_variant(
+        'scenario_1', 'no_coverage', overrides={
+            'SCENARIO.source_selection': 'distance_capped',
+            'SCENARIO.max_source_distance': 0.})
+
+    assert all(source.used_heat == 0.
+               for heat_temperature in ['HT', 'LT']
+               for source in heat_sources[heat_temperature].values())
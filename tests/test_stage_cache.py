@@ -0,0 +1,88 @@
+# system modules
+import re
+import shutil
+
+# external modules
+import pytest
+
+
+@pytest.mark.parametrize('names, stages', [
+    (['NEIGHBOURHOOD_CSVS.list'], ['stock']),
+    (['DEFAULT_MATRIX_RESIDENCES'], ['preferences']),
+    (['SCENARIO.ht_heat'], ['sources']),
+    (['SPECS.efficiency_of_heat_network'], ['demands']),
+    (['ASSUMPTIONS.desired_epi'], ['demands']),
+    (['SPECS.share_of_LT_heat_for_W_LT'], ['allocation']),
+    (['DECISION_TREES.H.first_time'], ['allocation']),
+    (['SCENARIO.renewable_gas_budget', 'ASSUMPTIONS'],
+     ['preferences', 'demands', 'allocation']),
+    (['SCENARIO.output_format'], [])])
+def test_stages_of_settings(names, stages):
+    from StageCache import stages_of_settings
+
+    assert stages_of_settings(names) == stages
+
+
+def test_stage_settings_are_settings_of_the_sample_project():
+    import config
+    from RunContext import RunContext
+    from StageCache import STAGE_SETTINGS, setting_value
+
+    optional = {'SCENARIO.source_reach_hops', 'SCENARIO.allocation_engine',
+                'SCENARIO.source_selection', 'SCENARIO.max_source_distance',
+                'SCENARIO.lp_time_limit', 'SCENARIO.lp_relative_gap'}
+
+    with RunContext('sample', 'scenario_1').activate():
+        for settings in STAGE_SETTINGS.values():
+            for name in settings:
+                if name.startswith('SPECS.share_of_'):
+                    continue
+
+                assert (name in optional or
+                        setting_value(name) is not None), name
+
+
+def test_only_the_stages_of_changed_settings_are_computed(loaded_project,
+                                                          capsys):
+    import config
+    from load_data import initialise_neighbourhoods_and_heat_sources
+    from RunContext import ProjectSettings, RunContext
+
+    shutil.rmtree(loaded_project / '.stage_cache', ignore_errors=True)
+
+    settings = ProjectSettings(config.project_module('sample'))
+    settings.RESULT_CACHE_SIZE = 1.E9
+
+    def load(overrides=None):
+        context = RunContext('sample', 'scenario_1', settings)
+        context.override(overrides or {})
+
+        with context.activate():
+            initialise_neighbourhoods_and_heat_sources()
+
+        return re.findall(r'(\w+) (reused|computed)',
+                          capsys.readouterr().out.split('Stages:')[1])
+
+    assert load() == [('stock', 'computed'), ('preferences', 'computed'),
+                      ('sources', 'computed')]
+
+    # The settings of the demand and allocation stages are only read when
+    # assigning the heating options
+    assert load({'SPECS.efficiency_of_heat_network': 0.8,
+                 'ASSUMPTIONS.desired_epi.E': 0.9,
+                 'SCENARIO.renewable_gas_budget': 0.}) == [
+        ('stock', 'reused'), ('preferences', 'reused'),
+        ('sources', 'reused')]
+
+    assert load({'ASSUMPTIONS.heat_network_coverage_favour': 0.2}) == [
+        ('stock', 'reused'), ('preferences', 'computed'),
+        ('sources', 'reused')]
+
+    assert load({'SCENARIO.ht_heat': 'ht_sources_low_potential.csv'}) == [
+        ('stock', 'reused'), ('preferences', 'reused'),
+        ('sources', 'computed')]
+
+    # Loading the scenario again (as the other tests expect it) reuses all
+    # stages
+    assert load() == [('stock', 'reused'), ('preferences', 'reused'),
+                      ('sources', 'reused')]
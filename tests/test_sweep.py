@@ -0,0 +1,97 @@
+# system modules
+import json
+import re
+
+# external modules
+import pytest
+
+# Grid of 2 preference stages, 2 demand stages and 2 gas budgets
+PARAMETERS = {
+    'ASSUMPTIONS.heat_network_coverage_favour': [0., 0.5],
+    'ASSUMPTIONS.desired_epi.E': [0.7, 1.2],
+    'SCENARIO.renewable_gas_budget': [0., 1.E5]
+}
+
+
+@pytest.mark.parametrize('name, stage', [
+    ('ASSUMPTIONS.lt_eligibility_threshold', 'preferences'),
+    ('ASSUMPTIONS.desired_epi.H', 'demands'),
+    ('SPECS.share_of_HT_heat', 'allocation'),
+    ('SPECS.share_of_LT_heat_for_W_LT', 'allocation'),
+    ('SCENARIO.max_source_distance', 'allocation'),
+    ('SCENARIO.renewable_gas_budget', 'allocation'),
+    ('SPECS.share_of_HT_heat_typo', None),
+    ('SPECS.share_of_LT_heat_for_X', None),
+    ('SCENARIO.max_source_distance_2', None),
+    ('KEY_FIGURES.gj_to_mwh', None)])
+def test_stage_of_parameter_matches_exact_names(name, stage):
+    from monte_carlo import stage_of_parameter
+
+    assert stage_of_parameter(name) == stage
+
+
+def test_parameters_are_settings_of_their_stage():
+    from monte_carlo import PARAMETER_STAGES
+    from StageCache import STAGE_SETTINGS
+
+    for stage, names in PARAMETER_STAGES.items():
+        assert set(names) <= set(STAGE_SETTINGS[stage])
+
+
+def test_read_sweep_rejects_parameters_without_a_stage(variant_context,
+                                                       tmp_path):
+    from sweep import read_sweep
+
+    path = tmp_path / 'sweep.json'
+
+    with variant_context('scenario_1').activate():
+        path.write_text(json.dumps({'parameters': PARAMETERS}))
+        assert read_sweep(path) == PARAMETERS
+
+        for parameters in [{'SPECS.share_of_HT_heat_typo': [0.5]},
+                           {'SPECS.share_of_HT_heat': []}]:
+            path.write_text(json.dumps({'parameters': parameters}))
+
+            with pytest.raises(ValueError):
+                read_sweep(path)
+
+
+def run_sweep_of_variant(variant_context, prepare_variant, processes):
+    from sweep import run_sweep
+
+    with variant_context('scenario_3', 'prefer_H').activate():
+        neighbourhoods, heat_sources = prepare_variant()
+
+        return run_sweep(neighbourhoods, heat_sources, PARAMETERS, processes)
+
+
+def test_sweep_equals_the_decision_trees(variant_context, prepare_variant,
+                                         allocate_variant, capsys):
+    rows = run_sweep_of_variant(variant_context, prepare_variant, 1)
+
+    # In one process, each stage is computed once
+    output = capsys.readouterr().out
+
+    assert re.search('8 grid points: 2 different preference stages, 2 '
+                     'different demand stages', output)
+    assert 'Computed 2 preference stages and 2 demand stages' in output
+
+    assert [row['grid_point'] for row in rows] == list(range(8))
+
+    for row in rows:
+        neighbourhoods, _, _, _ = allocate_variant(
+            'scenario_3', 'prefer_H', overrides={
+                name: row[name] for name in PARAMETERS})
+
+        for option in ['W_MTHT', 'W_LT', 'H', 'E']:
+            assert row[f'neighbourhoods_{option}'] == sum(
+                neighbourhood.assigned_heating_option == option
+                for neighbourhood in neighbourhoods.values())
+
+    assert len({row['neighbourhoods_H'] for row in rows}) > 1
+
+
+def test_sweep_in_processes_equals_one_process(variant_context,
+                                               prepare_variant):
+    assert (run_sweep_of_variant(variant_context, prepare_variant, 3) ==
+            run_sweep_of_variant(variant_context, prepare_variant, 1))
@@ -0,0 +1,128 @@
+# external modules
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_flatten_nested_attributes():
+    from table_export import flatten
+
+    assert flatten({
+        'code': 'BU0001',
+        'geo_coordinate': [1., 2.],
+        'stock': {'A': {'<1945': [3, 4]}},
+        'preference': [('E', 0.5), ('H', 0.5)],
+        'sources': ['HT_1', 'LT_2'],
+        'empty': []
+    }) == {
+        'code': 'BU0001',
+        'geo_coordinate_x': 1., 'geo_coordinate_y': 2.,
+        'stock.A.<1945_0': 3, 'stock.A.<1945_1': 4,
+        'preference.E': 0.5, 'preference.H': 0.5,
+        'sources': 'HT_1,LT_2',
+        'empty': ''
+    }
+
+
+def test_typed_columns():
+    from table_export import typed_column
+
+    assert typed_column([1, 2]).dtype == np.int64
+    assert typed_column([1, 2.5]).dtype == float
+    assert np.isnan(typed_column([1, None])[1])
+    assert str(typed_column([True, False]).dtype) == 'bool'
+    assert str(typed_column([True, None]).dtype) == 'boolean'
+    assert list(typed_column(['undecided', 0.7, None])) == [
+        'undecided', '0.7', None]
+
+
+@pytest.mark.parametrize('output_format, compression', [
+    ('csv', None), ('csv', 'gzip'), ('parquet', 'zstd'), ('arrow', None)])
+def test_write_table_round_trip(loaded_project, variant_context, output_format,
+                                compression):
+    from table_export import write_table
+
+    if output_format != 'csv':
+        pytest.importorskip('pyarrow')
+
+    table = pd.DataFrame({'code': ['BU0001', 'BU0002'],
+                          'used_heat': [1.5, 2.],
+                          'houses': [3, 4]})
+
+    with variant_context('scenario_1', overrides={
+            'SCENARIO.output_format': output_format,
+            'SCENARIO.output_compression': compression}).activate():
+        path = write_table(table, f'round_trip_{output_format}')
+
+    if output_format == 'csv':
+        written = pd.read_csv(path, compression=compression)
+    elif output_format == 'parquet':
+        written = pd.read_parquet(path)
+    else:
+        import pyarrow as pa
+
+        with pa.memory_map(str(path)) as source:
+            written = pa.ipc.open_file(source).read_all().to_pandas()
+
+    pd.testing.assert_frame_equal(written, table, check_dtype=False)
+
+
+def test_unknown_output_format(variant_context):
+    from table_export import output_format_of_scenario
+
+    with variant_context('scenario_1', overrides={
+            'SCENARIO.output_format': 'xlsx'}).activate():
+        with pytest.raises(ValueError):
+            output_format_of_scenario()
+
+
+def test_neighbourhood_results_of_undecided_neighbourhoods(
+        variant_context, allocate_variant):
+    from main import neighbourhood_results_table
+
+    neighbourhoods, _, _, _ = allocate_variant('scenario_1')
+    undecided = next(iter(neighbourhoods.values()))
+    undecided.assigned_heating_option = 'undecided'
+
+    with variant_context('scenario_1').activate() as context:
+        desired_epi = context.project.ASSUMPTIONS['desired_epi']
+        table = neighbourhood_results_table(neighbourhoods)
+
+    assert 'category_heat_source' not in table.columns
+    assert list(table['desired_epi']) == [
+        'undecided' if neighbourhood is undecided else
+        str(desired_epi[neighbourhood.assigned_heating_option])
+        for neighbourhood in neighbourhoods.values()]
+
+
+def test_demand_region_and_cluster_tables_use_the_output_format(
+        loaded_project, variant_context, allocate_variant):
+    from heat_network_clusters import (cluster_heat_networks,
+                                       export_heat_network_clusters_to_csv)
+    from main import result_tables
+    from regions import export_regional_assignments_to_csv
+
+    pytest.importorskip('pyarrow')
+
+    neighbourhoods, heat_sources, bookkeeper, _ = allocate_variant(
+        'scenario_1')
+    names = ['demands', 'heat_network_clusters',
+             'regional_demands_municipality',
+             'regional_assignments_municipality']
+
+    with variant_context('scenario_1', overrides={
+            'SCENARIO.output_format': 'parquet'}).activate():
+        bookkeeper.export_heat_demand_to_csv()
+        bookkeeper.export_regional_heat_demand_to_csv()
+        export_regional_assignments_to_csv(bookkeeper)
+        export_heat_network_clusters_to_csv(
+            cluster_heat_networks(neighbourhoods, bookkeeper))
+
+        tables = result_tables(neighbourhoods, heat_sources, bookkeeper, {},
+                               names)
+
+    for name in names:
+        path = loaded_project / 'scenario_1' / f'{name}.parquet'
+
+        pd.testing.assert_frame_equal(pd.read_parquet(path), tables[name])
+        path.unlink()
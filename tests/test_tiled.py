@@ -0,0 +1,129 @@
+# system modules
+from types import SimpleNamespace
+
+# external modules
+import numpy as np
+import pandas as pd
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+OUTPUT_TABLES = ['neighbourhoods_output.csv', 'HT_sources_output.csv',
+                 'LT_sources_output.csv']
+
+
+def run_tiled(scenario_name, tile_size, **options):
+    """
+    Run the tiled mode for the scenario of the sample project and export its
+    results, returns the merged bookkeeper and the results of the checks
+    """
+
+    from RunContext import RunContext
+    import tiled
+
+    with RunContext('sample', scenario_name).activate():
+        (snapshot, heat_sources, bookkeeper, region_names, records, keys,
+         present_demands) = tiled.run_tiled_scenario(tile_size, **options)
+
+        tiled.export_tiled_results(snapshot, heat_sources, bookkeeper,
+                                   region_names, records, keys)
+
+        return bookkeeper, tiled.run_tiled_checks(
+            snapshot, heat_sources, bookkeeper, present_demands)
+
+
+def passed_checks(checks):
+    return {group: [(check.name, check.passed) for check in group_checks]
+            for group, group_checks in checks.items()}
+
+
+def checked_values(checks):
+    return [(check.value, check.expected)
+            for group_checks in checks.values() for check in group_checks]
+
+
+def demands_of(path):
+    return pd.read_csv(path).sort_values(
+        ['neighbourhood', 'type']).reset_index(drop=True)
+
+
+def test_tiles_keep_municipalities_together():
+    from tiled import tiles_of
+
+    neighbourhoods = {
+        code: SimpleNamespace(code=code, municipality_code=municipality)
+        for code, municipality in [('A', 'GM1'), ('B', 'GM2'), ('C', 'GM1'),
+                                   ('D', float('nan')), ('E', 'GM2'),
+                                   ('F', 'GM2'), ('G', 'GM2')]
+    }
+
+    assert tiles_of(neighbourhoods, 3) == [['A', 'C'], ['B', 'E', 'F'],
+                                           ['G', 'D']]
+    assert tiles_of(neighbourhoods, 10) == [['A', 'C', 'B', 'E', 'F', 'G',
+                                             'D']]
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+@pytest.mark.parametrize('tile_size', [4, 1000])
+def test_tiled_results_equal_those_of_main(loaded_project, scenario_name,
+                                           tile_size):
+    from main import allocate_and_export
+    from RunContext import RunContext
+
+    scenario = loaded_project / scenario_name
+
+    with RunContext('sample', scenario_name).activate():
+        _, checks = allocate_and_export()
+
+    outputs = {name: (scenario / name).read_bytes() for name in OUTPUT_TABLES}
+    demands = demands_of(scenario / 'demands.csv')
+    regional_demands = pd.read_csv(
+        scenario / 'regional_demands_municipality.csv')
+    regional_assignments = (
+        scenario / 'regional_assignments_municipality.csv').read_bytes()
+
+    for name in OUTPUT_TABLES + ['demands.csv']:
+        (scenario / name).unlink()
+
+    _, tiled_checks = run_tiled(scenario_name, tile_size)
+
+    assert {name: (scenario / name).read_bytes()
+            for name in OUTPUT_TABLES} == outputs
+    pd.testing.assert_frame_equal(demands_of(scenario / 'demands.csv'),
+                                  demands)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(scenario / 'regional_demands_municipality.csv'),
+        regional_demands, check_exact=True)
+    assert (scenario / 'regional_assignments_municipality.csv').read_bytes() == (
+        regional_assignments)
+
+    assert passed_checks(tiled_checks) == passed_checks(checks)
+    assert np.allclose(checked_values(tiled_checks), checked_values(checks),
+                       rtol=1.E-12, atol=0.)
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+def test_merged_bookkeepers_do_not_depend_on_the_processes(
+        loaded_project, allocate_variant, scenario_name):
+    _, _, bookkeeper, _ = allocate_variant(scenario_name)
+
+    merged = {processes: run_tiled(scenario_name, 4, processes=processes)[0]
+              for processes in [1, 3]}
+
+    for tiled_bookkeeper in merged.values():
+        # Bit for bit, per neighbourhood and in total
+        assert tiled_bookkeeper.neighbourhood_codes == (
+            bookkeeper.neighbourhood_codes)
+        assert np.array_equal(tiled_bookkeeper.demands, bookkeeper.demands)
+        assert tiled_bookkeeper.totals().tolist() == (
+            bookkeeper.totals().tolist())
+
+        for grouping in bookkeeper.region_mappings:
+            regions, demands = bookkeeper.region_totals(grouping)
+            tiled_regions, tiled_demands = tiled_bookkeeper.region_totals(
+                grouping)
+
+            assert sorted(zip(tiled_regions, tiled_demands.tolist())) == (
+                sorted(zip(regions, demands.tolist())))
@@ -0,0 +1,94 @@
+# external modules
+import pytest
+
+# project modules
+from conftest import SCENARIOS
+
+
+def failed_checks(checks):
+    return [(group, check.name, check.expected_name)
+            for group, group_checks in checks.items()
+            for check in group_checks if not check.passed]
+
+
+@pytest.mark.parametrize('scenario_name', SCENARIOS)
+def test_checks_pass_without_heat_networks(allocate_variant, scenario_name):
+    _, _, _, checks = allocate_variant(scenario_name, 'prefer_H')
+
+    assert failed_checks(checks) == []
+    assert set(checks) == {'demands', 'HT sources', 'LT sources',
+                           'gas budgets'}
+
+
+def test_source_with_too_much_used_heat_is_an_offender(allocate_variant):
+    from verification import check_capacities, check_source_assignments
+
+    _, heat_sources, _, _ = allocate_variant('scenario_1')
+    source = max(heat_sources['HT'].values(),
+                 key=lambda source: source.used_heat)
+    source.used_heat = source.available_heat + 1.
+
+    capacities = check_capacities(heat_sources, 'HT')
+    assignments = check_source_assignments(heat_sources, 'HT')
+
+    assert not capacities.passed
+    assert [code for code, _, _ in capacities.offenders] == [source.code]
+    assert not assignments.passed
+    assert [code for code, _, _ in assignments.offenders] == [source.code]
+
+
+def test_neighbourhood_with_missing_demand_is_an_offender(allocate_variant):
+    from Bookkeeper import CARRIER_INDEX
+    from verification import check_present_demand
+
+    neighbourhoods, _, bookkeeper, _ = allocate_variant('scenario_1',
+                                                        'prefer_H')
+    code = next(iter(neighbourhoods))
+    bookkeeper.demands[bookkeeper.neighbourhood_index[code], :,
+                       CARRIER_INDEX['useful_heat']] = 0.
+
+    check = check_present_demand(neighbourhoods, bookkeeper)
+
+    assert not check.passed
+    assert [offender for offender, _, _ in check.offenders] == [code]
+    assert check.value > check.expected
+
+
+def test_used_gas_over_the_budget_fails(variant_context, allocate_variant):
+    from verification import check_gas_budget
+
+    _, _, bookkeeper, checks = allocate_variant('scenario_1', 'prefer_H',
+                                                '1.E5')
+
+    context = variant_context('scenario_1', 'prefer_H', '1.E5')
+
+    with context.activate():
+        scenario = context.project.current_scenario
+        scenario['used_renewable_gas'] = scenario['renewable_gas_budget'] * 2
+
+        within_budget, used_gas = check_gas_budget(bookkeeper)
+
+    assert all(check.passed for check in checks['gas budgets'])
+    assert not within_budget.passed
+    assert not used_gas.passed
+
+
+def test_print_verification_limits_the_offenders(capsys):
+    from verification import CheckResult, print_verification
+
+    offenders = [(f'BU{index:04d}', 2., 1.) for index in range(12)]
+    print_verification({'sources': [
+        CheckResult('used heat', 24., '<=', 'available heat', 12., False,
+                    offenders),
+        CheckResult('used gas', 1., '==', 'gas', 1., True, [])
+    ]}, max_offenders=10)
+
+    lines = capsys.readouterr().out.splitlines()
+
+    assert lines[1:] == [
+        'Checking sources..',
+        '  ERROR: used heat (24.0) > available heat (12.0)',
+        *[f'    - {code}: 2.0 > 1.0' for code, _, _ in offenders[:10]],
+        '    - ... and 2 more',
+        '  CORRECT: used gas (1.0) == gas (1.0)'
+    ]